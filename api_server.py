@@ -0,0 +1,289 @@
+import argparse
+import json
+import signal
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+from main import Store, ORDER_BATCH_SIZE
+from models import Category, Order
+from product_query import ProductQuery
+
+class PooledHTTPServer(HTTPServer):
+    # Connections are served by a fixed pool of worker threads instead of one new
+    # thread each; a keep-alive connection holds its worker until it closes or idles out (--idle-timeout)
+    def __init__(self, address, handler, workers=16):
+        super().__init__(address, handler)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='api')
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._serve_connection, request, client_address)
+
+    def _serve_connection(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class StoreApiService:
+    # JSON endpoints over a warm Store; each method returns (status, payload)
+    def __init__(self, store, process_interval=1.0):
+        self.store = store
+        self.process_interval = process_interval
+        self._write_lock = threading.Lock()
+        self._orders_waiting = threading.Event()
+        self._stop_consumer = threading.Event()
+        self._consumer = None
+        self._routes = [
+            ('GET', ['products'], self.search_products),
+            ('GET', ['products', None], self.get_product),
+            ('GET', ['categories'], self.get_categories),
+            ('GET', ['categories', None], self.get_category),
+            ('POST', ['orders'], self.create_order),
+            ('GET', ['orders', None], self.get_order),
+            ('GET', ['recent-views', None], self.get_recent_views),
+            ('POST', ['recent-views', None], self.add_recent_view),
+            ('GET', ['health'], self.health)
+        ]
+
+    def warm_up(self):
+        self.store.initialize_system()
+        self.store.product_query.build_index()
+
+    def start_order_consumer(self):
+        # Orders placed through the API are processed here, in batches with one save each;
+        # orders arriving while a batch runs are picked up by the next one
+        if self._consumer is None:
+            self._stop_consumer.clear()
+            self._consumer = threading.Thread(target=self._consume_orders, name='order-consumer', daemon=True)
+            self._consumer.start()
+
+    def stop_order_consumer(self):
+        if self._consumer is not None:
+            self._stop_consumer.set()
+            self._orders_waiting.set()
+            self._consumer.join()
+            self._consumer = None
+
+    def process_pending_orders(self):
+        processed = 0
+        with self._write_lock:
+            self.store.order_queue.load_pending_orders()
+            while self.store.order_queue.get_queue_size():
+                processed += len(self.store.order_queue.process_batch_aggregated(ORDER_BATCH_SIZE,
+                                                                                 self.store.product_cache))
+        return processed
+
+    def _consume_orders(self):
+        # Also wakes up every process_interval, for orders queued before the server started.
+        # A failing batch is reported and retried on the next pass instead of ending the thread
+        while not self._stop_consumer.is_set():
+            self._orders_waiting.wait(self.process_interval)
+            self._orders_waiting.clear()
+            if self._stop_consumer.is_set():
+                break
+            try:
+                self.process_pending_orders()
+            except Exception as error:
+                print(f"Order processing failed: {error!r}", file=sys.stderr)
+
+    def dispatch(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        allowed = False
+        for route_method, pattern, handler in self._routes:
+            if len(pattern) != len(parts) or any(p is not None and p != part for p, part in zip(pattern, parts)):
+                continue
+            if route_method != method:
+                allowed = True
+                continue
+            params = [part for p, part in zip(pattern, parts) if p is None]
+            if method == 'GET':
+                # The order consumer updates the product indexes through the cache listeners;
+                # reads wait for the update in progress. Writes take _write_lock instead, which
+                # the consumer holds while it takes this one
+                with self.store.product_cache.lock:
+                    return handler(*params, query=query, body=body)
+            return handler(*params, query=query, body=body)
+        if allowed:
+            raise ApiError(405, "Method not allowed")
+        raise ApiError(404, "Not found")
+
+    def health(self, query, body):
+        return 200, {'status': 'ok', 'pending_orders': self.store.order_queue.get_queue_size()}
+
+    def search_products(self, query, body):
+        try:
+            product_query = ProductQuery(
+                name_terms=query.get('q'),
+                category_id=_int(query, 'category'),
+                price_min=_float(query, 'price_min'),
+                price_max=_float(query, 'price_max'),
+                in_stock_only=query.get('in_stock') in ('1', 'true'),
+                sort_by=query.get('sort'),
+                descending=query.get('desc') in ('1', 'true'),
+                limit=_int(query, 'limit') or 20,
+                offset=_int(query, 'offset') or 0
+            )
+        except ValueError as error:
+            raise ApiError(400, str(error))
+        products, total = self.store.product_query.search(product_query)
+        return 200, {'total': total, 'products': [product.to_dict() for product in products]}
+
+    def get_product(self, code, query, body):
+        product = self.store.product_cache.get_product(code)
+        if not product:
+            raise ApiError(404, f"Product '{code}' not found")
+        data = product.to_dict()
+        data['reserved'] = self.store.reservations.reserved(code)
+        data['viewed_together'] = [other for other, _ in self.store.co_views.related(code, 5)]
+        return 200, data
+
+    def get_categories(self, query, body):
+        return 200, self.store.category_tree.get_category_hierarchy()
+
+    def get_category(self, category_id, query, body):
+        category_id = _parse_int(category_id, 'category id')
+        category_data = next((c for c in self.store.database.categories if c.get('id') == category_id), None)
+        if not category_data:
+            raise ApiError(404, f"Category {category_id} not found")
+        category = Category.from_dict(category_data)
+        return 200, {
+            'category': category.to_dict(),
+            'path': self.store.category_tree.get_category_path(category_id),
+            'products': [product.code for product in self.store.category_tree.get_products_in_subtree(category_id)]
+        }
+
+    def create_order(self, query, body):
+        if not isinstance(body, dict):
+            raise ApiError(400, "Expected a JSON object")
+        items = body.get('items')
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            raise ApiError(400, "items must be a list of {code, qty}")
+        # Only code and quantity come from the client; names and prices from the catalog
+        items = [{'code': item.get('code'), 'qty': item.get('qty', 1)} for item in items]
+        with self._write_lock:
+            try:
+                order = self.store.place_order(str(body.get('customer_name') or '').strip(), items,
+                                               str(body.get('priority', 'NORMAL')).upper())
+            except ValueError as error:
+                raise ApiError(422, str(error))
+        self._orders_waiting.set()
+        return 201, order.to_dict()
+
+    def get_order(self, order_id, query, body):
+        order_data = self.store.database.get_order(_parse_int(order_id, 'order id'))
+        if not order_data:
+            raise ApiError(404, f"Order {order_id} not found")
+        return 200, Order.from_dict(order_data).to_dict()
+
+    def get_recent_views(self, identifier, query, body):
+        return 200, {'identifier': identifier, 'stack': self.store.recent_view_manager.get_recent_views(identifier)}
+
+    def add_recent_view(self, identifier, query, body):
+        code = body.get('code') if isinstance(body, dict) else None
+        if not code or not self.store.product_cache.get_product(code):
+            raise ApiError(422, f"Product '{code}' not found")
+        self.store.recent_view_manager.add_to_recent_view(identifier, code)
+        return 200, {'identifier': identifier, 'stack': self.store.recent_view_manager.get_recent_views(identifier)}
+
+def _parse_int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Invalid {name} '{value}'")
+
+def _int(query, name):
+    return None if query.get(name) in (None, '') else _parse_int(query[name], name)
+
+def _float(query, name):
+    if query.get(name) in (None, ''):
+        return None
+    try:
+        return float(query[name])
+    except ValueError:
+        raise ApiError(400, f"Invalid {name} '{query[name]}'")
+
+def make_handler(api, idle_timeout=5):
+    class StoreRequestHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps connections open between requests; without TCP_NODELAY the body,
+        # sent after the headers, waits for the client's delayed ACK (~40 ms per response)
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+        timeout = idle_timeout
+
+        def do_GET(self):
+            self._handle('GET')
+
+        def do_POST(self):
+            self._handle('POST')
+
+        def _handle(self, method):
+            url = urlsplit(self.path)
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            try:
+                body = None
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    try:
+                        body = json.loads(self.rfile.read(length))
+                    except (UnicodeDecodeError, json.JSONDecodeError):
+                        raise ApiError(400, "Invalid JSON body")
+                status, payload = api.dispatch(method, url.path, query, body)
+            except ApiError as error:
+                status, payload = error.status, {'error': str(error)}
+            except Exception as error:
+                status, payload = 500, {'error': str(error)}
+            data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StoreRequestHandler
+
+def main():
+    parser = argparse.ArgumentParser(description="Local JSON API over the store services")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--idle-timeout', type=float, default=5.0,
+                        help="seconds an idle keep-alive connection may hold a worker")
+    args = parser.parse_args()
+
+    store = Store()
+    api = StoreApiService(store)
+    api.warm_up()
+    server = PooledHTTPServer((args.host, args.port), make_handler(api, args.idle_timeout), args.workers)
+    print(f"Serving on http://{args.host}:{server.server_address[1]} with {args.workers} workers")
+    # Stopped by a service manager: leave through finally so pending recent views are saved
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    store.recent_view_manager.start_sweeper()
+    api.start_order_consumer()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        api.stop_order_consumer()
+        store.recent_view_manager.stop_sweeper()
+        store.recent_view_manager.flush()
+
+if __name__ == "__main__":
+    main()
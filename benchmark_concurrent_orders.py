@@ -0,0 +1,108 @@
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from database import JSONDatabase
+from models import Product, Order
+from product_cache import ProductCacheService
+from order_queue import OrderQueueService
+from concurrent_orders import ConcurrentOrderProcessor
+
+class LatencyOrderQueue(OrderQueueService):
+    # Models a per-order call to an external backend (payments, WMS) that releases the GIL
+    def __init__(self, database, latency):
+        super().__init__(database)
+        self.latency = latency
+
+    def _process_single_order(self, order_id, product_cache):
+        if self.latency:
+            time.sleep(self.latency)
+        return super()._process_single_order(order_id, product_cache)
+
+    def process_batch_aggregated(self, batch_size, product_cache):
+        # The same backend call per order, made one after another
+        processed = super().process_batch_aggregated(batch_size, product_cache)
+        if self.latency:
+            time.sleep(self.latency * len(processed))
+        return processed
+
+def build_store(path, orders, products, seed):
+    rng = random.Random(seed)
+    codes = [f"SKU-{i:06d}" for i in range(products)]
+    # Zipf-like popularity so a few SKUs are hot
+    weights = [1.0 / (rank + 1) ** 1.1 for rank in range(products)]
+    data = {
+        'categories': [],
+        'products': [Product(code, code, '', 10.0, orders, None).to_dict() for code in codes],
+        'orders': [],
+        'recent_views': [],
+        'next_order_id': orders + 1,
+        'next_category_id': 1
+    }
+    for order_id in range(1, orders + 1):
+        picked = set(rng.choices(codes, weights=weights, k=rng.randint(1, 3)))
+        items = [{'code': code, 'qty': rng.randint(1, 3)} for code in picked]
+        data['orders'].append(Order(order_id, f"customer-{order_id % 997}", items).to_dict())
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+def run(path, workers, latency, batch_size):
+    database = JSONDatabase(path)
+    product_cache = ProductCacheService(database)
+    product_cache.initialize_cache()
+    order_queue = LatencyOrderQueue(database, latency)
+    order_queue.load_pending_orders()
+    total = order_queue.get_queue_size()
+
+    # The outer batch keeps the (identical) final JSON write out of the timing
+    with database.batch():
+        started = time.perf_counter()
+        if workers == 0:
+            # The default path: batches decided in memory, one save each
+            while order_queue.get_queue_size():
+                order_queue.process_batch_aggregated(batch_size, product_cache)
+            stats = {}
+        else:
+            processor = ConcurrentOrderProcessor(order_queue, product_cache, workers=workers)
+            processor.process_all(batch_size)
+            stats = processor.get_stats()
+        elapsed = time.perf_counter() - started
+    return {
+        'workers': workers or 'aggregated',
+        'orders': total,
+        'seconds': round(elapsed, 3),
+        'orders_per_second': round(total / elapsed, 1),
+        'lanes': stats.get('lanes', 0),
+        'serial_orders': stats.get('serial_orders', total if not workers else 0)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent order processing benchmark")
+    parser.add_argument('--orders', type=int, default=100000)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--workers', default='4,8,16')
+    parser.add_argument('--batch', type=int, default=5000)
+    parser.add_argument('--latency-ms', type=float, default=0.0,
+                        help="simulated backend latency per order")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench_store.json')
+        latency = args.latency_ms / 1000
+        results = []
+        # Every run starts from the same freshly generated backlog
+        for workers in [0] + [int(w) for w in args.workers.split(',')]:
+            build_store(path, args.orders, args.products, args.seed)
+            results.append(run(path, workers, latency, args.batch))
+
+    # Relative to the aggregated path, which is what the store uses by default
+    baseline = results[0]['orders_per_second']
+    for result in results:
+        result['speedup'] = round(result['orders_per_second'] / baseline, 2)
+        print(json.dumps(result))
+
+if __name__ == "__main__":
+    main()
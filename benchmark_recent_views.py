@@ -0,0 +1,85 @@
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+from collections import OrderedDict
+from datetime import datetime
+from recent_stack import RecentViewStackService, CompactRecentViews
+
+class MemoryStore:
+    # Just enough of JSONDatabase for RecentViewStackService, kept in memory
+    def __init__(self):
+        self.views = {}
+
+    def get_recent_view(self, identifier):
+        return self.views.get(identifier)
+
+    def add_recent_view(self, recent_view_data):
+        pass
+
+    def update_recent_view(self, recent_view_data):
+        pass
+
+def generate_sessions(sessions, products, max_size, seed):
+    rng = random.Random(seed)
+    codes = [f"SKU-{i:06d}" for i in range(products)]
+    now = int(time.time())
+    for i in range(sessions):
+        yield f"session-{i:08d}", rng.sample(codes, rng.randint(1, max_size)), now - rng.randint(0, 60 * 24 * 3600)
+
+def build_stacks(sessions, max_size):
+    # The previous registry: one RecentViewStackService per session
+    store = MemoryStore()
+    registry = OrderedDict()
+    for identifier, codes, updated_at in sessions:
+        store.views[identifier] = {
+            'identifier': identifier,
+            'stack': codes,
+            'updated_at': datetime.fromtimestamp(updated_at).isoformat()
+        }
+        registry[identifier] = RecentViewStackService(identifier, store, max_size)
+        del store.views[identifier]
+    return registry
+
+def build_compact(sessions, max_size):
+    views = CompactRecentViews(max_size)
+    for identifier, codes, updated_at in sessions:
+        views.put(identifier, codes, updated_at)
+    return views
+
+def measure(builder, sessions, max_size):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    structure = builder(sessions, max_size)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return structure, current, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Recent-view session memory benchmark")
+    parser.add_argument('--sessions', type=int, default=200000)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--max-size', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    for name, builder in (('stacks', build_stacks), ('compact', build_compact)):
+        # Sessions are generated while tracing, so identifiers and codes count towards each layout
+        sessions = generate_sessions(args.sessions, args.products, args.max_size, args.seed)
+        structure, size, elapsed = measure(builder, sessions, args.max_size)
+        print(json.dumps({
+            'layout': name,
+            'sessions': args.sessions,
+            'bytes_per_session': round(size / args.sessions, 1),
+            'mb_per_million': round(size / args.sessions * 1000000 / 2 ** 20, 1),
+            'build_seconds': round(elapsed, 3)
+        }))
+        del structure
+
+if __name__ == "__main__":
+    main()
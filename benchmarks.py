@@ -0,0 +1,246 @@
+import argparse
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from data_generator import DataGenerator, SCALES
+from database import JSONDatabase
+from product_cache import ProductCacheService
+from search_index import ProductSearchIndex
+from category_tree import CategoryTreeService
+from order_queue import OrderQueueService
+from recent_stack import RecentViewManager
+from models import Order
+from load_test import percentile
+
+BASELINE_FILE = 'benchmark_baseline.json'
+# Slower or larger than the baseline by more than this share counts as a regression
+TOLERANCE = 0.25
+# Memory peaks this small are noise from the interpreter itself
+MEMORY_SLACK_KB = 64
+ORDER_BATCH = 500
+MEMORY_RUNS = 20
+ROUNDS = 3
+
+class BenchmarkContext:
+    # One generated store per scale, with the services built lazily so each operation
+    # only pays for what it uses
+    def __init__(self, path, seed):
+        self.path = path
+        self.rng = random.Random(seed)
+        self._database = None
+        self._product_cache = None
+        self._codes = None
+
+    @property
+    def database(self):
+        if self._database is None:
+            self._database = JSONDatabase(self.path)
+        return self._database
+
+    @property
+    def product_cache(self):
+        if self._product_cache is None:
+            self._product_cache = ProductCacheService(self.database)
+            self._product_cache.initialize_cache()
+        return self._product_cache
+
+    def codes(self, count=10000):
+        if self._codes is None:
+            products = self.database.products
+            self._codes = [products[self.rng.randrange(len(products))]['code'] for _ in range(count)]
+        return self._codes
+
+# -----------------------
+# OPERATIONS
+# -----------------------
+# Each setup receives the context and returns op(i), one timed operation
+
+def setup_load(context):
+    return lambda i: JSONDatabase(context.path)
+
+def setup_save(context):
+    database = context.database
+    return lambda i: database.save()
+
+def setup_product_lookup(context):
+    product_cache, codes = context.product_cache, context.codes()
+    return lambda i: product_cache.get_product(codes[i % len(codes)])
+
+def setup_name_search(context):
+    index = ProductSearchIndex(context.database)
+    index.build_index()
+    # Words and fragments taken from real product names, as a user would type them
+    terms = []
+    for code in context.codes()[:500]:
+        word = context.rng.choice(context.product_cache.get_product(code).name.split())
+        terms.append(word[:context.rng.randint(3, max(3, len(word)))])
+    return lambda i: index.search(terms[i % len(terms)])
+
+def setup_subtree_query(context):
+    # Without the result cache, so each query measures the tree walk and product filter
+    tree = CategoryTreeService(context.database, context.product_cache)
+    ids = [category['id'] for category in context.database.categories]
+    picks = [context.rng.choice(ids) for _ in range(1000)]
+    return lambda i: tree.get_products_in_subtree(picks[i % len(picks)])
+
+def setup_hierarchy_build(context):
+    tree = CategoryTreeService(context.database, context.product_cache)
+    tree.build_tree_index()
+
+    def op(i):
+        tree.invalidate_cache()
+        return tree.get_category_hierarchy()
+    return op
+
+def setup_order_batch(context):
+    # Queues fresh PENDING orders over popular codes, then times one batch per operation
+    database = context.database
+    codes = context.codes()
+    with database.batch():
+        # Enough for the timed batches and the memory pass
+        for _ in range(ORDER_BATCH * (OPERATIONS['order_batch'][1] + MEMORY_RUNS)):
+            items = [{'code': context.rng.choice(codes), 'qty': 1} for _ in range(context.rng.randint(1, 3))]
+            database.add_order(Order(database.get_next_order_id(), 'benchmark', items).to_dict())
+    queue = OrderQueueService(database)
+    queue.load_pending_orders()
+    return lambda i: queue.process_batch_aggregated(ORDER_BATCH, context.product_cache)
+
+def setup_recent_view_add(context):
+    manager = RecentViewManager(context.database)
+    codes = context.codes()
+    sessions = [f"bench-{n:06d}" for n in range(5000)]
+    return lambda i: manager.add_to_recent_view(sessions[i % len(sessions)], codes[i % len(codes)])
+
+# name -> (setup, maximum operations per run)
+OPERATIONS = {
+    'load': (setup_load, 5),
+    'save': (setup_save, 5),
+    'product_lookup': (setup_product_lookup, 200000),
+    'name_search': (setup_name_search, 2000),
+    'subtree_query': (setup_subtree_query, 2000),
+    'hierarchy_build': (setup_hierarchy_build, 200),
+    'order_batch': (setup_order_batch, 20),
+    'recent_view_add': (setup_recent_view_add, 100000)
+}
+
+def measure(op, max_ops, seconds):
+    # Timed without tracemalloc, which slows Python code several times over. The budget is
+    # split in rounds and the best round's median is kept, like timeit keeps the best repeat
+    latencies = []
+    round_medians = []
+    for _ in range(ROUNDS):
+        gc.collect()
+        deadline = time.perf_counter() + seconds / ROUNDS
+        timings = []
+        while len(timings) < max(1, max_ops // ROUNDS) and (not timings or time.perf_counter() < deadline):
+            started = time.perf_counter()
+            op(len(latencies) + len(timings))
+            timings.append(time.perf_counter() - started)
+        round_medians.append(percentile(sorted(timings), 0.50))
+        latencies.extend(timings)
+    total = sum(latencies)
+    latencies.sort()
+
+    # A separate short pass for the memory peak, counted from what was allocated before it
+    gc.collect()
+    tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    for i in range(min(len(latencies), MEMORY_RUNS)):
+        op(len(latencies) + i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ops': len(latencies),
+        'ops_per_sec': round(len(latencies) / total, 1) if total else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 4),
+        'best_p50_ms': round(min(round_medians) * 1000, 4),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 4),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 4),
+        'peak_memory_kb': round((peak - baseline) / 1024, 1)
+    }
+
+def run_scale(scale, operations, seconds, seed, directory):
+    path = os.path.join(directory, f"{scale}.json")
+    generated = DataGenerator(seed, **SCALES[scale]).write(path)
+    results = {'records': {name: count for name, count in generated.items() if name != 'seconds'}}
+    context = BenchmarkContext(path, seed)
+    for name in operations:
+        setup, max_ops = OPERATIONS[name]
+        results[name] = measure(setup(context), max_ops, seconds)
+        print(f"{scale} {name}: {results[name]['ops_per_sec']} ops/s", file=sys.stderr)
+    return results
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    # Lists every operation that got slower or uses more memory than the baseline allows.
+    # Speed is judged on the best round's median latency, which a busy machine moves least
+    regressions = []
+    for scale, operations in results['scales'].items():
+        for name, current in operations.items():
+            previous = baseline.get('scales', {}).get(scale, {}).get(name)
+            if name == 'records' or not previous:
+                continue
+            limits = {
+                'best_p50_ms': previous['best_p50_ms'] * (1 + tolerance),
+                'peak_memory_kb': previous['peak_memory_kb'] * (1 + tolerance) + MEMORY_SLACK_KB
+            }
+            for metric, limit in limits.items():
+                if current[metric] > limit:
+                    regressions.append({
+                        'scale': scale,
+                        'operation': name,
+                        'metric': metric,
+                        'baseline': previous[metric],
+                        'current': current[metric],
+                        'limit': round(limit, 4)
+                    })
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the store services at several data sizes")
+    parser.add_argument('--scales', default='small,medium', help=f"comma separated, from {', '.join(SCALES)}")
+    parser.add_argument('--operations', default=','.join(OPERATIONS), help="comma separated subset")
+    parser.add_argument('--seconds', type=float, default=2.0, help="time budget per operation")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    scales = [scale.strip() for scale in args.scales.split(',') if scale.strip()]
+    operations = [name.strip() for name in args.operations.split(',') if name.strip()]
+    unknown = [name for name in scales if name not in SCALES] + [name for name in operations if name not in OPERATIONS]
+    if unknown:
+        parser.error(f"unknown scale or operation: {', '.join(unknown)}")
+    # Always run in OPERATIONS order, so the ones that change the store come last
+    operations = [name for name in OPERATIONS if name in operations]
+
+    directory = tempfile.mkdtemp(prefix='store-bench-')
+    try:
+        results = {
+            'python': sys.version.split()[0],
+            'seconds_per_operation': args.seconds,
+            'scales': {scale: run_scale(scale, operations, args.seconds, args.seed, directory) for scale in scales}
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results['regressions'] = regressions
+    print(json.dumps(results, indent=2))
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
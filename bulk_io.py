@@ -0,0 +1,306 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from models import Product, Category, Order
+from stock_ledger import stock_movement, RESTOCK, ADJUSTMENT
+
+PRODUCT_FIELDS = ['code', 'name', 'description', 'price', 'stock', 'category_id', 'reorder_level', 'created_at']
+CATEGORY_FIELDS = ['id', 'name', 'parent_id']
+ORDER_FIELDS = ['id', 'customer_name', 'status', 'priority', 'total', 'created_at', 'items']
+IMPORT_STATUSES = ('PENDING', 'DONE', 'CANCELLED')
+PRIORITIES = ('NORMAL', 'EXPRESS')
+
+def detect_format(path, fmt=None):
+    fmt = (fmt or os.path.splitext(path)[1].lstrip('.')).lower()
+    if fmt not in ('csv', 'jsonl'):
+        raise ValueError(f"Unsupported format '{fmt}', use csv or jsonl")
+    return fmt
+
+def read_rows(path, fmt=None):
+    # Yields (line number, row, error) one line at a time; blank CSV cells count as missing
+    fmt = detect_format(path, fmt)
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, {key: value for key, value in row.items() if key and value not in ('', None)}, None
+        else:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as error:
+                    yield line_number, None, f"Invalid JSON: {error.msg}"
+                    continue
+                if isinstance(row, dict):
+                    yield line_number, row, None
+                else:
+                    yield line_number, None, "Expected a JSON object"
+
+def _number(row, field, kind, default=None, minimum=None):
+    value = row.get(field)
+    if value is None:
+        return default
+    try:
+        value = kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field} '{row.get(field)}'")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{field} cannot be lower than {minimum}")
+    return value
+
+def _text(row, field, default=None):
+    value = row.get(field)
+    return default if value is None else str(value).strip()
+
+def _parse_items(value):
+    # JSON list of items, or the short CSV form "LAP-001:2;CAM-001:1"
+    if isinstance(value, str):
+        value = value.strip()
+        if value.startswith('['):
+            value = json.loads(value)
+        else:
+            items = []
+            for part in filter(None, value.split(';')):
+                code, _, qty = part.partition(':')
+                items.append({'code': code.strip(), 'qty': qty.strip() or 1})
+            value = items
+    if not isinstance(value, list) or not value:
+        raise ValueError("Order needs at least one item")
+    return value
+
+class BulkIOService:
+    # Streams rows from CSV or JSONL files and applies them chunk by chunk: each chunk
+    # is validated in memory, then written with a single save inside database.batch()
+    def __init__(self, database, product_cache, category_tree=None, order_queue=None,
+                 reservations=None, chunk_size=100000, max_errors=1000):
+        self.database = database
+        self.product_cache = product_cache
+        self.category_tree = category_tree
+        self.order_queue = order_queue
+        self.reservations = reservations
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+    # -----------------------
+    # IMPORT
+    # -----------------------
+    def import_products(self, path, fmt=None):
+        category_ids = {cat['id'] for cat in self.database.categories}
+        if self.reservations is not None:
+            self.reservations.load_reservations()
+        return self._import(path, fmt, lambda row: self._parse_product(row, category_ids), self._apply_products)
+
+    def import_categories(self, path, fmt=None):
+        known = {cat['id']: cat.get('parent_id') for cat in self.database.categories}
+        report = self._import(path, fmt, lambda row: self._parse_category(row, known), self._apply_categories)
+        if self.category_tree is not None:
+            self.category_tree.invalidate_cache()
+        return report
+
+    def import_orders(self, path, fmt=None):
+        self.product_cache.initialize_cache()
+        if self.order_queue is not None:
+            self.order_queue.load_pending_orders()
+        if self.reservations is not None:
+            self.reservations.load_reservations()
+        seen = set()
+        return self._import(path, fmt, lambda row: self._parse_order(row, seen), self._apply_orders)
+
+    def _import(self, path, fmt, parse, apply):
+        started = time.perf_counter()
+        report = {'rows': 0, 'imported': 0, 'updated': 0, 'errors': 0, 'chunks': 0, 'error_rows': []}
+        rows = read_rows(path, fmt)
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            valid = []
+            with self.database.batch():
+                for line_number, row, error in chunk:
+                    report['rows'] += 1
+                    if error is None:
+                        try:
+                            valid.append(parse(row))
+                        except (AttributeError, KeyError, TypeError, ValueError) as parse_error:
+                            error = str(parse_error)
+                    if error is not None:
+                        report['errors'] += 1
+                        if len(report['error_rows']) < self.max_errors:
+                            report['error_rows'].append((line_number, error))
+                added, updated = apply(valid)
+            report['imported'] += added
+            report['updated'] += updated
+            report['chunks'] += 1
+        report['seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _parse_product(self, row, category_ids):
+        code = _text(row, 'code')
+        if not code:
+            raise ValueError("Missing code")
+        existing = self.database.get_product(code) or {}
+        name = _text(row, 'name', existing.get('name'))
+        if not name:
+            raise ValueError("Missing name")
+        category_id = _number(row, 'category_id', int, existing.get('category_id'))
+        if category_id is not None and category_id not in category_ids:
+            raise ValueError(f"Category {category_id} does not exist")
+        product = Product(
+            code,
+            name,
+            _text(row, 'description', existing.get('description', '')),
+            _number(row, 'price', float, existing.get('price', 0.0), minimum=0),
+            _number(row, 'stock', int, existing.get('stock', 0), minimum=0),
+            category_id,
+            _number(row, 'reorder_level', int, existing.get('reorder_level'), minimum=0)
+        )
+        if self.reservations is not None and product.stock < self.reservations.reserved(code):
+            raise ValueError(f"Stock cannot be lower than the {self.reservations.reserved(code)} units reserved by pending orders")
+        product.created_at = _text(row, 'created_at', existing.get('created_at', product.created_at))
+        return product
+
+    def _apply_products(self, products):
+        added = updated = 0
+        latest, previous_stock = {}, {}
+        for product in products:
+            # Looked up again here, since a code can appear twice in one chunk
+            existing = self.database.get_product(product.code)
+            if existing is None:
+                self.database.add_product(product.to_dict())
+                added += 1
+            else:
+                self.database.update_product(product.to_dict())
+                updated += 1
+            if product.code not in latest:
+                previous_stock[product.code] = existing.get('stock', 0) if existing else None
+            latest[product.code] = product
+        # Caches and indexes see the final row of each code, once per chunk and movement kind
+        restocked, adjusted = [], []
+        for code, product in latest.items():
+            if previous_stock[code] is None or product.stock > previous_stock[code]:
+                restocked.append(product)
+            else:
+                adjusted.append(product)
+        with stock_movement(RESTOCK):
+            self.product_cache.update_products(restocked)
+        with stock_movement(ADJUSTMENT):
+            self.product_cache.update_products(adjusted)
+        return added, updated
+
+    def _parse_category(self, row, known):
+        # Parents must exist already or come earlier in the file
+        name = _text(row, 'name')
+        if not name:
+            raise ValueError("Missing name")
+        category_id = _number(row, 'id', int)
+        parent_id = _number(row, 'parent_id', int)
+        if parent_id is not None and parent_id not in known:
+            raise ValueError(f"Parent category {parent_id} does not exist")
+        if category_id is None:
+            category_id = self.database.get_next_category_id()
+        ancestor = parent_id
+        while ancestor is not None:
+            if ancestor == category_id:
+                raise ValueError("A category cannot be moved under itself")
+            ancestor = known.get(ancestor)
+        updated = category_id in known
+        known[category_id] = parent_id
+        return Category(category_id, name, parent_id), updated
+
+    def _apply_categories(self, parsed):
+        added = updated = 0
+        positions = {cat['id']: i for i, cat in enumerate(self.database.categories)}
+        for category, is_update in parsed:
+            if is_update and category.id in positions:
+                self.database.categories[positions[category.id]] = category.to_dict()
+                self.database.save()
+                updated += 1
+            else:
+                positions[category.id] = len(self.database.categories)
+                self.database.add_category(category.to_dict())
+                added += 1
+        next_id = max(positions, default=0) + 1
+        if self.database.data.get('next_category_id', 1) < next_id:
+            self.database.data['next_category_id'] = next_id
+        return added, updated
+
+    def _parse_order(self, row, seen):
+        customer_name = _text(row, 'customer_name')
+        if not customer_name:
+            raise ValueError("Missing customer_name")
+        status = _text(row, 'status', 'PENDING').upper()
+        if status not in IMPORT_STATUSES:
+            raise ValueError(f"Invalid status '{status}', use {', '.join(IMPORT_STATUSES)}")
+        priority = _text(row, 'priority', 'NORMAL').upper()
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority '{priority}'")
+        items = []
+        for item in _parse_items(row.get('items')):
+            code = str(item.get('code', '')).strip()
+            if not self.product_cache.get_product(code):
+                raise ValueError(f"Product '{code}' not found")
+            line = dict(item, code=code, qty=_number(item, 'qty', int, 1, minimum=1))
+            if 'price' in line:
+                line['price'] = _number(line, 'price', float, minimum=0)
+            items.append(line)
+        order_id = _number(row, 'id', int)
+        if order_id is not None and (order_id in seen or self.database.get_order(order_id)):
+            raise ValueError(f"Order {order_id} already exists")
+        if order_id is None:
+            order_id = self.database.get_next_order_id()
+        seen.add(order_id)
+        order = Order(order_id, customer_name, items, status, priority)
+        order.created_at = _text(row, 'created_at', order.created_at)
+        order.capture_prices(self.product_cache)
+        return order
+
+    def _apply_orders(self, orders):
+        for order in orders:
+            order_data = order.to_dict()
+            if order.status == 'PENDING':
+                if self.reservations is not None:
+                    # Orders that do not fit stay unreserved and are re-checked when processed
+                    self.reservations.reserve(order.id, order.items)
+                if self.order_queue is not None:
+                    self.order_queue.add_order(order.id, order_data)
+            self.database.add_order(order_data)
+        if orders:
+            next_id = max(order.id for order in orders) + 1
+            if self.database.data.get('next_order_id', 1) < next_id:
+                self.database.data['next_order_id'] = next_id
+        return len(orders), 0
+
+    # -----------------------
+    # EXPORT
+    # -----------------------
+    def export_products(self, path, fmt=None):
+        return self._export(path, fmt, self.database.products, PRODUCT_FIELDS)
+
+    def export_categories(self, path, fmt=None):
+        return self._export(path, fmt, self.database.categories, CATEGORY_FIELDS)
+
+    def export_orders(self, path, fmt=None):
+        return self._export(path, fmt, self.database.orders, ORDER_FIELDS)
+
+    def _export(self, path, fmt, records, fields):
+        fmt = detect_format(path, fmt)
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if fmt == 'csv':
+                writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+                writer.writeheader()
+                for record in records:
+                    row = {field: record.get(field) for field in fields}
+                    if 'items' in row:
+                        row['items'] = json.dumps(row['items'], ensure_ascii=False)
+                    writer.writerow(row)
+                    count += 1
+            else:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                    count += 1
+        return count
@@ -1,9 +1,17 @@
 from models import Category, Product
 
 class CategoryTreeService:
-    def __init__(self, database):
+    def __init__(self, database, product_cache=None, result_cache=None):
         self.database = database
+        self.product_cache = product_cache
+        self.result_cache = result_cache
         self._cache = {}
+        self._parents = None
+        self._names = None
+        self._children = None            # parent_id (None for roots) -> [category ids], stored order
+        self._category_products = {}     # category_id -> {code: None}, stored order
+        self._product_category = {}      # code -> category_id
+        self._products_indexed = False
     
     def get_subtree_categories(self, category_id):
         if category_id in self._cache:
@@ -30,43 +38,145 @@ class CategoryTreeService:
         categories = self.get_subtree_categories(category_id)
         category_ids = [cat.id for cat in categories]
         
+        if self.result_cache is not None and self.product_cache is not None:
+            subtree_ids = set(category_ids)
+            codes = self.result_cache.get_or_compute(
+                ('category', category_id),
+                lambda: [p['code'] for p in self.database.products if p.get('category_id') in subtree_ids],
+                lambda product: product.category_id in subtree_ids,
+                fields=('category_id',)
+            )
+            products = [self.product_cache.get_product(code) for code in codes]
+            return [Product.from_dict(product.to_dict()) for product in products if product]
+        
         products = []
         for product_data in self.database.products:
             if product_data.get('category_id') in category_ids:
                 products.append(Product.from_dict(product_data))
         return products
     
+    def get_category_path(self, category_id):
+        # The category followed by its ancestors up to the root
+        if self._parents is None:
+            self._parents = {cat['id']: cat.get('parent_id') for cat in self.database.categories}
+        path = []
+        while category_id in self._parents and category_id not in path:
+            path.append(category_id)
+            category_id = self._parents[category_id]
+        return path
+    
     def get_category_hierarchy(self, category_id=None):
-        categories_dict = {cat['id']: Category.from_dict(cat) for cat in self.database.categories}
+        self.build_tree_index()
         
         def build_node(cat_id):
-            category = categories_dict.get(cat_id)
-            if not category:
+            if cat_id not in self._names:
                 return {}
             
             node = {
-                'id': category.id,
-                'name': category.name,
-                'product_count': len([p for p in self.database.products if p.get('category_id') == cat_id]),
+                'id': cat_id,
+                'name': self._names[cat_id],
+                'product_count': self.get_product_count(cat_id),
                 'children': {}
             }
             
-            children = [cat for cat in categories_dict.values() if cat.parent_id == cat_id]
-            for child in children:
-                node['children'][child.name] = build_node(child.id)
+            for child_id in self._children.get(cat_id, []):
+                node['children'][self._names[child_id]] = build_node(child_id)
             
             return node
         
         if category_id is None:
-            root_categories = [cat for cat in categories_dict.values() if not cat.parent_id]
             hierarchy = {}
-            for root in root_categories:
-                hierarchy[root.name] = build_node(root.id)
+            for root_id in self._children.get(None, []):
+                hierarchy[self._names[root_id]] = build_node(root_id)
             return hierarchy
         else:
             return build_node(category_id)
     
+    # -----------------------
+    # TREE INDEX
+    # -----------------------
+    def build_tree_index(self):
+        # Children per category and products per category, so tree views read counts
+        # from dictionaries instead of scanning every product for every node
+        if self._children is None:
+            self._names = {}
+            self._children = {}
+            for cat in self.database.categories:
+                self._names[cat['id']] = cat.get('name')
+                self._children.setdefault(cat.get('parent_id') or None, []).append(cat['id'])
+        if not self._products_indexed:
+            for product_data in self.database.products:
+                self._index_product(product_data['code'], product_data.get('category_id'))
+            self._products_indexed = True
+    
+    def get_children(self, category_id=None):
+        self.build_tree_index()
+        return list(self._children.get(category_id, []))
+    
+    def get_product_count(self, category_id):
+        self.build_tree_index()
+        return len(self._category_products.get(category_id, ()))
+    
+    def iter_tree_lines(self, category_id=None, max_depth=None, product_limit=None):
+        # Yields the tree one line at a time, depth first and without recursion. Nodes at
+        # max_depth show how many subcategories they hide, and product lists longer than
+        # product_limit are shown as a count; category_id renders only that subtree
+        self.build_tree_index()
+        if category_id is None:
+            roots = self._children.get(None, [])
+        else:
+            roots = [category_id] if category_id in self._names else []
+        stack = [(root_id, 0, index == len(roots) - 1) for index, root_id in enumerate(roots)]
+        stack.reverse()
+        while stack:
+            cat_id, level, is_last = stack.pop()
+            indent = "    " * level
+            connector = "└── " if is_last else "├── "
+            codes = self._category_products.get(cat_id, {})
+            yield f"{indent}{connector}{self._names[cat_id]} [{cat_id}] ({len(codes)} products)"
+            
+            if product_limit is not None and len(codes) > product_limit:
+                yield f"{indent}    ... {len(codes)} products, expand this category to list them"
+            else:
+                for code in codes:
+                    product_data = self.database.get_product(code)
+                    if product_data:
+                        yield f"{indent}    {product_data.get('name')} (${product_data.get('price', 0.0)})"
+            
+            children = self._children.get(cat_id, [])
+            if not children:
+                continue
+            if max_depth is not None and level >= max_depth:
+                yield f"{indent}    [+{len(children)} subcategories]"
+                continue
+            children = sorted(children, key=lambda child_id: self._names[child_id])
+            for index in range(len(children) - 1, -1, -1):
+                stack.append((children[index], level + 1, index == len(children) - 1))
+    
+    def product_updated(self, product):
+        if self._products_indexed and self._product_category.get(product.code, ()) != product.category_id:
+            self._unindex_product(product.code)
+            self._index_product(product.code, product.category_id)
+    
+    def product_removed(self, code):
+        if self._products_indexed:
+            self._unindex_product(code)
+    
+    def _index_product(self, code, category_id):
+        self._product_category[code] = category_id
+        self._category_products.setdefault(category_id, {})[code] = None
+    
+    def _unindex_product(self, code):
+        if code in self._product_category:
+            codes = self._category_products.get(self._product_category.pop(code))
+            if codes is not None:
+                codes.pop(code, None)
+    
     def invalidate_cache(self, category_id=None):
+        if self.result_cache is not None:
+            self.result_cache.invalidate_all()
+        self._parents = None
+        self._children = None
         if category_id:
             keys_to_remove = [key for key in self._cache.keys() if key == category_id]
             for key in keys_to_remove:
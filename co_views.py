@@ -0,0 +1,84 @@
+import threading
+from ranking import CountRanking
+
+def _stack_pairs(stack):
+    codes = sorted(set(stack))
+    return {(code, other) for i, code in enumerate(codes) for other in codes[i + 1:]}
+
+class CoViewService:
+    # Sparse co-occurrence of products in the current recent-view stacks: for each pair,
+    # the number of stacks holding both. Each product keeps a ranking of the products seen
+    # with it, so the top k related ones are a slice. rebuild() counts the stored stacks and
+    # stack_changed() keeps the same counts as stacks change, so a restart gives the same result
+    def __init__(self, database):
+        self.database = database
+        self._related = {}  # product code -> CountRanking of co-viewed codes
+        self._pairs = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def load(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def rebuild(self):
+        # Counts every pair of products found together in the stored stacks
+        with self._lock:
+            counts = {}
+            for recent_view_data in self.database.recent_views:
+                stack = list(dict.fromkeys(recent_view_data.get('stack', [])))
+                for i, code in enumerate(stack):
+                    for other in stack[i + 1:]:
+                        self._count(counts, code, other)
+                        self._count(counts, other, code)
+            self._related = {}
+            for code, values in counts.items():
+                ranking = CountRanking()
+                ranking.load(values)
+                self._related[code] = ranking
+            self._pairs = sum(len(values) for values in counts.values()) // 2
+            self._loaded = True
+            return self._pairs
+
+    def stack_changed(self, old_stack, new_stack):
+        # Pairs only in the old stack lose one count and pairs only in the new one gain one
+        with self._lock:
+            if not self._loaded:
+                return
+            old_pairs, new_pairs = _stack_pairs(old_stack), _stack_pairs(new_stack)
+            for code, other in old_pairs - new_pairs:
+                self._add(code, other, -1)
+                self._add(other, code, -1)
+            for code, other in new_pairs - old_pairs:
+                self._add(code, other, 1)
+                self._add(other, code, 1)
+
+    def related(self, code, k=5):
+        # [(code, times viewed together)], most frequent first
+        with self._lock:
+            self.load()
+            ranking = self._related.get(code)
+            if ranking is None:
+                return []
+            return [(other, ranking.get(other)) for other in ranking.top(k)]
+
+    def get_coview_stats(self):
+        with self._lock:
+            return {'products': len(self._related), 'pairs': self._pairs}
+
+    def _add(self, code, other, amount):
+        ranking = self._related.get(code)
+        if ranking is None:
+            ranking = self._related[code] = CountRanking()
+        previous = ranking.get(other)
+        ranking.add(other, amount)
+        if code < other:
+            self._pairs += (previous + amount > 0) - (previous > 0)
+        if ranking.get(other) <= 0:
+            ranking.discard(other)
+            if not len(ranking):
+                del self._related[code]
+
+    def _count(self, counts, code, other):
+        values = counts.setdefault(code, {})
+        values[other] = values.get(other, 0) + 1
@@ -0,0 +1,294 @@
+import argparse
+import json
+import os
+import random
+import shutil
+import time
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+STORE_FILE = 'store_data.json'
+WRITE_CHUNK = 10000
+
+# Named sizes, also used by the benchmarks
+SCALES = {
+    'small': {'categories': 50, 'products': 10000, 'orders': 5000, 'sessions': 2000},
+    'medium': {'categories': 1000, 'products': 100000, 'orders': 50000, 'sessions': 20000},
+    'large': {'categories': 10000, 'products': 1000000, 'orders': 500000, 'sessions': 200000},
+    'xlarge': {'categories': 10000, 'products': 3000000, 'orders': 2000000, 'sessions': 1000000}
+}
+
+ADJECTIVES = ['Classic', 'Deluxe', 'Compact', 'Vintage', 'Premium', 'Eco', 'Smart', 'Ultra', 'Mini', 'Pro',
+              'Retro', 'Portable', 'Silent', 'Rugged', 'Limited', 'Cosmic', 'Urban', 'Signed', 'Collector', 'Basic']
+NOUNS = ['Comic', 'Poster', 'Figure', 'Lamp', 'Notebook', 'Mug', 'Shirt', 'Backpack', 'Headphones', 'Tablet',
+         'Keyboard', 'Speaker', 'Chair', 'Watch', 'Camera', 'Novel', 'Board Game', 'Puzzle', 'Cap', 'Sticker Pack']
+SECTIONS = ['Comics', 'Manga', 'Books', 'Games', 'Toys', 'Music', 'Clothing', 'Home', 'Tech', 'Art',
+            'Collectibles', 'Posters', 'Stationery', 'Figures', 'Movies', 'Magazines']
+FIRST_NAMES = ['Juan', 'María', 'Carlos', 'Lucía', 'Sofía', 'Mateo', 'Valentina', 'Diego', 'Camila', 'Martín',
+               'Julieta', 'Tomás', 'Ana', 'Pedro', 'Florencia', 'Nicolás']
+LAST_NAMES = ['Pérez', 'García', 'López', 'Fernández', 'González', 'Rodríguez', 'Martínez', 'Sánchez',
+              'Romero', 'Díaz', 'Álvarez', 'Torres', 'Ruiz', 'Gómez']
+
+# Orders arrive mostly in the afternoon and evening
+HOUR_WEIGHTS = list(accumulate([1, 1, 1, 1, 1, 1, 2, 3, 5, 6, 7, 8, 9, 8, 7, 7, 8, 9, 10, 10, 9, 7, 4, 2]))
+# One to five lines per order, most orders have one
+ITEM_COUNT_WEIGHTS = list(accumulate([50, 25, 13, 8, 4]))
+
+class ZipfSampler:
+    # Draws indices in [0, n) with probability proportional to 1 / rank ** s. Ranks are
+    # shuffled over the indices, so the popular items are spread over the whole catalog
+    def __init__(self, n, s, rng):
+        self._cumulative = array('d', accumulate(1.0 / rank ** s for rank in range(1, n + 1)))
+        self._items = array('I', range(n))
+        rng.shuffle(self._items)
+        self._rng = rng
+
+    def sample(self):
+        total = self._cumulative[-1]
+        rank = bisect_right(self._cumulative, self._rng.random() * total)
+        return self._items[min(rank, len(self._items) - 1)]
+
+    def sample_distinct(self, k):
+        # At most k different items; a heavy head makes repeats likely, so tries are capped
+        picked = {}
+        for _ in range(k * 4):
+            picked[self.sample()] = None
+            if len(picked) == k:
+                break
+        return list(picked)
+
+class DataGenerator:
+    # Builds a store of the requested size from a seed. Each section draws from its own
+    # random stream, so changing one size leaves the other sections unchanged
+    def __init__(self, seed=42, categories=50, products=10000, orders=5000, sessions=2000, shape='wide',
+                 depth=None, roots=None, skew=1.1, days=365, end=None, stack_size=5):
+        if shape not in ('wide', 'deep'):
+            raise ValueError(f"Unknown tree shape '{shape}', use wide or deep")
+        self.seed = seed
+        self.category_count = max(1, categories)
+        self.product_count = max(1, products)
+        self.order_count = orders
+        self.session_count = sessions
+        self.shape = shape
+        self.depth = depth if depth is not None else (3 if shape == 'wide' else 25)
+        self.roots = roots if roots is not None else (10 if shape == 'wide' else 3)
+        self.skew = skew
+        self.days = days
+        # A fixed end date makes the output byte for byte repeatable; by default it is today
+        self.end = end or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.stack_size = stack_size
+        self._leaves = None
+        self._prices = None
+        self._names = None
+        self._popularity = None
+
+    def _rng(self, section):
+        return random.Random(f"{self.seed}-{section}")
+
+    # -----------------------
+    # CATEGORIES
+    # -----------------------
+    def generate_categories(self):
+        # wide: parents are picked at random among categories above the depth limit.
+        # deep: each category continues the last chain until it reaches the depth limit
+        rng = self._rng('categories')
+        depths = {}
+        open_parents = []
+        has_children = set()
+        categories = []
+        for category_id in range(1, self.category_count + 1):
+            if category_id <= self.roots or not open_parents:
+                parent_id = None
+            elif self.shape == 'deep' and depths[category_id - 1] < self.depth:
+                parent_id = category_id - 1
+            else:
+                parent_id = rng.choice(open_parents)
+            depths[category_id] = 0 if parent_id is None else depths[parent_id] + 1
+            if depths[category_id] < self.depth:
+                open_parents.append(category_id)
+            if parent_id is not None:
+                has_children.add(parent_id)
+            categories.append({'id': category_id, 'name': f"{rng.choice(SECTIONS)} {category_id}", 'parent_id': parent_id})
+        # Products go to the leaves, like a real catalog
+        self._leaves = [category['id'] for category in categories if category['id'] not in has_children]
+        return categories
+
+    # -----------------------
+    # PRODUCTS
+    # -----------------------
+    def product_code(self, index):
+        return f"SKU-{index:07d}"
+
+    def _prepare_products(self):
+        # Prices, names and categories are kept as small arrays, so orders can snapshot them later
+        # without holding a million product dicts in memory
+        if self._prices is not None:
+            return
+        if self._leaves is None:
+            self.generate_categories()
+        rng = self._rng('catalog')
+        self._prices = array('d', (round(min(rng.lognormvariate(3.5, 1.0), 5000.0) + 0.99, 2)
+                                   for _ in range(self.product_count)))
+        self._names = array('H', (rng.randrange(len(ADJECTIVES)) * len(NOUNS) + rng.randrange(len(NOUNS))
+                                  for _ in range(self.product_count)))
+        # Some categories are much larger than others
+        leaves = ZipfSampler(len(self._leaves), 0.8, self._rng('category-sizes'))
+        self._categories = array('I', (self._leaves[leaves.sample()] for _ in range(self.product_count)))
+        self._popularity = ZipfSampler(self.product_count, self.skew, self._rng('popularity'))
+
+    def product_name(self, index):
+        adjective, noun = divmod(self._names[index], len(NOUNS))
+        return f"{ADJECTIVES[adjective]} {NOUNS[noun]} {index}"
+
+    def generate_products(self):
+        self._prepare_products()
+        rng = self._rng('products')
+        start = self.end - timedelta(days=self.days)
+        for index in range(self.product_count):
+            roll = rng.random()
+            stock = 0 if roll < 0.05 else rng.randint(1, 10) if roll < 0.2 else rng.randint(10, 500)
+            yield {
+                'code': self.product_code(index),
+                'name': self.product_name(index),
+                'description': f"{NOUNS[self._names[index] % len(NOUNS)].lower()} from the {rng.choice(SECTIONS).lower()} section",
+                'price': self._prices[index],
+                'stock': stock,
+                'category_id': self._categories[index],
+                'reorder_level': rng.choice((None, None, None, 5, 10, 20)),
+                'created_at': (start + timedelta(seconds=rng.randrange(self.days * 86400))).isoformat()
+            }
+
+    # -----------------------
+    # ORDERS
+    # -----------------------
+    def generate_orders(self, done_share=0.85, cancelled_share=0.05, pending_hours=24):
+        # Timestamps follow a daily curve and ids follow time. Orders placed in the last
+        # pending_hours are still PENDING; older ones are DONE or CANCELLED
+        self._prepare_products()
+        rng = self._rng('orders')
+        customers = ZipfSampler(max(1, self.order_count // 5), 0.9, self._rng('customers'))
+        start = self.end - timedelta(days=self.days)
+        times = sorted(
+            rng.randrange(self.days) * 86400 + rng.choices(range(24), cum_weights=HOUR_WEIGHTS)[0] * 3600 + rng.randrange(3600)
+            for _ in range(self.order_count)
+        )
+        pending_after = self.days * 86400 - pending_hours * 3600
+        closed_share = done_share + cancelled_share
+        for order_id, offset in enumerate(times, 1):
+            items = []
+            for code_index in self._popularity.sample_distinct(rng.choices(range(1, 6), cum_weights=ITEM_COUNT_WEIGHTS)[0]):
+                items.append({
+                    'code': self.product_code(code_index),
+                    'qty': rng.choice((1, 1, 1, 2, 2, 3)),
+                    'name': self.product_name(code_index),
+                    'price': self._prices[code_index],
+                    'category_id': self._categories[code_index]
+                })
+            if offset >= pending_after:
+                status = 'PENDING'
+            else:
+                status = 'CANCELLED' if rng.random() * closed_share >= done_share else 'DONE'
+            customer = customers.sample()
+            yield {
+                'id': order_id,
+                'customer_name': f"{FIRST_NAMES[customer % len(FIRST_NAMES)]} {LAST_NAMES[customer // len(FIRST_NAMES) % len(LAST_NAMES)]} {customer}",
+                'items': items,
+                'status': status,
+                'priority': 'EXPRESS' if rng.random() < 0.1 else 'NORMAL',
+                'total': round(sum(item['price'] * item['qty'] for item in items), 2),
+                'created_at': (start + timedelta(seconds=offset)).isoformat()
+            }
+
+    # -----------------------
+    # RECENT VIEWS
+    # -----------------------
+    def generate_recent_views(self, active_days=25):
+        # Stacks draw from the same skewed popularity as orders; sessions were active
+        # within the last active_days, inside the recent-view expiry
+        self._prepare_products()
+        rng = self._rng('recent-views')
+        end = int(self.end.timestamp())
+        for index in range(self.session_count):
+            codes = self._popularity.sample_distinct(rng.randint(1, self.stack_size))
+            yield {
+                'identifier': f"session-{index:08d}",
+                'stack': [self.product_code(code_index) for code_index in codes],
+                'updated_at': end - rng.randrange(active_days * 86400)
+            }
+
+    # -----------------------
+    # OUTPUT
+    # -----------------------
+    def write(self, path=STORE_FILE):
+        # Streams each section straight into the compact storage format, the same one
+        # JSONDatabase saves for large stores, through a temporary file
+        started = time.perf_counter()
+        counts = {}
+        temporary = path + '.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            f.write('{')
+            sections = (('categories', self.generate_categories()), ('products', self.generate_products()),
+                        ('orders', self.generate_orders()), ('recent_views', self.generate_recent_views()))
+            for name, records in sections:
+                f.write(f'"{name}": [')
+                counts[name] = _write_records(f, records)
+                f.write('], ')
+            f.write(json.dumps({
+                'next_order_id': self.order_count + 1,
+                'next_category_id': self.category_count + 1,
+                # Order totals and line categories are written already, so those migrations have nothing to do
+                'migrations': ['order_totals', 'line_categories']
+            })[1:])
+        os.replace(temporary, path)
+        counts['seconds'] = round(time.perf_counter() - started, 3)
+        return counts
+
+def _write_records(f, records):
+    # One json.dumps call per chunk keeps the encoding in C; the list brackets are dropped
+    count = 0
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == WRITE_CHUNK:
+            f.write((', ' if count else '') + json.dumps(chunk, ensure_ascii=False)[1:-1])
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        f.write((', ' if count else '') + json.dumps(chunk, ensure_ascii=False)[1:-1])
+        count += len(chunk)
+    return count
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a large synthetic store")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help="preset sizes; the options below override them")
+    parser.add_argument('--categories', type=int)
+    parser.add_argument('--products', type=int)
+    parser.add_argument('--orders', type=int)
+    parser.add_argument('--sessions', type=int, help="recent-view sessions")
+    parser.add_argument('--shape', choices=('wide', 'deep'), default='wide')
+    parser.add_argument('--depth', type=int, help="maximum category depth (wide: 3, deep: 25)")
+    parser.add_argument('--roots', type=int, help="root categories (wide: 10, deep: 3)")
+    parser.add_argument('--skew', type=float, default=1.1, help="Zipf exponent of product popularity")
+    parser.add_argument('--days', type=int, default=365, help="days of order history")
+    parser.add_argument('--end', help="last day of history, YYYY-MM-DD (default: today)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', default=STORE_FILE)
+    args = parser.parse_args()
+
+    sizes = dict(SCALES[args.scale])
+    for name in sizes:
+        if getattr(args, name) is not None:
+            sizes[name] = getattr(args, name)
+    generator = DataGenerator(args.seed, shape=args.shape, depth=args.depth, roots=args.roots, skew=args.skew,
+                              days=args.days, end=datetime.fromisoformat(args.end) if args.end else None, **sizes)
+    if args.output == STORE_FILE:
+        # The queue journal and stock ledger belong to the old data
+        shutil.rmtree('order_journal', ignore_errors=True)
+        shutil.rmtree('stock_ledger', ignore_errors=True)
+    print(json.dumps(generator.write(args.output)))
+
+if __name__ == "__main__":
+    main()
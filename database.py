@@ -1,10 +1,42 @@
 import os
 import json
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+PRETTY_PRINT_LIMIT = 10000
 
 class JSONDatabase:
-    def __init__(self, filename='store_data.json'):
+    def __init__(self, filename='store_data.json', exclusive=False):
         self.filename = filename
+        self._file_lock = None
+        if exclusive:
+            self._lock_file()
         self.data = self._load_data()
+        self._lock = threading.RLock()
+        self._batch_depth = 0
+        self._dirty = False
+        self._after_save = []
+        self._order_positions = None
+        self._product_positions = None
+        self._recent_view_positions = None
+
+    def _lock_file(self):
+        # Every save writes this process's whole copy of the data, so a second writer would
+        # overwrite the first one's changes. Taken before loading and held until exit
+        if fcntl is None:
+            return
+        lock_file = open(self.filename + '.lock', 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            raise RuntimeError(f"{self.filename} is in use by another process (e.g. the API server)")
+        self._file_lock = lock_file
 
     def _load_data(self):
         if os.path.exists(self.filename):
@@ -17,6 +49,7 @@ class JSONDatabase:
             data.setdefault('recent_views', [])
             data.setdefault('next_order_id', 1)
             data.setdefault('next_category_id', 1)
+            data.setdefault('migrations', [])
 
             try:
                 if data.get('orders'):
@@ -40,12 +73,57 @@ class JSONDatabase:
                 'orders': [],
                 'recent_views': [],
                 'next_order_id': 1,
-                'next_category_id': 1
+                'next_category_id': 1,
+                'migrations': []
             }
 
     def save(self):
-        with open(self.filename, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        with self._lock:
+            if self._batch_depth:
+                self._dirty = True
+                return
+            # Small stores stay indented and readable; large ones are written compact,
+            # which json encodes in C several times faster
+            records = len(self.products) + len(self.orders) + len(self.recent_views)
+            indent = 2 if records <= PRETTY_PRINT_LIMIT else None
+            text = json.dumps(self.data, indent=indent, ensure_ascii=False)
+            with open(self.filename, 'w', encoding='utf-8') as f:
+                f.write(text)
+            self._run_after_save()
+
+    def after_save(self, callback):
+        # Runs callback once every change made so far is on disk
+        with self._lock:
+            if self._batch_depth:
+                self._after_save.append(callback)
+                return
+        callback()
+
+    def _run_after_save(self):
+        callbacks, self._after_save = self._after_save, []
+        for callback in callbacks:
+            callback()
+
+    @contextmanager
+    def batch(self):
+        # Defer every save() inside the block to a single write at the end
+        with self._lock:
+            self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                if not self._batch_depth:
+                    if self._dirty:
+                        self._dirty = False
+                        self.save()
+                    else:
+                        self._run_after_save()
+
+    @property
+    def store_id(self):
+        return self.data.get('store_id')
 
     @property
     def categories(self):
@@ -64,10 +142,11 @@ class JSONDatabase:
         return self.data['recent_views']
 
     def get_next_order_id(self):
-        order_id = self.data.get('next_order_id', 1)
-        self.data['next_order_id'] = order_id + 1
-        self.save()
-        return order_id
+        with self._lock:
+            order_id = self.data.get('next_order_id', 1)
+            self.data['next_order_id'] = order_id + 1
+            self.save()
+            return order_id
 
     def get_next_category_id(self):
         category_id = self.data.get('next_category_id', 1)
@@ -91,52 +170,102 @@ class JSONDatabase:
         self.categories[:] = [cat for cat in self.categories if cat.get('id') != category_id]
         self.save()
 
+    def get_product(self, product_code):
+        with self._lock:
+            position = self._get_product_positions().get(product_code)
+            return None if position is None else self.products[position]
+
     def add_product(self, product_data):
-        self.products.append(product_data)
-        self.save()
+        with self._lock:
+            self.products.append(product_data)
+            if self._product_positions is not None:
+                self._product_positions[product_data.get('code')] = len(self.products) - 1
+            self.save()
 
     def update_product(self, product_data):
-        for i, prod in enumerate(self.products):
-            if prod.get('code') == product_data.get('code'):
-                self.products[i] = product_data
-                self.save()
+        with self._lock:
+            position = self._get_product_positions().get(product_data.get('code'))
+            if position is None:
+                self.add_product(product_data)
                 return
-        self.add_product(product_data)
+            self.products[position] = product_data
+            self.save()
 
     def delete_product(self, product_code):
-        self.products[:] = [prod for prod in self.products if prod.get('code') != product_code]
-        self.save()
+        with self._lock:
+            self.products[:] = [prod for prod in self.products if prod.get('code') != product_code]
+            self._product_positions = None
+            self.save()
+
+    def get_order(self, order_id):
+        with self._lock:
+            position = self._get_order_positions().get(order_id)
+            return None if position is None else self.orders[position]
 
     def add_order(self, order_data):
-        self.orders.append(order_data)
-        self.save()
+        with self._lock:
+            self.orders.append(order_data)
+            if self._order_positions is not None:
+                self._order_positions[order_data.get('id')] = len(self.orders) - 1
+            self.save()
 
     def update_order(self, order_data):
-        for i, o in enumerate(self.orders):
-            if o.get('id') == order_data.get('id'):
-                self.orders[i] = order_data
-                self.save()
+        with self._lock:
+            position = self._get_order_positions().get(order_data.get('id'))
+            if position is None:
+                self.add_order(order_data)
                 return
-        self.add_order(order_data)
+            self.orders[position] = order_data
+            self.save()
 
     def delete_order(self, order_id):
-        self.orders[:] = [o for o in self.orders if o.get('id') != order_id]
-        self.save()
+        with self._lock:
+            self.orders[:] = [o for o in self.orders if o.get('id') != order_id]
+            self._order_positions = None
+            self.save()
+
+    # Position maps are built lazily and dropped whenever a delete shifts the lists
+    def _get_product_positions(self):
+        if self._product_positions is None:
+            self._product_positions = {p.get('code'): i for i, p in enumerate(self.products)}
+        return self._product_positions
+
+    def _get_order_positions(self):
+        if self._order_positions is None:
+            self._order_positions = {o.get('id'): i for i, o in enumerate(self.orders)}
+        return self._order_positions
+
+    def _get_recent_view_positions(self):
+        if self._recent_view_positions is None:
+            self._recent_view_positions = {rv.get('identifier'): i for i, rv in enumerate(self.recent_views)}
+        return self._recent_view_positions
 
     def get_recent_view(self, identifier):
-        for rv in self.recent_views:
-            if rv.get('identifier') == identifier:
-                return rv
-        return None
+        with self._lock:
+            position = self._get_recent_view_positions().get(identifier)
+            return None if position is None else self.recent_views[position]
 
     def add_recent_view(self, recent_view_data):
-        self.recent_views.append(recent_view_data)
-        self.save()
+        with self._lock:
+            self.recent_views.append(recent_view_data)
+            if self._recent_view_positions is not None:
+                self._recent_view_positions[recent_view_data.get('identifier')] = len(self.recent_views) - 1
+            self.save()
 
     def update_recent_view(self, recent_view_data):
-        for i, rv in enumerate(self.recent_views):
-            if rv.get('identifier') == recent_view_data.get('identifier'):
-                self.recent_views[i] = recent_view_data
-                self.save()
+        with self._lock:
+            position = self._get_recent_view_positions().get(recent_view_data.get('identifier'))
+            if position is None:
+                self.add_recent_view(recent_view_data)
                 return
-        self.add_recent_view(recent_view_data)
\ No newline at end of file
+            self.recent_views[position] = recent_view_data
+            self.save()
+
+    def delete_recent_views(self, identifiers):
+        if not identifiers:
+            return
+        with self._lock:
+            identifiers = set(identifiers)
+            self.recent_views[:] = [rv for rv in self.recent_views if rv.get('identifier') not in identifiers]
+            self._recent_view_positions = None
+            self.save()
\ No newline at end of file
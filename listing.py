@@ -0,0 +1,101 @@
+import heapq
+import sys
+from itertools import islice
+
+def fetch_page(records, page_size, key=None, after=None, descending=False):
+    # Returns (page, cursor). Without a key the records are read in stored order and the
+    # cursor is a position; with a key the cursor is the last key shown, and the next page
+    # is picked with a heap of page_size entries instead of sorting every record.
+    # Keys must be unique, e.g. (created_at, id).
+    if key is None:
+        start = after or 0
+        page = list(islice(records, start, start + page_size))
+        return page, start + len(page)
+    if after is None:
+        remaining = records
+    elif descending:
+        remaining = (record for record in records if key(record) < after)
+    else:
+        remaining = (record for record in records if key(record) > after)
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page = select(page_size, remaining, key=key)
+    return page, key(page[-1]) if page else after
+
+class CategoryNames:
+    # Category id -> name and full path, built once per screen instead of a scan per row
+    def __init__(self, categories):
+        self._names = {}
+        self._parents = {}
+        for category in categories:
+            self._names[category.get('id')] = category.get('name')
+            self._parents[category.get('id')] = category.get('parent_id')
+        self._paths = {}
+
+    def name(self, category_id, default="No category"):
+        return self._names.get(category_id, default) if category_id else default
+
+    def path(self, category_id, default="No category"):
+        if not category_id or category_id not in self._names:
+            return default
+        path = self._paths.get(category_id)
+        if path is None:
+            names, seen, current = [], set(), category_id
+            while current in self._names and current not in seen:
+                seen.add(current)
+                names.append(self._names[current])
+                current = self._parents.get(current)
+            path = self._paths[category_id] = ' -> '.join(reversed(names))
+        return path
+
+class ListingRenderer:
+    # Writes long listings one page at a time: each page is formatted into a single
+    # string and written at once, and the next page is only built when asked for
+    def __init__(self, page_size=20, output=None, prompt=input):
+        self.page_size = page_size
+        self.output = output
+        self.prompt = prompt
+
+    def render(self, title, records, format_row, key=None, descending=False, total=None,
+               numbered=False, max_pages=None, empty=None):
+        # records is a list, or any iterable when no key is given; format_row(number, record)
+        # returns the text for one row. Returns the records shown, in order.
+        output = self.output or sys.stdout
+        if total is None and hasattr(records, '__len__'):
+            total = len(records)
+        if title:
+            output.write(f"{title} ({total}):\n" if total is not None else f"{title}:\n")
+        iterator = iter(records) if key is None else None
+        shown, cursor, pages, lookahead = [], None, 0, []
+        while True:
+            if iterator is not None:
+                # One record past the page tells whether there is a next page; it leads that page
+                page = lookahead + list(islice(iterator, self.page_size + 1 - len(lookahead)))
+                lookahead = page[self.page_size:]
+                del page[self.page_size:]
+                more = bool(lookahead)
+            else:
+                page, cursor = fetch_page(records, self.page_size, key, cursor, descending)
+                more = len(shown) + len(page) < total
+            if not page:
+                if not shown and empty:
+                    output.write(empty + "\n")
+                break
+            lines = [format_row(len(shown) + i, record) for i, record in enumerate(page, 1)]
+            if numbered:
+                lines = [f"{len(shown) + i:2d}. {line}" for i, line in enumerate(lines, 1)]
+            shown.extend(page)
+            pages += 1
+            output.write("\n".join(lines) + "\n")
+            output.flush()
+            if not more:
+                break
+            if max_pages is not None and pages >= max_pages:
+                remaining = f"{total - len(shown)} more" if total is not None else "more"
+                output.write(f"  ... {remaining} not shown\n")
+                break
+            of_total = f" of {total}" if total is not None else ""
+            answer = self.prompt(f"-- {len(shown)}{of_total} shown. Enter for more, q to stop: ")
+            if answer.strip().lower() == 'q':
+                break
+        output.flush()
+        return shown
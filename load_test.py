@@ -0,0 +1,110 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+def percentile(sorted_values, share):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(share * len(sorted_values)))]
+
+class LoadClient:
+    # One keep-alive connection issuing a random mix of requests
+    def __init__(self, host, port, codes, rng, order_share, view_share):
+        self.connection = http.client.HTTPConnection(host, port, timeout=30)
+        self.codes = codes
+        self.rng = rng
+        self.order_share = order_share
+        self.view_share = view_share
+        self.latencies = {}
+        self.errors = 0
+
+    def request(self):
+        roll = self.rng.random()
+        code = self.rng.choice(self.codes)
+        if roll < self.order_share:
+            name, method, path = 'create_order', 'POST', '/orders'
+            body = {'customer_name': 'load-test', 'items': [{'code': code, 'qty': 1}]}
+        elif roll < self.order_share + self.view_share:
+            name, method, path = 'add_recent_view', 'POST', f'/recent-views/load-{self.rng.randrange(1000)}'
+            body = {'code': code}
+        elif roll < 0.7:
+            name, method, path, body = 'get_product', 'GET', f'/products/{code}', None
+        else:
+            name, method, path, body = 'search_products', 'GET', f'/products?q={code[:3]}&limit=10', None
+
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data else {}
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=data, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                self.errors += 1
+        except (OSError, http.client.HTTPException):
+            self.errors += 1
+            self.connection.close()
+        self.latencies.setdefault(name, []).append(time.perf_counter() - started)
+
+def summarize(latencies, seconds):
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / seconds, 1) if seconds else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'max_ms': round((latencies[-1] if latencies else 0.0) * 1000, 2)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test for api_server.py")
+    parser.add_argument('--url', default='http://127.0.0.1:8080')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--order-share', type=float, default=0.0,
+                        help="share of requests that create orders (these change the store)")
+    parser.add_argument('--view-share', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    url = urlsplit(args.url)
+    probe = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=30)
+    probe.request('GET', '/products?limit=1000')
+    codes = [product['code'] for product in json.loads(probe.getresponse().read())['products']]
+    probe.close()
+    if not codes:
+        raise SystemExit("The store has no products to request")
+
+    clients = [LoadClient(url.hostname, url.port or 80, codes, random.Random(args.seed + i),
+                          args.order_share, args.view_share) for i in range(args.clients)]
+    deadline = time.perf_counter() + args.seconds
+
+    def run(client):
+        while time.perf_counter() < deadline:
+            client.request()
+        client.connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(client,)) for client in clients]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    by_endpoint = {}
+    for client in clients:
+        for name, values in client.latencies.items():
+            by_endpoint.setdefault(name, []).extend(values)
+    result = summarize([value for values in by_endpoint.values() for value in values], elapsed)
+    result['clients'] = args.clients
+    result['errors'] = sum(client.errors for client in clients)
+    result['endpoints'] = {name: summarize(values, elapsed) for name, values in sorted(by_endpoint.items())}
+    print(json.dumps(result, indent=2))
+
+if __name__ == "__main__":
+    main()
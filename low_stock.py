@@ -0,0 +1,66 @@
+import threading
+
+DEFAULT_REORDER_LEVEL = 5
+
+class LowStockIndex:
+    # Keeps only the products at or below their reorder level, so checking one
+    # product is O(1) and the report is O(k) in the number of low products
+    def __init__(self, database, default_level=DEFAULT_REORDER_LEVEL):
+        self.database = database
+        self.default_level = default_level
+        self._low = {}      # product code -> (stock, reorder level)
+        self._alerts = {}   # products that dropped to their level since the last pop_alerts()
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def build_index(self):
+        if self._initialized:
+            return
+        with self._lock:
+            self._low.clear()
+            for product_data in self.database.products:
+                level = self._level(product_data.get('reorder_level'))
+                if product_data.get('stock', 0) <= level:
+                    self._low[product_data['code']] = (product_data.get('stock', 0), level)
+            self._initialized = True
+
+    def is_low(self, code):
+        return code in self._low
+
+    def low_stock_report(self, limit=None):
+        # Emptiest first, relative to each product's own level
+        with self._lock:
+            rows = [(code, stock, level) for code, (stock, level) in self._low.items()]
+        rows.sort(key=lambda row: (row[1] - row[2], row[0]))
+        return rows[:limit] if limit is not None else rows
+
+    def pop_alerts(self):
+        with self._lock:
+            alerts, self._alerts = self._alerts, {}
+        return [(code, stock, level) for code, (stock, level) in alerts.items()]
+
+    def get_low_stock_stats(self):
+        return {'low_products': len(self._low), 'default_level': self.default_level}
+
+    # Product cache listener
+    def product_updated(self, product):
+        if not self._initialized:
+            return
+        level = self._level(product.reorder_level)
+        with self._lock:
+            if product.stock <= level:
+                if product.code not in self._low:
+                    self._alerts[product.code] = (product.stock, level)
+                elif product.code in self._alerts:
+                    self._alerts[product.code] = (product.stock, level)
+                self._low[product.code] = (product.stock, level)
+            elif self._low.pop(product.code, None) is not None:
+                self._alerts.pop(product.code, None)
+
+    def product_removed(self, code):
+        with self._lock:
+            self._low.pop(code, None)
+            self._alerts.pop(code, None)
+
+    def _level(self, reorder_level):
+        return self.default_level if reorder_level is None else reorder_level
@@ -1,18 +1,74 @@
 # main.py
+import argparse
+import json
 import os
+import sys
+import time
 from datetime import datetime
 from database import JSONDatabase
-from models import Product, Category, Order, RecentView
-from services import ProductCacheService, OrderQueueService, RecentViewManager, CategoryTreeService
+from models import Product, Category, Order
+from services import ProductCacheService, OrderQueueService, RecentViewManager, CategoryTreeService, ProductSearchIndex, ProductCompletionIndex, ProductQueryService, SearchResultCache
+from product_query import ProductQuery, SORT_FIELDS
+from order_scheduler import create_scheduler
+from concurrent_orders import ConcurrentOrderProcessor
+from stock_reservation import StockReservationService
+from order_journal import OrderQueueJournal
+from migrations import run_migrations
+from sales_analytics import SalesAnalyticsService
+from low_stock import LowStockIndex
+from stock_ledger import StockLedgerService, stock_movement, RESTOCK, ADJUSTMENT
+from co_views import CoViewService
+from bulk_io import BulkIOService
+from listing import ListingRenderer, CategoryNames
+
+# Pending orders that are not processed within this time release their stock
+RESERVATION_TTL_SECONDS = 24 * 60 * 60
+ORDER_BATCH_SIZE = 5000
+# Categories with more direct products than this show a count in the tree view
+TREE_PRODUCT_LIMIT = 10
+ORDER_JOURNAL_DIR = 'order_journal'
+STOCK_LEDGER_DIR = 'stock_ledger'
+
+def format_date(value, fmt):
+    try:
+        return datetime.fromisoformat(value).strftime(fmt)
+    except Exception:
+        return str(value)
+
+def order_date_key(order_data):
+    # Unique per order, so order listings can page with a cursor
+    return (str(order_data.get('created_at', '')), order_data.get('id', 0))
 
 class Store:
-    def __init__(self):
+    def __init__(self, scheduling_policy='fifo'):
         self.name = "Nadie se salva solo"
-        self.database = JSONDatabase()
+        # Only one process at a time works on the data file
+        self.database = JSONDatabase(exclusive=True)
         self.product_cache = ProductCacheService(self.database)
-        self.order_queue = OrderQueueService(self.database)
-        self.recent_view_manager = RecentViewManager(self.database)
-        self.category_tree = CategoryTreeService(self.database)
+        self.reservations = StockReservationService(self.database, self.product_cache, RESERVATION_TTL_SECONDS)
+        self.order_queue = OrderQueueService(self.database, create_scheduler(scheduling_policy), self.reservations,
+                                             OrderQueueJournal(ORDER_JOURNAL_DIR))
+        self.order_processor = ConcurrentOrderProcessor(self.order_queue, self.product_cache)
+        self.co_views = CoViewService(self.database)
+        self.recent_view_manager = RecentViewManager(self.database, co_views=self.co_views)
+        self.search_cache = SearchResultCache(self.product_cache)
+        self.category_tree = CategoryTreeService(self.database, self.product_cache, self.search_cache)
+        self.product_cache.add_listener(self.category_tree)
+        self.search_index = ProductSearchIndex(self.database, self.search_cache)
+        self.product_cache.add_listener(self.search_index)
+        self.completion_index = ProductCompletionIndex(self.database)
+        self.product_cache.add_listener(self.completion_index)
+        self.product_query = ProductQueryService(self.database, self.product_cache, self.category_tree,
+                                                 self.search_index, self.search_cache)
+        self.product_cache.add_listener(self.product_query)
+        self.product_cache.add_listener(self.search_cache)
+        self.low_stock = LowStockIndex(self.database)
+        self.product_cache.add_listener(self.low_stock)
+        self.stock_ledger = StockLedgerService(self.database, STOCK_LEDGER_DIR)
+        self.product_cache.add_listener(self.stock_ledger)
+        self.sales_analytics = SalesAnalyticsService(self.database, self.product_cache, self.category_tree)
+        self.order_queue.add_listener(self.sales_analytics)
+        self.listing = ListingRenderer()
         self.default_user = "default_user"
 
     def show_current_status(self):
@@ -20,47 +76,63 @@ class Store:
         print("CURRENT STORE STATUS")
         print("="*50)
 
-        products = [Product.from_dict(p) for p in self.database.products]
-        print(f"\nPRODUCTS ({len(products)}):")
-        for product in products:
-            category_name = "No category"
-            if product.category_id:
-                category_data = next((c for c in self.database.categories if c.get('id') == product.category_id), None)
-                if category_data:
-                    category_name = category_data.get('name')
-            print(f"  {product.code}: {product.name} | ${product.price} | Stock: {product.stock} | {category_name}")
-
-        orders = [Order.from_dict(o) for o in self.database.orders]
-        orders.sort(key=lambda x: x.created_at)
-        print(f"\nORDERS ({len(orders)}):")
-        for order in orders:
-            try:
-                created_date = datetime.fromisoformat(order.created_at).strftime('%d/%m %H:%M')
-            except Exception:
-                created_date = str(order.created_at)
-            print(f"  {order.id}: {order.customer_name} | {order.status} | {created_date}")
+        # Each section is paged, so large stores show their first rows right away
+        category_names = CategoryNames(self.database.categories)
+        self.listing.render("\nPRODUCTS", self.database.products,
+                            lambda i, p: f"  {p['code']}: {p['name']} | ${p.get('price', 0.0)} | "
+                                         f"Stock: {p.get('stock', 0)} | {category_names.name(p.get('category_id'))}")
 
-        categories = [Category.from_dict(c) for c in self.database.categories]
-        print(f"\nCATEGORIES ({len(categories)}):")
-        for category in categories:
-            parent_name = "Root"
-            if category.parent_id:
-                parent_data = next((c for c in self.database.categories if c.get('id') == category.parent_id), None)
-                if parent_data:
-                    parent_name = parent_data.get('name')
-            print(f"  {category.name} (Parent: {parent_name})")
-
-        histories = [RecentView.from_dict(rv) for rv in self.database.recent_views]
-        print(f"\nVIEW HISTORIES ({len(histories)}):")
-        for history in histories:
-            print(f"  {history.identifier}: {history.stack}")
+        self.listing.render("\nORDERS", self.database.orders,
+                            lambda i, o: f"  {o['id']}: {o.get('customer_name')} | {o.get('status')} | "
+                                         f"{format_date(o.get('created_at'), '%d/%m %H:%M')}",
+                            key=order_date_key)
+
+        self.listing.render("\nCATEGORIES", self.database.categories,
+                            lambda i, c: f"  {c['name']} (Parent: {category_names.name(c.get('parent_id'), 'Root')})")
+
+        self.recent_view_manager.flush()
+        self.listing.render("\nVIEW HISTORIES", self.database.recent_views,
+                            lambda i, rv: f"  {rv['identifier']}: {rv.get('stack', [])}")
+
+        cache_stats = self.search_cache.get_cache_stats()
+        print(f"\nSEARCH CACHE: {cache_stats['entries']} entries | Hits: {cache_stats['hits']} | "
+              f"Misses: {cache_stats['misses']} | Hit rate: {cache_stats['hit_rate']:.0%}")
 
     # -----------------------
     # SEARCH HELPERS
     # -----------------------
+    def read_product_code(self, prompt):
+        # A trailing '*' lists completions for the typed prefix and asks again
+        self.completion_index.build_index()
+        while True:
+            code = input(prompt).strip()
+            if not code.endswith('*'):
+                return code
+            matches = self.completion_index.complete(code[:-1])
+            if not matches:
+                print(f"No products start with '{code[:-1]}'")
+                continue
+            for match in matches:
+                product = self.product_cache.get_product(match)
+                if product:
+                    print(f"  {product.code}: {product.name} | Stock: {product.stock}")
+
+    def print_viewed_together(self, code):
+        related = [self.product_cache.get_product(other) for other, _ in self.co_views.related(code, 10)]
+        names = [product.name for product in related if product][:5]
+        if names:
+            print(f" Viewed together: {', '.join(names)}")
+
+    def print_product_not_found(self, code):
+        print(f"Product '{code}' not found")
+        self.completion_index.build_index()
+        suggestions = self.completion_index.suggest(code)
+        if suggestions:
+            print(f"Did you mean: {', '.join(suggestions)}?")
+
     def search_product_by_code(self):
         print("\n--- SEARCH PRODUCT BY CODE ---")
-        code = input("Enter product code: ").strip()
+        code = self.read_product_code("Enter product code (end with * to list matches): ")
         if not code:
             print("Search cancelled")
             return
@@ -71,35 +143,37 @@ class Store:
             print(f"\nFound: {product.name}")
             print(f" Code: {product.code}")
             print(f" Price: ${product.price}")
-            print(f" Stock: {product.stock}")
+            reserved = self.reservations.reserved(product.code)
+            print(f" Stock: {product.stock}" + (f" ({reserved} reserved)" if reserved else ""))
             if getattr(product, 'description', None):
                 print(f" Description: {product.description}")
             try:
                 self.recent_view_manager.add_to_recent_view(self.default_user, product.code)
             except Exception:
                 pass
+            self.print_viewed_together(product.code)
         else:
-            print(f"Product '{code}' not found")
+            self.print_product_not_found(code)
 
     def search_products_by_name(self):
         print("\n--- SEARCH PRODUCTS BY NAME ---")
-        name_query = input("Enter product name (partial match): ").strip()
+        name_query = input("Enter product name or description (partial match): ").strip()
         if not name_query:
             print("Search query cannot be empty")
             return
 
-        products = [Product.from_dict(p) for p in self.database.products
-                    if name_query.lower() in p.get('name', '').lower()]
+        self.product_cache.initialize_cache()
+        self.search_index.build_index()
+        products = [self.product_cache.get_product(code) for code in self.search_index.search(name_query)]
+        products = [product for product in products if product]
 
         if products:
-            print(f"\nFound {len(products)} product(s):")
-            for i, product in enumerate(products, 1):
-                category_name = "No category"
-                if product.category_id:
-                    category_data = next((c for c in self.database.categories if c.get('id') == product.category_id), None)
-                    if category_data:
-                        category_name = category_data.get('name')
-                print(f"{i:2d}. {product.name} (Code: {product.code}) - ${product.price} - Stock: {product.stock} - {category_name}")
+            category_names = CategoryNames(self.database.categories)
+            products = self.listing.render(
+                "\nFound product(s)", products,
+                lambda i, product: f"{product.name} (Code: {product.code}) - ${product.price} - "
+                                   f"Stock: {product.stock} - {category_names.name(product.category_id)}",
+                numbered=True)
 
             while True:
                 choice = input("\nEnter product number to view details or press Enter to return: ").strip()
@@ -118,12 +192,7 @@ class Store:
                 print(f"Price: ${selected.price}")
                 print(f"Stock: {selected.stock}")
                 print(f"Description: {selected.description}")
-                category_name = "No category"
-                if selected.category_id:
-                    catdata = next((c for c in self.database.categories if c.get('id') == selected.category_id), None)
-                    if catdata:
-                        category_name = catdata.get('name')
-                print(f"Category: {category_name}")
+                print(f"Category: {category_names.name(selected.category_id)}")
                 try:
                     self.recent_view_manager.add_to_recent_view(self.default_user, selected.code)
                 except Exception:
@@ -131,17 +200,61 @@ class Store:
         else:
             print("No products found matching your search")
 
+    def search_products_advanced(self):
+        print("\n--- ADVANCED PRODUCT SEARCH ---")
+        print("Leave blank to skip a filter")
+        name_terms = input("Name/description terms: ").strip()
+        category_input = input("Category ID (includes subcategories): ").strip()
+        price_min = input("Min price: ").strip()
+        price_max = input("Max price: ").strip()
+        in_stock = input("Only products in stock? (y/N): ").strip().lower()
+        sort_by = input(f"Sort by ({'/'.join(SORT_FIELDS)}): ").strip().lower()
+        descending = input("Descending order? (y/N): ").strip().lower()
+
+        try:
+            query = ProductQuery(
+                name_terms=name_terms,
+                category_id=int(category_input) if category_input else None,
+                price_min=float(price_min) if price_min else None,
+                price_max=float(price_max) if price_max else None,
+                in_stock_only=(in_stock == 'y'),
+                sort_by=sort_by or None,
+                descending=(descending == 'y'),
+                limit=10
+            )
+        except ValueError as error:
+            print(f"Invalid filter: {error}")
+            return
+
+        self.product_cache.initialize_cache()
+        self.search_index.build_index()
+        while True:
+            products, total = self.product_query.search(query)
+            if not total:
+                print("No products found matching your filters")
+                return
+
+            print(f"\nShowing {query.offset + 1}-{query.offset + len(products)} of {total}:")
+            for product in products:
+                print(f"  [{product.code}] {product.name} | ${product.price} | Stock: {product.stock}")
+
+            if query.offset + query.limit >= total:
+                return
+            more = input("\nPress Enter for the next page or 'q' to return: ").strip().lower()
+            if more == 'q':
+                return
+            query.offset += query.limit
+
     def search_products_by_category(self):
         print("\n--- SEARCH PRODUCTS BY CATEGORY ---")
 
-        categories = [Category.from_dict(c) for c in self.database.categories]
-        if not categories:
+        if not self.database.categories:
             print("No categories created")
             return
 
-        print("Available categories:")
-        for cat in categories:
-            print(f"  {cat.id}. {cat.get_full_path(categories)}")
+        category_names = CategoryNames(self.database.categories)
+        self.listing.render("Available categories", self.database.categories,
+                            lambda i, c: f"  {c['id']}. {category_names.path(c['id'])}")
 
         category_input = input("\nCategory ID: ").strip()
         if not category_input:
@@ -154,13 +267,12 @@ class Store:
             print("Invalid category ID")
             return
 
-        category = next((cat for cat in categories if cat.id == category_id), None)
-        if not category:
+        if category_names.name(category_id, None) is None:
             print("Invalid category ID")
             return
 
         all_categories = self.category_tree.get_subtree_categories(category_id)
-        print(f"\nSearching in: {category.get_full_path(categories)}")
+        print(f"\nSearching in: {category_names.path(category_id)}")
         print(f"Subcategories included: {len(all_categories)}")
 
         products = self.category_tree.get_products_in_subtree(category_id)
@@ -168,21 +280,17 @@ class Store:
             print("\nProducts found: 0")
             return
 
-        print(f"\nProducts found: {len(products)}")
-        for product in products:
-            category_path = "No category"
-            if product.category_id:
-                cat = next((c for c in categories if c.id == product.category_id), None)
-                if cat:
-                    category_path = cat.get_full_path(categories)
-            print(f"  {product.name}")
-            print(f"    Category: {category_path}")
-            print(f"    ${product.price} | Stock: {product.stock}")
+        def format_product(i, product):
+            # Only the products actually shown count as viewed
             try:
                 self.recent_view_manager.add_to_recent_view(self.default_user, product.code)
             except Exception:
                 pass
-            print()
+            return (f"  {product.name}\n"
+                    f"    Category: {category_names.path(product.category_id)}\n"
+                    f"    ${product.price} | Stock: {product.stock}\n")
+
+        self.listing.render("\nProducts found", products, format_product)
 
     # -----------------------
     # PRODUCT MANAGEMENT (CRUD)
@@ -192,9 +300,13 @@ class Store:
         code = input("Product code to delete: ").strip()
 
         if code:
-            product_data = next((p for p in self.database.products if p.get('code') == code), None)
+            product_data = self.database.get_product(code)
             if product_data:
                 product = Product.from_dict(product_data)
+                reserved = self.reservations.reserved(code)
+                if reserved:
+                    print(f"Cannot delete '{product.name}': {reserved} units are reserved by pending orders")
+                    return
                 print(f"Delete '{product.name}' (Code: {product.code})?")
                 confirm = input("Type 'YES' to confirm: ").strip().upper()
 
@@ -212,7 +324,7 @@ class Store:
         code = input("Product code to update: ").strip()
 
         if code:
-            product_data = next((p for p in self.database.products if p.get('code') == code), None)
+            product_data = self.database.get_product(code)
             if not product_data:
                 print(f"Product '{code}' not found")
                 return
@@ -225,6 +337,8 @@ class Store:
             new_price = input(f"New price [{product.price}]: ").strip()
             new_stock = input(f"New stock [{product.stock}]: ").strip()
             new_desc = input(f"New description [{product.description}]: ").strip()
+            current_level = product.reorder_level if product.reorder_level is not None else self.low_stock.default_level
+            new_level = input(f"New reorder level [{current_level}]: ").strip()
 
             if new_name:
                 product.name = new_name
@@ -238,12 +352,24 @@ class Store:
                     new_stock_val = int(new_stock)
                     if new_stock_val < 0:
                         print("Stock cannot be negative, keeping previous")
+                    elif new_stock_val < self.reservations.reserved(code):
+                        print(f"Stock cannot be lower than the {self.reservations.reserved(code)} units "
+                              f"reserved by pending orders, keeping previous")
                     else:
                         product.stock = new_stock_val
                 except ValueError:
                     print("Invalid stock, keeping previous")
             if new_desc:
                 product.description = new_desc
+            if new_level:
+                try:
+                    new_level_val = int(new_level)
+                    if new_level_val < 0:
+                        print("Reorder level cannot be negative, keeping previous")
+                    else:
+                        product.reorder_level = new_level_val
+                except ValueError:
+                    print("Invalid reorder level, keeping previous")
 
             self.database.update_product(product.to_dict())
             self.product_cache.update_product(product)
@@ -261,20 +387,18 @@ class Store:
             print("5. Update product information")
             print("6. Update stock only")
             print("7. Delete product")
-            print("8. Return to main menu")
+            print("8. Advanced search (filters)")
+            print("9. Low stock report")
+            print("10. Stock movement history")
+            print("11. Return to main menu")
 
-            option = input("\nSelect option (1-8): ").strip()
+            option = input("\nSelect option (1-11): ").strip()
 
             if option == "1":
-                products = [Product.from_dict(p) for p in self.database.products]
-                print(f"\nProducts found: {len(products)}")
-                for product in products:
-                    category_name = "No category"
-                    if product.category_id:
-                        category_data = next((c for c in self.database.categories if c.get('id') == product.category_id), None)
-                        if category_data:
-                            category_name = category_data.get('name')
-                    print(f"  [{product.code}] {product.name} | ${product.price} | Stock: {product.stock} | {category_name}")
+                category_names = CategoryNames(self.database.categories)
+                self.listing.render("\nProducts found", self.database.products,
+                                    lambda i, p: f"  [{p['code']}] {p['name']} | ${p.get('price', 0.0)} | "
+                                                 f"Stock: {p.get('stock', 0)} | {category_names.name(p.get('category_id'))}")
 
             elif option == "2":
                 self.search_product_by_code()
@@ -292,7 +416,7 @@ class Store:
 
                 if code and name and price and stock:
                     try:
-                        existing_product = next((p for p in self.database.products if p.get('code') == code), None)
+                        existing_product = self.database.get_product(code)
                         if existing_product:
                             print(f"Product with code '{code}' already exists")
                             continue
@@ -318,16 +442,16 @@ class Store:
                         categories = [Category.from_dict(c) for c in self.database.categories]
                         category_id = None
                         if categories:
-                            print("\nAvailable categories:")
-                            for i, cat in enumerate(categories, 1):
-                                print(f"  {cat.id}. {cat.get_full_path(categories)}")
+                            category_names = CategoryNames(self.database.categories)
+                            self.listing.render("\nAvailable categories", categories,
+                                                lambda i, cat: f"  {cat.id}. {category_names.path(cat.id)}")
 
                             cat_choice = input("\nCategory ID (leave empty for no category): ").strip()
                             if cat_choice and cat_choice.isdigit():
                                 category_id = int(cat_choice)
                                 selected_cat = next((c for c in categories if c.id == category_id), None)
                                 if selected_cat:
-                                    print(f"Selected category: {selected_cat.get_full_path(categories)}")
+                                    print(f"Selected category: {category_names.path(category_id)}")
                                 else:
                                     print("Invalid category ID")
                         else:
@@ -342,7 +466,8 @@ class Store:
                             category_id=category_id
                         )
                         self.database.add_product(product.to_dict())
-                        self.product_cache.update_product(product)
+                        with stock_movement(RESTOCK):
+                            self.product_cache.update_product(product)
                         print(f"Product '{name}' created")
                     except Exception as error:
                         print(f"Error: {error}")
@@ -353,7 +478,10 @@ class Store:
                 self.update_product_complete()
 
             elif option == "6":
-                code = input("Product code: ").strip()
+                code = self.read_product_code("Product code (end with * to list matches): ")
+                if code and not self.product_cache.get_product(code):
+                    self.print_product_not_found(code)
+                    continue
                 new_stock = input("New stock: ").strip()
 
                 if code and new_stock:
@@ -362,12 +490,18 @@ class Store:
                         if new_stock_val < 0:
                             print("Stock cannot be negative")
                             continue
-                        product_data = next((p for p in self.database.products if p.get('code') == code), None)
+                        reserved = self.reservations.reserved(code)
+                        if new_stock_val < reserved:
+                            print(f"Stock cannot be lower than the {reserved} units reserved by pending orders")
+                            continue
+                        product_data = self.database.get_product(code)
                         if product_data:
                             product = Product.from_dict(product_data)
+                            kind = RESTOCK if new_stock_val > product.stock else ADJUSTMENT
                             product.stock = new_stock_val
                             self.database.update_product(product.to_dict())
-                            self.product_cache.update_product(product)
+                            with stock_movement(kind):
+                                self.product_cache.update_product(product)
                             print(f"Stock updated to {new_stock_val}")
                         else:
                             print("Product not found")
@@ -378,6 +512,15 @@ class Store:
                 self.delete_product()
 
             elif option == "8":
+                self.search_products_advanced()
+
+            elif option == "9":
+                self.show_low_stock_report()
+
+            elif option == "10":
+                self.show_stock_history()
+
+            elif option == "11":
                 break
             else:
                 print("Invalid option")
@@ -419,38 +562,35 @@ class Store:
             print("No categories available")
             return []
 
-        print("\nAvailable categories:")
-        for category in categories:
-            print(f"  {category.id}. {category.get_full_path(categories)}")
+        category_names = CategoryNames(self.database.categories)
+        self.listing.render("\nAvailable categories", categories,
+                            lambda i, category: f"  {category.id}. {category_names.path(category.id)}")
         return categories
 
     def show_category_tree(self):
         print("\n--- CATEGORY TREE ---")
-        categories = [Category.from_dict(c) for c in self.database.categories]
-        root_categories = [cat for cat in categories if not cat.parent_id]
-
-        if not root_categories:
+        if not self.category_tree.get_children():
             print("No categories created")
             return
 
-        def print_tree(category, level=0, is_last=True):
-            indent = "    " * level
-            connector = "└── " if is_last else "├── "
-            direct_count = len([p for p in self.database.products if p.get('category_id') == category.id])
-            print(f"{indent}{connector}{category.name} ({direct_count} products)")
-            direct_products = [Product.from_dict(p) for p in self.database.products if p.get('category_id') == category.id]
-            for product in direct_products:
-                print(f"{indent}    {product.name} (${product.price})")
-            children = [cat for cat in categories if cat.parent_id == category.id]
-            children.sort(key=lambda x: x.name)
-            total_children = len(children)
-            for index, child in enumerate(children):
-                is_last_child = (index == total_children - 1)
-                print_tree(child, level + 1, is_last_child)
-
-        for index, root_cat in enumerate(root_categories):
-            is_last = (index == len(root_categories) - 1)
-            print_tree(root_cat, 0, is_last)
+        depth = input("Max depth (Enter for all levels): ").strip()
+        if depth and not depth.isdigit():
+            print("Invalid depth")
+            return
+
+        # Lines are produced as the pages are shown, so a large tree starts printing at once
+        lines = self.category_tree.iter_tree_lines(max_depth=int(depth) if depth else None,
+                                                   product_limit=TREE_PRODUCT_LIMIT)
+        self.listing.render(None, lines, lambda i, line: line)
+
+        while True:
+            choice = input("\nCategory ID to expand (Enter to return): ").strip()
+            if not choice:
+                break
+            if not choice.isdigit() or not self.category_tree.get_category_path(int(choice)):
+                print("Invalid category ID")
+                continue
+            self.listing.render(None, self.category_tree.iter_tree_lines(int(choice)), lambda i, line: line)
 
     def browse_categories_hierarchical(self):
         current_category_id = None
@@ -479,13 +619,12 @@ class Store:
             if subcategories:
                 print("\nSubcategories:")
                 for i, category in enumerate(subcategories, 1):
-                    product_count = len([p for p in self.database.products if p.get('category_id') == category.id])
+                    product_count = self.category_tree.get_product_count(category.id)
                     print(f"{i:2d}. {category.name} ({product_count} products)")
 
             if products:
-                print(f"\nProducts in this category ({len(products)}):")
-                for i, product in enumerate(products, 1):
-                    print(f"    {i:2d}. {product.name} (${product.price}) - Stock: {product.stock}")
+                self.listing.render("\nProducts in this category", products,
+                                    lambda i, product: f"    {i:2d}. {product.name} (${product.price}) - Stock: {product.stock}")
 
             print("\nOptions:")
             if subcategories:
@@ -572,6 +711,7 @@ class Store:
                 for product in direct_products:
                     product.category_id = None
                     self.database.update_product(product.to_dict())
+                    self.product_cache.update_product(product)
                     moved_products_count += 1
 
                 moved_subcategories_count = 0
@@ -639,27 +779,23 @@ class Store:
         print("\n--- ORDER PROCESSING ---")
 
         while True:
-            pending_orders = [Order.from_dict(o) for o in self.database.orders if o.get('status') == 'PENDING']
-            pending_orders.sort(key=lambda x: x.created_at)
-            print(f"\nPending orders: {len(pending_orders)}")
-
-            if pending_orders:
-                for order in pending_orders:
-                    try:
-                        created_time = datetime.fromisoformat(order.created_at).strftime('%H:%M:%S')
-                    except Exception:
-                        created_time = str(order.created_at)
-                    print(f"  {order.id}: {order.customer_name} | Items: {len(order.items)} | {created_time}")
+            # Shown on every pass of this menu, so only the oldest page is listed
+            pending_orders = [o for o in self.database.orders if o.get('status') == 'PENDING']
+            self.listing.render("\nPending orders", pending_orders,
+                                lambda i, o: f"  {o['id']}: {o.get('customer_name')} | Items: {len(o.get('items', []))} | "
+                                             f"{format_date(o.get('created_at'), '%H:%M:%S')}",
+                                key=order_date_key, max_pages=1)
 
             print("\nOptions:")
-            print("1. Process next order (FIFO)")
-            print("2. Process all pending orders")
+            print("1. Process next order")
+            print("2. Process all pending orders (in batches, one write per batch)")
             print("3. Create new order")
             print("4. View order details")
             print("5. View order history")
-            print("6. Return to main menu")
+            print("6. Process all pending orders with worker threads")
+            print("7. Return to main menu")
 
-            option = input("\nSelect option (1-6): ").strip()
+            option = input("\nSelect option (1-7): ").strip()
 
             if option == "1":
                 self.order_queue.load_pending_orders()
@@ -668,18 +804,19 @@ class Store:
                     print(f"Order {order_id} processed")
                 else:
                     print("No orders to process")
+                self.print_low_stock_alerts()
 
             elif option == "2":
                 self.order_queue.load_pending_orders()
-                processed_count = 0
-                while True:
-                    order_id = self.order_queue.process_next_order(self.product_cache)
-                    if order_id:
-                        print(f"Order {order_id} processed")
-                        processed_count += 1
-                    else:
-                        break
-                print(f"{processed_count} orders processed")
+                done = cancelled = 0
+                while self.order_queue.get_queue_size():
+                    for order_id in self.order_queue.process_batch_aggregated(ORDER_BATCH_SIZE, self.product_cache):
+                        if self.database.get_order(order_id).get('status') == 'DONE':
+                            done += 1
+                        else:
+                            cancelled += 1
+                print(f"{done + cancelled} orders processed: {done} completed, {cancelled} cancelled")
+                self.print_low_stock_alerts()
 
             elif option == "3":
                 self.create_order_interactive()
@@ -691,11 +828,72 @@ class Store:
                 self.view_all_orders()
 
             elif option == "6":
+                # Only pays off when processing waits on I/O; for in-memory work it is slower
+                self.order_queue.load_pending_orders()
+                self.order_processor.reset_stats()
+                processed = self.order_processor.process_all()
+                for order_id in processed:
+                    print(f"Order {order_id} processed")
+                stats = self.order_processor.get_stats()
+                print(f"{len(processed)} orders processed "
+                      f"({stats['orders_per_second']:.0f} orders/s, {stats['lanes']} lanes, "
+                      f"{stats['serial_orders']} orders in lanes too large to split)")
+                self.print_low_stock_alerts()
+
+            elif option == "7":
                 break
 
             else:
                 print("Invalid option")
 
+    def print_low_stock_alerts(self):
+        for code, stock, level in self.low_stock.pop_alerts():
+            product = self.product_cache.get_product(code)
+            name = product.name if product else code
+            print(f"LOW STOCK: {name} [{code}] has {stock} units (reorder level {level})")
+
+    def show_low_stock_report(self):
+        print("\n--- LOW STOCK REPORT ---")
+        rows = self.low_stock.low_stock_report()
+        if not rows:
+            print("All products are above their reorder level")
+            return
+        def format_row(i, row):
+            code, stock, level = row
+            product = self.product_cache.get_product(code)
+            name = product.name if product else code
+            return f"  [{code}] {name} | Stock: {stock} | Reorder level: {level}"
+
+        self.listing.render(None, rows, format_row)
+        # Alerts already listed here are not repeated after the next order
+        self.low_stock.pop_alerts()
+
+    def show_stock_history(self):
+        print("\n--- STOCK MOVEMENT HISTORY ---")
+        code = self.read_product_code("Product code (end with * to list matches): ")
+        if not code:
+            return
+
+        movements = list(self.stock_ledger.movements(code))
+        if not movements:
+            print(f"No stock movements recorded for '{code}'")
+        for movement in movements[-20:]:
+            moment = datetime.fromtimestamp(movement['t']).strftime('%Y-%m-%d %H:%M:%S')
+            orders = f" (orders {', '.join(map(str, movement['orders']))})" if movement.get('orders') else ""
+            print(f"  {moment} | {movement['kind']:<10} | {movement['delta']:+d} -> {movement['stock']}{orders}")
+
+        when = input("\nStock at date (YYYY-MM-DD HH:MM, Enter to skip): ").strip()
+        if when:
+            try:
+                stock = self.stock_ledger.stock_at(code, datetime.fromisoformat(when))
+            except ValueError:
+                print("Invalid date")
+                return
+            if stock is None:
+                print("No stock history for that date")
+            else:
+                print(f"Stock of {code} at {when}: {stock}")
+
     def create_order_interactive(self):
         print("\n--- CREATE ORDER ---")
         customer_name = input("Customer name: ").strip()
@@ -705,9 +903,12 @@ class Store:
 
         items = []
         while True:
-            code = input("Product code (leave empty to finish): ").strip()
+            code = self.read_product_code("Product code (leave empty to finish, end with * to list matches): ")
             if not code:
                 break
+            if not self.product_cache.get_product(code):
+                self.print_product_not_found(code)
+                continue
 
             qty_input = input("Quantity: ").strip()
             try:
@@ -725,22 +926,44 @@ class Store:
             print("No items added, order cancelled")
             return
 
-        # Validate stock availability before creating order
-        for item in items:
-            product = self.product_cache.get_product(item['code'])
-            if not product:
-                print(f"Product {item['code']} not found; order cancelled")
-                return
-            if product.stock < item['qty']:
-                print(f"Not enough stock for {product.code} ({product.stock} available); order cancelled")
-                return
+        express = input("Express order? (y/N): ").strip().lower() == 'y'
 
-        order_id = self.database.get_next_order_id()
-        order = Order(order_id, customer_name, items, status='PENDING')
-        self.database.add_order(order.to_dict())
-        self.order_queue.add_order(order.id)
+        try:
+            order = self.place_order(customer_name, items, 'EXPRESS' if express else 'NORMAL')
+        except ValueError as error:
+            print(f"{error}; order cancelled")
+            return
         print(f"Order {order.id} created and queued")
 
+    def place_order(self, customer_name, items, priority='NORMAL'):
+        # Shared by the menu and the API; raises ValueError when the order cannot be placed
+        if not customer_name:
+            raise ValueError("Customer name required")
+        if not items:
+            raise ValueError("No items added")
+        if priority not in ('NORMAL', 'EXPRESS'):
+            raise ValueError(f"Invalid priority '{priority}'")
+        for item in items:
+            if not self.product_cache.get_product(item.get('code')):
+                raise ValueError(f"Product '{item.get('code')}' not found")
+            if not isinstance(item.get('qty'), int) or item['qty'] <= 0:
+                raise ValueError("Quantity must be a positive integer")
+
+        # One save for the new id and the order
+        with self.database.batch():
+            # Hold the stock now so queued orders cannot oversell it
+            order_id = self.database.get_next_order_id()
+            reserved, reason = self.reservations.reserve(order_id, items)
+            if not reserved:
+                raise ValueError(reason)
+
+            order = Order(order_id, customer_name, items, status='PENDING', priority=priority)
+            order.capture_prices(self.product_cache)
+            # Journaled before it is saved, so a crash in between cannot lose a pending order
+            self.order_queue.add_order(order.id, order.to_dict())
+            self.database.add_order(order.to_dict())
+        return order
+
     def view_all_orders(self):
         print("\n--- ORDER HISTORY ---")
 
@@ -759,26 +982,24 @@ class Store:
 
         orders_data = self.database.orders
 
+        # Orders stay as stored dicts; only the ones on the page being shown are converted
+        descending = True
         if option == "1":
-            orders = [Order.from_dict(o) for o in orders_data]
-            orders.sort(key=lambda x: x.created_at, reverse=True)
+            orders = orders_data
             status_filter = "ALL"
         elif option == "2":
-            orders = [Order.from_dict(o) for o in orders_data if o.get('status') == 'PENDING']
-            orders.sort(key=lambda x: x.created_at)
+            orders = [o for o in orders_data if o.get('status') == 'PENDING']
+            descending = False
             status_filter = "PENDING"
         elif option == "3":
-            orders = [Order.from_dict(o) for o in orders_data if o.get('status') == 'DONE']
-            orders.sort(key=lambda x: x.created_at, reverse=True)
+            orders = [o for o in orders_data if o.get('status') == 'DONE']
             status_filter = "COMPLETED"
         elif option == "4":
-            orders = [Order.from_dict(o) for o in orders_data if o.get('status') == 'CANCELLED']
-            orders.sort(key=lambda x: x.created_at, reverse=True)
+            orders = [o for o in orders_data if o.get('status') == 'CANCELLED']
             status_filter = "CANCELLED"
         elif option == "5":
             customer_name = input("Enter customer name: ").strip()
-            orders = [Order.from_dict(o) for o in orders_data if customer_name.lower() in o.get('customer_name', '').lower()]
-            orders.sort(key=lambda x: x.created_at, reverse=True)
+            orders = [o for o in orders_data if customer_name.lower() in o.get('customer_name', '').lower()]
             status_filter = f"FOR CUSTOMER: {customer_name}"
         else:
             print("Invalid option")
@@ -791,34 +1012,20 @@ class Store:
             print("No orders found")
             return
 
-        for order in orders:
-            print(f"\nOrder ID: {order.id}")
-            print(f"Customer: {order.customer_name}")
-            print(f"Status: {order.status}")
-            try:
-                created = datetime.fromisoformat(order.created_at).strftime('%Y-%m-%d %H:%M:%S')
-            except Exception:
-                created = str(order.created_at)
-            print(f"Created: {created}")
-            print("Items:")
-
-            total_amount = 0
-            for item in order.items:
-                product_code = item.get('code')
-                quantity = item.get('qty', 1)
-                product = self.product_cache.get_product(product_code)
-
-                if product:
-                    product_name = product.name
-                    price = product.price
-                    subtotal = price * quantity
-                    total_amount += subtotal
-                    print(f"  - {quantity}x {product_name} @ ${price:.2f} = ${subtotal:.2f}")
-                else:
-                    print(f"  - {quantity}x {product_code} (Product not found)")
-
-            print(f"Total: ${total_amount:.2f}")
-            print("-" * 80)
+        def format_order(i, order_data):
+            order = Order.from_dict(order_data)
+            lines = [
+                f"\nOrder ID: {order.id}",
+                f"Customer: {order.customer_name}",
+                f"Status: {order.status}",
+                f"Created: {format_date(order.created_at, '%Y-%m-%d %H:%M:%S')}",
+                "Items:"
+            ]
+            lines.extend(self.format_order_lines(order))
+            lines.append("-" * 80)
+            return "\n".join(lines)
+
+        self.listing.render(None, orders, format_order, key=order_date_key, descending=descending)
 
     def view_order_details(self):
         print("\n--- VIEW ORDER DETAILS ---")
@@ -830,7 +1037,7 @@ class Store:
 
         try:
             order_id = int(order_id)
-            order_data = next((o for o in self.database.orders if o.get('id') == order_id), None)
+            order_data = self.database.get_order(order_id)
             if not order_data:
                 print("Invalid order ID")
                 return
@@ -839,6 +1046,7 @@ class Store:
             print(f"\nOrder {order.id}:")
             print(f"Customer: {order.customer_name}")
             print(f"Status: {order.status}")
+            print(f"Priority: {order.priority}")
             try:
                 created = datetime.fromisoformat(order.created_at).strftime('%Y-%m-%d %H:%M:%S')
             except Exception:
@@ -846,40 +1054,48 @@ class Store:
             print(f"Created: {created}")
             print("Items:")
 
-            total = 0
-            for item in order.items:
-                product = self.product_cache.get_product(item.get('code'))
-                product_name = product.name if product else item.get('code')
-                quantity = item.get('qty', 1)
-                price = product.price if product else 0
-                subtotal = price * quantity
-                total += subtotal
-                print(f"  - {quantity}x {product_name} @ ${price:.2f} = ${subtotal:.2f}")
-
-            print(f"Total: ${total:.2f}")
+            self.print_order_lines(order)
 
         except (ValueError, Exception):
             print("Invalid order ID")
 
+    def print_order_lines(self, order):
+        print("\n".join(self.format_order_lines(order)))
+
+    def format_order_lines(self, order):
+        # Prices come from the snapshot taken when the order was placed
+        lines = []
+        for item in order.items:
+            quantity = item.get('qty', 1)
+            if 'price' in item:
+                subtotal = item['price'] * quantity
+                lines.append(f"  - {quantity}x {item['name']} @ ${item['price']:.2f} = ${subtotal:.2f}")
+            else:
+                lines.append(f"  - {quantity}x {item.get('code')} (Product not found)")
+
+        lines.append(f"Total: ${order.total or 0:.2f}")
+        return lines
+
     # -----------------------
     # USER RECENT VIEWS / HISTORY
     # -----------------------
     def manage_user_search_history(self):
         print("\n--- USER SEARCH HISTORY ---")
 
-        histories = [RecentView.from_dict(rv) for rv in self.database.recent_views]
+        self.recent_view_manager.flush()
 
-        if histories:
-            print("Existing user histories:")
-            for history in histories:
-                products = []
-                for code in history.stack:
-                    product = self.product_cache.get_product(code)
-                    if product:
-                        products.append(product.name)
-                    else:
-                        products.append(f"{code} (not found)")
-                print(f"  {history.identifier}: {', '.join(products)}")
+        def format_history(i, recent_view_data):
+            products = []
+            for code in recent_view_data.get('stack', []):
+                product = self.product_cache.get_product(code)
+                if product:
+                    products.append(product.name)
+                else:
+                    products.append(f"{code} (not found)")
+            return f"  {recent_view_data['identifier']}: {', '.join(products)}"
+
+        if self.database.recent_views:
+            self.listing.render("Existing user histories", self.database.recent_views, format_history)
         else:
             print("No user histories registered")
 
@@ -912,11 +1128,10 @@ class Store:
             elif option == "2":
                 user_id = input("User identifier to query (press Enter for default: 'default_user'): ").strip() or "default_user"
                 if user_id:
-                    history_data = self.database.get_recent_view(user_id)
-                    if history_data:
-                        history = RecentView.from_dict(history_data)
+                    stack = self.recent_view_manager.get_recent_views(user_id)
+                    if stack:
                         products = []
-                        for code in history.stack:
+                        for code in stack:
                             product = self.product_cache.get_product(code)
                             if product:
                                 products.append(f"{product.name} ({code})")
@@ -929,11 +1144,8 @@ class Store:
             elif option == "3":
                 user_id = input("User identifier to clear (press Enter for default: 'default_user'): ").strip() or "default_user"
                 if user_id:
-                    history_data = self.database.get_recent_view(user_id)
-                    if history_data:
-                        history = RecentView.from_dict(history_data)
-                        history.stack = []
-                        self.database.update_recent_view(history.to_dict())
+                    if self.recent_view_manager.get_recent_views(user_id):
+                        self.recent_view_manager.clear_recent_views(user_id)
                         print(f"History cleared for user {user_id}")
                     else:
                         print(f"No history for user {user_id}")
@@ -944,6 +1156,70 @@ class Store:
             else:
                 print("Invalid option")
 
+    # -----------------------
+    # SALES REPORTS
+    # -----------------------
+    def sales_reports(self):
+        while True:
+            print("\n--- SALES REPORTS ---")
+            print("1. Best sellers by units")
+            print("2. Best sellers by revenue")
+            print("3. Revenue by period")
+            print("4. Sales by category (includes subcategories)")
+            print("5. Top customers")
+            print("6. Rebuild analytics from order history")
+            print("7. Return to main menu")
+
+            option = input("\nSelect option (1-7): ").strip()
+
+            if option in ("1", "2"):
+                by = 'units' if option == "1" else 'revenue'
+                rows = self.sales_analytics.best_sellers(10, by)
+                if not rows:
+                    print("No completed orders yet")
+                for i, (code, units, revenue) in enumerate(rows, 1):
+                    product = self.product_cache.get_product(code)
+                    name = product.name if product else f"{code} (deleted)"
+                    print(f"{i:2d}. {name} [{code}] - {units} units - ${revenue:.2f}")
+
+            elif option == "3":
+                period = input("Period (day/week/month) [month]: ").strip().lower() or 'month'
+                if period not in ('day', 'week', 'month'):
+                    print("Invalid period")
+                    continue
+                start = input("From (e.g. 2025-10, 2025-W43, 2025-10-22; Enter for all): ").strip() or None
+                end = input("To (Enter for all): ").strip() or None
+                rows = self.sales_analytics.revenue_by_period(period, start, end)
+                self.listing.render(None, rows, lambda i, row: f"  {row[0]}: {row[1]} units - ${row[2]:.2f}",
+                                    empty="No sales in that range")
+
+            elif option == "4":
+                self.list_all_categories_for_selection()
+                try:
+                    category_id = int(input("Category ID: ").strip())
+                except ValueError:
+                    print("Invalid category ID")
+                    continue
+                units, revenue = self.sales_analytics.category_sales(category_id)
+                print(f"Category {category_id}: {units} units - ${revenue:.2f}")
+
+            elif option == "5":
+                rows = self.sales_analytics.top_customers(10)
+                if not rows:
+                    print("No completed orders yet")
+                for i, (name, units, revenue) in enumerate(rows, 1):
+                    print(f"{i:2d}. {name} - {units} units - ${revenue:.2f}")
+
+            elif option == "6":
+                orders = self.sales_analytics.rebuild()
+                print(f"Analytics rebuilt from {orders} completed orders")
+
+            elif option == "7":
+                break
+
+            else:
+                print("Invalid option")
+
     # -----------------------
     # INITIALIZATION & MAIN LOOP
     # -----------------------
@@ -954,12 +1230,125 @@ class Store:
         cache_stats = self.product_cache.get_cache_stats()
         print(f"Product Cache: {cache_stats.get('cached_products', 0)} products loaded")
 
+        applied = run_migrations(self.database, self.product_cache)
+        if applied:
+            print(f"Migrations applied: {', '.join(applied)}")
+
         self.order_queue.load_pending_orders()
         queue_size = self.order_queue.get_queue_size()
         print(f"Order Queue: {queue_size} pending orders loaded")
 
+        self.reservations.load_reservations()
+        reservation_stats = self.reservations.get_reservation_stats()
+        print(f"Stock Reservations: {reservation_stats['units']} units held by {reservation_stats['orders']} orders")
+
+        self.search_index.build_index()
+        index_stats = self.search_index.get_index_stats()
+        print(f"Search Index: {index_stats.get('indexed_products', 0)} products indexed")
+
+        self.completion_index.build_index()
+
+        self.stock_ledger.load()
+        ledger_stats = self.stock_ledger.get_ledger_stats()
+        print(f"Stock Ledger: {ledger_stats['movements_since_snapshot']} movements since last snapshot")
+
+        self.low_stock.build_index()
+        print(f"Low Stock: {self.low_stock.get_low_stock_stats()['low_products']} products at or below reorder level")
+
+        self.sales_analytics.load()
+        print(f"Sales Analytics: {self.sales_analytics.get_analytics_stats()['orders']} completed orders")
+
+        self.co_views.load()
+        print(f"Co-views: {self.co_views.get_coview_stats()['pairs']} product pairs viewed together")
+
+        expired = self.recent_view_manager.sweep()
+        if expired:
+            print(f"Recent Views: {expired} expired sessions removed")
+
         print("All services initialized successfully")
 
+    # -----------------------
+    # NON-INTERACTIVE COMMANDS
+    # -----------------------
+    # Each command loads only the services it uses and returns a plain dict
+    def command_process_orders(self, batch_size=ORDER_BATCH_SIZE):
+        if batch_size < 1:
+            raise ValueError("Batch size must be positive")
+        self.product_cache.initialize_cache()
+        run_migrations(self.database, self.product_cache)
+        self.stock_ledger.load()
+        self.low_stock.build_index()
+        self.order_queue.load_pending_orders()
+        self.reservations.load_reservations()
+
+        started = time.perf_counter()
+        done = cancelled = 0
+        while self.order_queue.get_queue_size():
+            for order_id in self.order_queue.process_batch_aggregated(batch_size, self.product_cache):
+                if self.database.get_order(order_id).get('status') == 'DONE':
+                    done += 1
+                else:
+                    cancelled += 1
+        elapsed = time.perf_counter() - started
+        return {
+            'processed': done + cancelled,
+            'completed': done,
+            'cancelled': cancelled,
+            'seconds': round(elapsed, 3),
+            'orders_per_second': round((done + cancelled) / elapsed, 1) if elapsed else 0.0,
+            'low_stock': [code for code, _, _ in self.low_stock.pop_alerts()]
+        }
+
+    def command_set_stock(self, code, stock):
+        self.product_cache.initialize_cache()
+        product = self.product_cache.get_product(code)
+        if not product:
+            raise ValueError(f"Product '{code}' not found")
+        if stock < 0:
+            raise ValueError("Stock cannot be negative")
+        self.reservations.load_reservations()
+        reserved = self.reservations.reserved(code)
+        if stock < reserved:
+            raise ValueError(f"Stock cannot be lower than the {reserved} units reserved by pending orders")
+        self.stock_ledger.load()
+        product = Product.from_dict(self.database.get_product(code))
+        previous = product.stock
+        kind = RESTOCK if stock > previous else ADJUSTMENT
+        product.stock = stock
+        self.database.update_product(product.to_dict())
+        with stock_movement(kind):
+            self.product_cache.update_product(product)
+        return {'code': code, 'previous': previous, 'stock': stock, 'reserved': reserved, 'kind': kind}
+
+    def command_import(self, kind, path, fmt=None, chunk_size=100000):
+        if chunk_size < 1:
+            raise ValueError("Chunk size must be positive")
+        if not os.path.exists(path):
+            raise ValueError(f"File '{path}' not found")
+        bulk = BulkIOService(self.database, self.product_cache, self.category_tree, self.order_queue,
+                             self.reservations, chunk_size)
+        if kind == 'products':
+            self.stock_ledger.load()
+        return getattr(bulk, f'import_{kind}')(path, fmt)
+
+    def command_export(self, kind, path, fmt=None):
+        bulk = BulkIOService(self.database, self.product_cache)
+        return {'exported': getattr(bulk, f'export_{kind}')(path, fmt), 'path': path}
+
+    def command_status(self):
+        self.product_cache.initialize_cache()
+        self.low_stock.build_index()
+        orders = {}
+        for order_data in self.database.orders:
+            orders[order_data.get('status')] = orders.get(order_data.get('status'), 0) + 1
+        return {
+            'products': len(self.database.products),
+            'categories': len(self.database.categories),
+            'orders': orders,
+            'low_stock': self.low_stock.get_low_stock_stats()['low_products'],
+            'recent_views': len(self.database.recent_views)
+        }
+
     def run(self):
         print(f"\n{self.name} - STORE MANAGEMENT SYSTEM")
 
@@ -974,10 +1363,11 @@ class Store:
             print("3. User Search History")
             print("4. Categories")
             print("5. Current Status")
-            print("6. Exit")
+            print("6. Sales Reports")
+            print("7. Exit")
             print("="*40)
 
-            option = input("\nSelect option (1-6): ").strip()
+            option = input("\nSelect option (1-7): ").strip()
 
             if option == "1":
                 self.manage_products_complete()
@@ -990,19 +1380,85 @@ class Store:
             elif option == "5":
                 self.show_current_status()
             elif option == "6":
+                self.sales_reports()
+            elif option == "7":
                 print(f"\nThank you for using {self.name} system")
                 break
             else:
                 print("Invalid option")
 
-def main():
-    store = Store()
-    store.run()
+def build_parser():
+    parser = argparse.ArgumentParser(description="Nadie se salva solo store. Without a command the interactive menu starts.")
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument('--json', action='store_true', help="print one JSON object")
+    commands = parser.add_subparsers(dest='command')
+
+    orders = commands.add_parser('orders', help="order operations").add_subparsers(dest='action', required=True)
+    process = orders.add_parser('process', parents=[output], help="process every pending order")
+    process.add_argument('--batch', type=int, default=ORDER_BATCH_SIZE, help="orders decided per write")
+
+    products = commands.add_parser('products', help="product operations").add_subparsers(dest='action', required=True)
+    set_stock = products.add_parser('set-stock', parents=[output], help="set the stock of a product")
+    set_stock.add_argument('code')
+    set_stock.add_argument('stock', type=int)
+
+    categories = commands.add_parser('categories', help="category operations").add_subparsers(dest='action', required=True)
+    for kind, subcommands in (('products', products), ('categories', categories), ('orders', orders)):
+        bulk_import = subcommands.add_parser('import', parents=[output], help=f"load {kind} from a CSV or JSONL file")
+        bulk_export = subcommands.add_parser('export', parents=[output], help=f"write {kind} to a CSV or JSONL file")
+        for bulk in (bulk_import, bulk_export):
+            bulk.add_argument('path')
+            bulk.add_argument('--format', choices=('csv', 'jsonl'), help="defaults to the file extension")
+        bulk_import.add_argument('--chunk', type=int, default=100000, help="rows validated and saved together")
+
+    commands.add_parser('status', parents=[output], help="store summary")
+    return parser
+
+def print_result(result, as_json):
+    if as_json:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    for key, value in result.items():
+        print(f"{key}: {value}")
+
+def run_command(store, args):
+    action = getattr(args, 'action', None)
+    if action == 'import':
+        return store.command_import(args.command, args.path, args.format, args.chunk)
+    if action == 'export':
+        return store.command_export(args.command, args.path, args.format)
+    if args.command == 'orders':
+        return store.command_process_orders(args.batch)
+    if args.command == 'products':
+        return store.command_set_stock(args.code, args.stock)
+    return store.command_status()
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    as_json = getattr(args, 'json', False)
+    store = None
+    try:
+        # Opening the store fails too, e.g. while another process holds the data file
+        store = Store()
+        if args.command is None:
+            store.run()
+            return 0
+        print_result(run_command(store, args), as_json)
+        return 0
+    except Exception as error:
+        print_result({'error': str(error)}, as_json)
+        return 1
+    finally:
+        # Recent views are written behind, so pending ones are saved on the way out
+        if store is not None:
+            store.recent_view_manager.flush()
 
 if __name__ == "__main__":
     try:
-        main()
+        sys.exit(main())
     except KeyboardInterrupt:
         print("\nProgram interrupted")
+        sys.exit(130)
     except Exception as error:
         print(f"\nError: {error}")
+        sys.exit(1)
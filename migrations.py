@@ -0,0 +1,57 @@
+import uuid
+from models import Order
+
+def backfill_order_totals(database, product_cache):
+    # Orders saved before line prices were captured get today's prices, the best still known
+    updated = 0
+    for order_data in database.orders:
+        if order_data.get('total') is None:
+            order = Order.from_dict(order_data)
+            order.capture_prices(product_cache)
+            database.update_order(order.to_dict())
+            updated += 1
+    return updated
+
+def assign_store_id(database, product_cache):
+    # Lets files kept next to the data (e.g. the order queue journal) tell which store they belong to
+    database.data.setdefault('store_id', uuid.uuid4().hex)
+    return 1
+
+def backfill_line_categories(database, product_cache):
+    # Lines saved before categories were captured get the product's current category
+    updated = 0
+    for order_data in database.orders:
+        items = order_data.get('items', [])
+        if any('category_id' not in item for item in items):
+            for item in items:
+                if 'category_id' not in item:
+                    product = product_cache.get_product(item.get('code'))
+                    item['category_id'] = product.category_id if product else None
+            database.update_order(order_data)
+            updated += 1
+    return updated
+
+# Applied in this order, each one exactly once per store
+MIGRATIONS = [
+    ('order_totals', backfill_order_totals),
+    ('store_id', assign_store_id),
+    ('line_categories', backfill_line_categories),
+]
+
+def run_migrations(database, product_cache):
+    applied = []
+    with database.batch():
+        for name, migration in MIGRATIONS:
+            if name not in database.data['migrations']:
+                migration(database, product_cache)
+                database.data['migrations'].append(name)
+                database.save()
+                applied.append(name)
+    return applied
+
+if __name__ == "__main__":
+    from database import JSONDatabase
+    from product_cache import ProductCacheService
+    database = JSONDatabase()
+    applied = run_migrations(database, ProductCacheService(database))
+    print(f"Applied migrations: {', '.join(applied)}" if applied else "Store is up to date")
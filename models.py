@@ -1,5 +1,6 @@
 import json
 import os
+import time
 from datetime import datetime
 from collections import OrderedDict
 
@@ -33,13 +34,14 @@ class Category:
         return ' -> '.join(reversed(path))
 
 class Product:
-    def __init__(self, code, name, description="", price=0.0, stock=0, category_id=None):
+    def __init__(self, code, name, description="", price=0.0, stock=0, category_id=None, reorder_level=None):
         self.code = code
         self.name = name
         self.description = description
         self.price = float(price)
         self.stock = int(stock)
         self.category_id = category_id
+        self.reorder_level = reorder_level  # None uses the store default
         self.created_at = datetime.now().isoformat()
     
     def to_dict(self):
@@ -50,6 +52,7 @@ class Product:
             'price': self.price,
             'stock': self.stock,
             'category_id': self.category_id,
+            'reorder_level': self.reorder_level,
             'created_at': self.created_at
         }
     
@@ -61,25 +64,44 @@ class Product:
             data.get('description', ''),
             data.get('price', 0.0),
             data.get('stock', 0),
-            data.get('category_id')
+            data.get('category_id'),
+            data.get('reorder_level')
         )
         product.created_at = data.get('created_at', datetime.now().isoformat())
         return product
 
 class Order:
-    def __init__(self, id, customer_name, items, status='PENDING'):
+    def __init__(self, id, customer_name, items, status='PENDING', priority='NORMAL', total=None):
         self.id = id
         self.customer_name = customer_name
-        self.items = items  # list of {'code': str, 'qty': int}
+        self.items = items  # list of {'code': str, 'qty': int, 'name': str, 'price': float}
         self.status = status
+        self.priority = priority  # 'NORMAL' or 'EXPRESS'
+        self.total = total
         self.created_at = datetime.now().isoformat()
     
+    def capture_prices(self, product_cache):
+        # Lines keep the name, unit price and category they were sold at, even if the product changes later
+        total = 0.0
+        for item in self.items:
+            if 'price' not in item or 'category_id' not in item:
+                product = product_cache.get_product(item.get('code'))
+                if product:
+                    item.setdefault('name', product.name)
+                    item.setdefault('price', product.price)
+                    item.setdefault('category_id', product.category_id)
+            if 'price' in item:
+                total += item['price'] * item.get('qty', 1)
+        self.total = round(total, 2)
+    
     def to_dict(self):
         return {
             'id': self.id,
             'customer_name': self.customer_name,
             'items': self.items,
             'status': self.status,
+            'priority': self.priority,
+            'total': self.total,
             'created_at': self.created_at
         }
     
@@ -89,16 +111,18 @@ class Order:
             data['id'],
             data['customer_name'],
             data['items'],
-            data.get('status', 'PENDING')
+            data.get('status', 'PENDING'),
+            data.get('priority', 'NORMAL'),
+            data.get('total')
         )
         order.created_at = data.get('created_at', datetime.now().isoformat())
         return order
 
 class RecentView:
-    def __init__(self, identifier, stack=None):
+    def __init__(self, identifier, stack=None, updated_at=None):
         self.identifier = identifier
         self.stack = stack or []
-        self.updated_at = datetime.now().isoformat()
+        self.updated_at = int(time.time()) if updated_at is None else updated_at  # epoch seconds
     
     def to_dict(self):
         return {
@@ -109,6 +133,11 @@ class RecentView:
     
     @classmethod
     def from_dict(cls, data):
-        recent_view = cls(data['identifier'], data.get('stack', []))
-        recent_view.updated_at = data.get('updated_at', datetime.now().isoformat())
-        return recent_view
\ No newline at end of file
+        updated_at = data.get('updated_at')
+        if isinstance(updated_at, str):
+            # Histories saved before timestamps were stored as epoch seconds
+            try:
+                updated_at = int(datetime.fromisoformat(updated_at).timestamp())
+            except ValueError:
+                updated_at = None
+        return cls(data['identifier'], data.get('stack', []), updated_at)
\ No newline at end of file
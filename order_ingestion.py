@@ -0,0 +1,244 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from models import Order
+
+class OrderIngestionService:
+    def __init__(self, database, product_cache, order_queue, reservations=None,
+                 max_pending=1000, consumers=4, max_group=500):
+        self.database = database
+        self.product_cache = product_cache
+        self.order_queue = order_queue
+        self.reservations = reservations
+        self.max_pending = max_pending
+        self.consumers = consumers
+        self.max_group = max_group
+        self._pending = None
+        self._workers = []
+        self._waiting = {}  # order id -> (future, received_at)
+        self._loop = None
+        # The JSON store has a single writer, so groups are committed one at a time
+        self._store_lock = threading.Lock()
+        self._latencies = deque(maxlen=100000)
+        self._stats = {'received': 0, 'accepted': 0, 'rejected': 0, 'completed': 0,
+                       'cancelled': 0, 'max_depth': 0}
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        self._pending = asyncio.Queue(maxsize=self.max_pending)
+        self._workers = [asyncio.create_task(self._consume()) for _ in range(self.consumers)]
+
+    async def stop(self):
+        await self._pending.join()
+        for future, _ in self._waiting.values():
+            if not future.done():
+                future.set_result({'ok': False, 'error': 'Order was not processed'})
+        self._waiting.clear()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    async def enqueue(self, request):
+        # Waits while the queue is full, which pushes back on the producer;
+        # returns a future with the order result
+        future = self._loop.create_future()
+        await self._pending.put((request, future, time.perf_counter()))
+        self._stats['received'] += 1
+        self._stats['max_depth'] = max(self._stats['max_depth'], self._pending.qsize())
+        return future
+
+    async def submit(self, request):
+        return await (await self.enqueue(request))
+
+    async def ingest_file(self, path):
+        futures = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    futures.append(await self._enqueue_line(line))
+        return await asyncio.gather(*futures)
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        async with server:
+            await server.serve_forever()
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['queue_depth'] = self._pending.qsize() if self._pending else 0
+        stats['backlog'] = self.order_queue.get_queue_size()
+        latencies = sorted(self._latencies)
+        for name, percentile in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99)):
+            value = latencies[min(len(latencies) - 1, int(percentile * len(latencies)))] if latencies else 0.0
+            stats[f'latency_{name}_ms'] = round(value * 1000, 3)
+        return stats
+
+    async def _enqueue_line(self, line):
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError as error:
+            self._stats['rejected'] += 1
+            future = self._loop.create_future()
+            future.set_result({'ok': False, 'error': f"Invalid JSON: {error}"})
+            return future
+        return await self.enqueue(request)
+
+    async def _handle_connection(self, reader, writer):
+        # One JSON order per line in, one JSON result per line out
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                result = await (await self._enqueue_line(line.decode('utf-8')))
+                writer.write((json.dumps(result) + '\n').encode('utf-8'))
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _consume(self):
+        while True:
+            group = [await self._pending.get()]
+            while len(group) < self.max_group and not self._pending.empty():
+                group.append(self._pending.get_nowait())
+            try:
+                results = await asyncio.to_thread(self._handle_group, group)
+                for (_, future, _), result in zip(group, results):
+                    if result is not None and not future.done():
+                        future.set_result(result)
+            except Exception as error:
+                for _, future, _ in group:
+                    if not future.done():
+                        future.set_result({'ok': False, 'error': str(error)})
+            finally:
+                for _ in group:
+                    self._pending.task_done()
+
+    def _handle_group(self, group):
+        # Creates every valid order of the group, then drains the queue in one write.
+        # Each request is answered on its own, so one bad request never fails the rest
+        results = []
+        accepted = {}  # order id -> position in results
+        with self._store_lock, self.database.batch():
+            for request, future, received_at in group:
+                try:
+                    order, error = self._create_order(request)
+                except Exception as exc:
+                    order, error = None, f"Invalid order: {exc}"
+                if error:
+                    self._stats['rejected'] += 1
+                    results.append({'ok': False, 'error': error})
+                    continue
+                self._stats['accepted'] += 1
+                self._waiting[order.id] = (future, received_at)
+                accepted[order.id] = len(results)
+                results.append(None)
+            try:
+                # Older backlog ahead of the group is processed too, so every order gets its answer
+                while self.order_queue.get_queue_size():
+                    self._process_queued(self.max_group)
+            except Exception as exc:
+                # The orders are saved and stay queued; answering with their ids keeps
+                # clients from placing them again
+                for order_id, position in accepted.items():
+                    if self._waiting.pop(order_id, None) is not None:
+                        results[position] = {'ok': False, 'order_id': order_id, 'status': 'PENDING',
+                                             'error': f"Order saved but not processed: {exc}"}
+        return results
+
+    def _process_queued(self, count):
+        for order_id in self.order_queue.process_batch_aggregated(count, self.product_cache):
+            waiting = self._waiting.pop(order_id, None)
+            if waiting is None:
+                continue
+            future, received_at = waiting
+            status = self.database.get_order(order_id).get('status')
+            self._stats['completed' if status == 'DONE' else 'cancelled'] += 1
+            self._latencies.append(time.perf_counter() - received_at)
+            result = {'ok': status == 'DONE', 'order_id': order_id, 'status': status}
+            self._loop.call_soon_threadsafe(self._resolve, future, result)
+
+    def _resolve(self, future, result):
+        if not future.done():
+            future.set_result(result)
+
+    def _create_order(self, request):
+        customer_name = str(request.get('customer_name', '')).strip() if isinstance(request, dict) else ''
+        if not customer_name:
+            return None, "Customer name required"
+        if not isinstance(request.get('items') or [], list):
+            return None, "items must be a list of {code, qty}"
+        items = []
+        for item in request.get('items') or []:
+            if not isinstance(item, dict):
+                return None, "items must be a list of {code, qty}"
+            code = str(item.get('code', '')).strip()
+            try:
+                qty = int(item.get('qty', 1))
+            except (TypeError, ValueError):
+                return None, f"Invalid quantity for {code}"
+            if qty <= 0:
+                return None, f"Quantity must be a positive integer for {code}"
+            if not self.product_cache.get_product(code):
+                return None, f"Product {code} not found"
+            items.append({'code': code, 'qty': qty})
+        if not items:
+            return None, "Order has no items"
+        priority = 'EXPRESS' if request.get('priority') == 'EXPRESS' else 'NORMAL'
+
+        order_id = self.database.get_next_order_id()
+        if self.reservations is not None:
+            reserved, reason = self.reservations.reserve(order_id, items)
+            if not reserved:
+                return None, reason
+        order = Order(order_id, customer_name, items, status='PENDING', priority=priority)
+        order.capture_prices(self.product_cache)
+        self.database.add_order(order.to_dict())
+        self.order_queue.add_order(order.id, order.to_dict())
+        return order, None
+
+async def _run(args):
+    from main import Store
+    store = Store(scheduling_policy=args.policy)
+    store.initialize_system()
+    service = OrderIngestionService(store.database, store.product_cache, store.order_queue,
+                                    store.reservations, args.max_pending, args.consumers)
+    await service.start()
+    if args.source == 'file':
+        started = time.perf_counter()
+        results = await service.ingest_file(args.path)
+        await service.stop()
+        elapsed = time.perf_counter() - started
+        stats = service.get_stats()
+        stats['orders_per_second'] = round(len(results) / elapsed, 1) if elapsed else 0.0
+        print(json.dumps(stats))
+    else:
+        print(f"Accepting orders on {args.host}:{args.port} (one JSON object per line)")
+        try:
+            await service.serve(args.host, args.port)
+        finally:
+            print(json.dumps(service.get_stats()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Order ingestion service")
+    parser.add_argument('--consumers', type=int, default=4)
+    parser.add_argument('--max-pending', type=int, default=1000)
+    parser.add_argument('--policy', default='fifo')
+    subparsers = parser.add_subparsers(dest='source', required=True)
+    file_parser = subparsers.add_parser('file', help="ingest orders from a JSONL file")
+    file_parser.add_argument('path')
+    serve_parser = subparsers.add_parser('serve', help="accept orders over a local socket")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    try:
+        asyncio.run(_run(parser.parse_args()))
+    except KeyboardInterrupt:
+        print("\nIngestion stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+
+class OrderQueueJournal:
+    # Append-only log of queue operations split into numbered segments:
+    #   {"op": "E", "id": 7, "data": {...}}  order enqueued
+    #   {"op": "D", "id": 7}                 order handed to a consumer
+    #   {"op": "A", "ids": [7, 8]}           orders finished and saved
+    # A checkpoint holds every unacknowledged order and the first segment to replay,
+    # so a restart reads O(pending) plus at most one segment of records.
+    # The checkpoint also names the store it was written for.
+    def __init__(self, directory, segment_records=10000, fsync=False):
+        self.directory = directory
+        self.store_id = None
+        self.segment_records = segment_records
+        self.fsync = fsync
+        self._pending = {}    # order id -> scheduling data, in enqueue order
+        self._in_flight = set()
+        self._segment = 1
+        self._records = 0
+        self._file = None
+        self._restored = False
+        self._lock = threading.RLock()
+
+    def open(self, store_id=None):
+        # Returns True when an existing journal was replayed. A journal written for another
+        # store (e.g. after restoring a different data file) is discarded instead
+        with self._lock:
+            if self._file is None:
+                if store_id is not None:
+                    self.store_id = store_id
+                os.makedirs(self.directory, exist_ok=True)
+                checkpoint = self._read_checkpoint()
+                if checkpoint is not None and checkpoint.get('store_id') != self.store_id:
+                    self._discard()
+                    checkpoint = None
+                self._restored = checkpoint is not None or bool(self._segments())
+                if checkpoint is not None:
+                    self._segment = checkpoint['segment']
+                    self._pending = {order_id: data for order_id, data in checkpoint['pending']}
+                    self._in_flight = set(checkpoint['in_flight'])
+                for segment in self._segments():
+                    if segment >= self._segment:
+                        self._replay(segment)
+                        self._segment = segment
+                self._file = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+            return self._restored
+
+    def entries(self):
+        # Orders a consumer had taken but never acknowledged are delivered again first
+        with self._lock:
+            redelivered = [(order_id, data) for order_id, data in self._pending.items() if order_id in self._in_flight]
+            queued = [(order_id, data) for order_id, data in self._pending.items() if order_id not in self._in_flight]
+            return redelivered + queued
+
+    def reset(self, entries):
+        # Starts the journal over from a known set of pending orders
+        with self._lock:
+            self.open()
+            self._pending = {order_id: data for order_id, data in entries}
+            self._in_flight = set()
+            self.checkpoint()
+
+    def enqueue(self, order_id, data):
+        with self._lock:
+            self._pending[order_id] = data
+            self._append({'op': 'E', 'id': order_id, 'data': data})
+
+    def dequeue(self, order_id):
+        with self._lock:
+            self._in_flight.add(order_id)
+            self._append({'op': 'D', 'id': order_id})
+
+    def ack(self, order_ids):
+        with self._lock:
+            order_ids = list(order_ids)
+            if not order_ids:
+                return
+            for order_id in order_ids:
+                self._pending.pop(order_id, None)
+                self._in_flight.discard(order_id)
+            self._append({'op': 'A', 'ids': order_ids})
+
+    def checkpoint(self):
+        with self._lock:
+            self.open()
+            self._file.close()
+            self._segment += 1
+            state = {
+                'store_id': self.store_id,
+                'segment': self._segment,
+                'pending': [[order_id, data] for order_id, data in self._pending.items()],
+                'in_flight': sorted(self._in_flight)
+            }
+            temp_path = self._checkpoint_path() + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(state, f, separators=(',', ':'))
+                self._sync(f)
+            os.replace(temp_path, self._checkpoint_path())
+            # Everything before the checkpoint is no longer needed for replay
+            for segment in self._segments():
+                if segment < self._segment:
+                    os.remove(self._segment_path(segment))
+            self._file = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+            self._records = 0
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def get_journal_stats(self):
+        with self._lock:
+            return {
+                'pending': len(self._pending),
+                'in_flight': len(self._in_flight),
+                'segment': self._segment,
+                'records_since_checkpoint': self._records
+            }
+
+    def _append(self, record):
+        self.open()
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._sync(self._file)
+        self._records += 1
+        if self._records >= self.segment_records:
+            self.checkpoint()
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _replay(self, segment):
+        self._records = 0
+        with open(self._segment_path(segment), 'r+b') as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line) if line.endswith(b'\n') else None
+                except ValueError:
+                    record = None
+                if record is None:
+                    # A torn last line from a crash mid-write is cut off before appending again
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if record['op'] == 'E':
+                    self._pending[record['id']] = record['data']
+                elif record['op'] == 'D':
+                    self._in_flight.add(record['id'])
+                elif record['op'] == 'A':
+                    for order_id in record['ids']:
+                        self._pending.pop(order_id, None)
+                        self._in_flight.discard(order_id)
+                self._records += 1
+
+    def _discard(self):
+        for segment in self._segments():
+            os.remove(self._segment_path(segment))
+        os.remove(self._checkpoint_path())
+
+    def _read_checkpoint(self):
+        try:
+            with open(self._checkpoint_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith('segment-') and name.endswith('.log'):
+                segments.append(int(name[len('segment-'):-len('.log')]))
+        return sorted(segments)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'segment-{segment:06d}.log')
+
+    def _checkpoint_path(self):
+        return os.path.join(self.directory, 'checkpoint.json')
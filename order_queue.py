@@ -1,62 +1,140 @@
-from collections import deque
 from models import Order, Product
+from order_scheduler import FIFOScheduler, scheduling_fields
+from stock_ledger import stock_movement, ORDER
 
 class OrderQueueService:
-    def __init__(self, database):
+    def __init__(self, database, scheduler=None, reservations=None, journal=None):
         self.database = database
-        self._queue = deque()
+        self._queue = scheduler if scheduler is not None else FIFOScheduler()
+        self.reservations = reservations
+        self.journal = journal
+        self._listeners = []
         self._loaded = False
     
+    def add_listener(self, listener):
+        # Listeners implement order_completed(order_data)
+        self._listeners.append(listener)
+    
     def load_pending_orders(self):
         if not self._loaded:
-            for order_data in self.database.orders:
-                if order_data['status'] == 'PENDING':
-                    self._queue.append(order_data['id'])
+            if self.journal is not None and self.journal.open(self.database.store_id):
+                # Restored from the journal in O(pending), orders left in PROCESSING included.
+                # Orders the data file already shows as finished are acknowledged instead
+                finished = []
+                for order_id, order_data in self.journal.entries():
+                    stored = self.database.get_order(order_id)
+                    if stored and stored.get('status') in ('PENDING', 'PROCESSING'):
+                        self._queue.push(order_id, order_data)
+                    else:
+                        finished.append(order_id)
+                self.journal.ack(finished)
+            else:
+                pending = []
+                for order_data in self.database.orders:
+                    if order_data['status'] in ('PENDING', 'PROCESSING'):
+                        self._queue.push(order_data['id'], order_data)
+                        pending.append((order_data['id'], scheduling_fields(order_data)))
+                if self.journal is not None:
+                    self.journal.reset(pending)
             self._loaded = True
     
-    def add_order(self, order_id):
-        self._queue.append(order_id)
+    def add_order(self, order_id, order_data=None):
+        if order_data is None:
+            order_data = self.database.get_order(order_id)
+        if self.journal is not None:
+            self.journal.enqueue(order_id, scheduling_fields(order_data))
+        self._queue.push(order_id, order_data)
+    
+    def pop_orders(self, count):
+        self._expire_reservations()
+        order_ids = []
+        while len(order_ids) < count:
+            order_id = self._pop()
+            if order_id is None:
+                break
+            order_ids.append(order_id)
+        return order_ids
+    
+    def process_order(self, order_id, product_cache):
+        processed = self._process_single_order(order_id, product_cache)
+        self._acknowledge([order_id])
+        return processed
     
     def process_next_order(self, product_cache):
-        if not self._queue:
-            return None
-        
-        order_id = self._queue.popleft()
-        return self._process_single_order(order_id, product_cache)
+        self._expire_reservations()
+        while True:
+            order_id = self._pop()
+            if order_id is None:
+                return None
+            # Orders cancelled while queued are skipped
+            processed = self._process_single_order(order_id, product_cache)
+            self._acknowledge([order_id])
+            if processed is not None:
+                return processed
+    
+    def _pop(self):
+        order_id = self._queue.pop()
+        if order_id is not None and self.journal is not None:
+            self.journal.dequeue(order_id)
+        return order_id
+    
+    def _acknowledge(self, order_ids):
+        # Only acknowledged once the order's final status is saved, so a crash re-delivers it
+        if self.journal is not None and order_ids:
+            self.database.after_save(lambda: self.journal.ack(order_ids))
+    
+    def _expire_reservations(self):
+        if self.reservations is not None:
+            self.reservations.expire()
     
     def _process_single_order(self, order_id, product_cache):
-        order_data = next((o for o in self.database.orders if o['id'] == order_id), None)
-        if not order_data:
+        # PROCESSING, the stock deduction and DONE are saved together, so an order
+        # re-delivered after a crash never finds its stock already taken
+        with self.database.batch():
+            return self._apply_order(order_id, product_cache)
+    
+    def _apply_order(self, order_id, product_cache):
+        order_data = self.database.get_order(order_id)
+        if not order_data or order_data.get('status') not in ('PENDING', 'PROCESSING'):
             return None
         
         order = Order.from_dict(order_data)
+        order.capture_prices(product_cache)
         order.status = 'PROCESSING'
         self.database.update_order(order.to_dict())
         
-        # Process each item in the order
-        for item in order.items:
-            product_code = item['code']
-            quantity = item.get('qty', 1)
-            
+        # Stock held at creation time is committed directly
+        with stock_movement(ORDER, [order_id]):
+            committed = self.reservations is not None and self.reservations.commit(order_id)
+        if committed:
+            order.status = 'DONE'
+            self.database.update_order(order.to_dict())
+            self._notify_completed(order)
+            return order_id
+        
+        # Check every item first so a cancelled order never leaves partial deductions
+        demand = self._order_demand(order)
+        products = {}
+        for product_code, quantity in demand.items():
             product = product_cache.get_product(product_code)
-            if not product:
+            if not product or self._unreserved_stock(product) < quantity:
                 order.status = 'CANCELLED'
                 self.database.update_order(order.to_dict())
                 return order_id
-            
-            if product.stock < quantity:
-                order.status = 'CANCELLED'
-                self.database.update_order(order.to_dict())
-                return order_id
-            
-            # Update stock
-            product.stock -= quantity
-            self.database.update_product(product.to_dict())
-            product_cache.update_product(product)
+            products[product_code] = product
+        
+        # Update stock
+        with stock_movement(ORDER, [order_id]):
+            for product_code, quantity in demand.items():
+                product = products[product_code]
+                product.stock -= quantity
+                self.database.update_product(product.to_dict())
+                product_cache.update_product(product)
         
         # Mark order as completed
         order.status = 'DONE'
         self.database.update_order(order.to_dict())
+        self._notify_completed(order)
         return order_id
     
     def process_batch(self, batch_size, product_cache):
@@ -67,6 +145,85 @@ class OrderQueueService:
                 processed.append(order_id)
         return processed
     
+    def process_batch_aggregated(self, batch_size, product_cache):
+        # Decides every order of the batch in memory, then applies one stock
+        # delta per product and writes everything with a single save
+        order_ids = self.pop_orders(batch_size)
+        orders = []
+        for order_id in order_ids:
+            order_data = self.database.get_order(order_id)
+            if order_data and order_data.get('status') in ('PENDING', 'PROCESSING'):
+                order = Order.from_dict(order_data)
+                order.capture_prices(product_cache)
+                orders.append(order)
+        
+        reserved_orders = set()
+        if self.reservations is not None:
+            reserved_orders = {order.id for order in orders if self.reservations.holds(order.id)}
+        
+        deltas = {}
+        # Units taken by unreserved orders of this batch; reserved orders, in this batch or
+        # not, are already counted by their holds until the batch is written
+        unreserved_deltas = {}
+        products = {}
+        orders_by_code = {}
+        for order in orders:
+            demand = self._order_demand(order)
+            if order.id not in reserved_orders:
+                # All-or-nothing against stock left after this batch and every reservation
+                for code, units in demand.items():
+                    product = products.get(code) or product_cache.get_product(code)
+                    if not product:
+                        order.status = 'CANCELLED'
+                        break
+                    products[code] = product
+                    if product.stock - unreserved_deltas.get(code, 0) - self._reserved_units(code) < units:
+                        order.status = 'CANCELLED'
+                        break
+                if order.status == 'CANCELLED':
+                    continue
+                for code, units in demand.items():
+                    unreserved_deltas[code] = unreserved_deltas.get(code, 0) + units
+            for code, units in demand.items():
+                products.setdefault(code, product_cache.get_product(code))
+                deltas[code] = deltas.get(code, 0) + units
+                orders_by_code.setdefault(code, []).append(order.id)
+            order.status = 'DONE'
+        
+        with self.database.batch():
+            for code, delta in deltas.items():
+                product = products[code]
+                product.stock -= delta
+                self.database.update_product(product.to_dict())
+                # One movement per product for the whole batch, listing the orders behind it
+                with stock_movement(ORDER, orders_by_code[code]):
+                    product_cache.update_product(product)
+            for order in orders:
+                if order.id in reserved_orders:
+                    self.reservations.release(order.id)
+                self.database.update_order(order.to_dict())
+        for order in orders:
+            if order.status == 'DONE':
+                self._notify_completed(order)
+        self._acknowledge(order_ids)
+        return [order.id for order in orders]
+    
+    def _notify_completed(self, order):
+        for listener in self._listeners:
+            listener.order_completed(order.to_dict())
+    
+    def _order_demand(self, order):
+        demand = {}
+        for item in order.items:
+            demand[item['code']] = demand.get(item['code'], 0) + item.get('qty', 1)
+        return demand
+    
+    def _reserved_units(self, code):
+        return self.reservations.reserved(code) if self.reservations is not None else 0
+    
+    def _unreserved_stock(self, product):
+        return product.stock - self._reserved_units(product.code)
+    
     def get_queue_size(self):
         return len(self._queue)
     
@@ -0,0 +1,128 @@
+import heapq
+import itertools
+from collections import deque
+from datetime import datetime
+
+EXPRESS = 'EXPRESS'
+NORMAL = 'NORMAL'
+
+# Score gap that keeps normal orders behind express ones until they age
+NORMAL_ORDER_PENALTY = 100
+
+def order_units(order_data):
+    return sum(item.get('qty', 1) for item in (order_data or {}).get('items', []))
+
+def order_score(order_data):
+    # Lower scores are dispatched first: express before normal, small before big
+    base = 0 if (order_data or {}).get('priority') == EXPRESS else NORMAL_ORDER_PENALTY
+    return base + order_units(order_data)
+
+def scheduling_fields(order_data):
+    # The part of an order the schedulers look at
+    return {key: order_data[key] for key in ('priority', 'items', 'created_at') if key in (order_data or {})}
+
+def order_timestamp(order_data):
+    try:
+        return datetime.fromisoformat(order_data['created_at']).timestamp()
+    except Exception:
+        return datetime.now().timestamp()
+
+class FIFOScheduler:
+    def __init__(self):
+        self._queue = deque()
+
+    def push(self, order_id, order_data=None):
+        self._queue.append(order_id)
+
+    def pop(self):
+        return self._queue.popleft() if self._queue else None
+
+    def __len__(self):
+        return len(self._queue)
+
+    def clear(self):
+        self._queue.clear()
+
+class PriorityScheduler:
+    def __init__(self, score=order_score):
+        self._score = score
+        self._heap = []
+        self._sequence = itertools.count()
+
+    def push(self, order_id, order_data=None):
+        # The sequence number keeps equal scores in FIFO order
+        heapq.heappush(self._heap, (self._key(order_data), next(self._sequence), order_id))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[2] if self._heap else None
+
+    def __len__(self):
+        return len(self._heap)
+
+    def clear(self):
+        self._heap.clear()
+
+    def _key(self, order_data):
+        return self._score(order_data)
+
+class AgingScheduler(PriorityScheduler):
+    def __init__(self, score=order_score, points_per_minute=1.0):
+        super().__init__(score)
+        self.points_per_minute = points_per_minute
+
+    def _key(self, order_data):
+        # Effective score is score - rate * (now - created); ordering by
+        # score + rate * created is the same at any "now", so keys never change
+        return self._score(order_data) + self.points_per_minute * order_timestamp(order_data) / 60
+
+class WeightedFairScheduler:
+    DEFAULT_WEIGHTS = {'express': 4, 'small': 2, 'standard': 1}
+
+    def __init__(self, weights=None, small_order_units=3):
+        self.weights = dict(weights or self.DEFAULT_WEIGHTS)
+        self.small_order_units = small_order_units
+        self._heap = []
+        self._sequence = itertools.count()
+        self._virtual_time = 0.0
+        self._last_finish = {}
+
+    def lane_for(self, order_data):
+        if (order_data or {}).get('priority') == EXPRESS:
+            return 'express'
+        if order_units(order_data) <= self.small_order_units:
+            return 'small'
+        return 'standard'
+
+    def push(self, order_id, order_data=None):
+        lane = self.lane_for(order_data)
+        start = max(self._virtual_time, self._last_finish.get(lane, 0.0))
+        finish = start + 1.0 / self.weights.get(lane, 1)
+        self._last_finish[lane] = finish
+        heapq.heappush(self._heap, (finish, next(self._sequence), order_id))
+
+    def pop(self):
+        if not self._heap:
+            return None
+        finish, _, order_id = heapq.heappop(self._heap)
+        self._virtual_time = finish
+        return order_id
+
+    def __len__(self):
+        return len(self._heap)
+
+    def clear(self):
+        self._heap.clear()
+        self._last_finish.clear()
+        self._virtual_time = 0.0
+
+SCHEDULERS = {
+    'fifo': FIFOScheduler,
+    'priority': PriorityScheduler,
+    'aging': AgingScheduler,
+    'fair': WeightedFairScheduler
+}
+
+def create_scheduler(policy='fifo', **options):
+    if policy not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduling policy '{policy}'")
+    return SCHEDULERS[policy](**options)
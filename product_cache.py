@@ -1,10 +1,15 @@
+import threading
 from models import Product
+from shared_product_cache import SharedProductCache
 
 class ProductCacheService:
-    def __init__(self, database):
+    def __init__(self, database, shared_cache=None):
         self.database = database
         self._cache = {}
         self._initialized = False
+        self.shared_cache = shared_cache
+        self._listeners = []
+        self._lock = threading.RLock()
     
     def initialize_cache(self):
         if not self._initialized:
@@ -19,25 +24,71 @@ class ProductCacheService:
             return product
         
         # Cache miss - search in database
-        for product_data in self.database.products:
-            if product_data['code'] == code:
-                product = Product.from_dict(product_data)
-                self._cache[code] = product
-                return product
+        product_data = self.database.get_product(code)
+        if product_data is not None:
+            product = Product.from_dict(product_data)
+            self._cache[code] = product
+            return product
         return None
     
+    @property
+    def lock(self):
+        # Held while a change reaches the listeners; readers of their indexes on other
+        # threads hold it too, so they never see an index halfway through an update
+        return self._lock
+
+    def add_listener(self, listener):
+        # Listeners (search indexes, etc.) implement product_updated(product) and product_removed(code)
+        self._listeners.append(listener)
+    
     def update_product(self, product):
-        self._cache[product.code] = product
+        with self._lock:
+            self._cache[product.code] = product
+            if self.shared_cache is not None:
+                self.shared_cache.update_product(product)
+            for listener in self._listeners:
+                listener.product_updated(product)
+    
+    def update_products(self, products):
+        # Listeners with products_updated(products) get the whole batch at once
+        with self._lock:
+            for product in products:
+                self._cache[product.code] = product
+                if self.shared_cache is not None:
+                    self.shared_cache.update_product(product)
+            for listener in self._listeners:
+                if hasattr(listener, 'products_updated'):
+                    listener.products_updated(products)
+                else:
+                    for product in products:
+                        listener.product_updated(product)
     
     def remove_product(self, code):
-        self._cache.pop(code, None)
+        with self._lock:
+            self._cache.pop(code, None)
+            if self.shared_cache is not None:
+                self.shared_cache.remove_product(code)
+            for listener in self._listeners:
+                listener.product_removed(code)
+    
+    def publish_shared(self, name=None, capacity=None):
+        # Build a shared segment another process can attach to read-only; no part of
+        # the store attaches to it yet, its own workers are threads sharing this cache
+        self.initialize_cache()
+        if self.shared_cache is None:
+            self.shared_cache = SharedProductCache.create(self._cache.values(), name=name, capacity=capacity)
+        return self.shared_cache.name
     
     def clear_cache(self):
         self._cache.clear()
         self._initialized = False
     
     def get_cache_stats(self):
-        return {
+        stats = {
             'cached_products': len(self._cache),
             'initialized': self._initialized
-        }
\ No newline at end of file
+        }
+        if self.shared_cache is not None:
+            stats['shared_cache'] = self.shared_cache.name
+            stats['shared_version'] = self.shared_cache.version
+        return stats
\ No newline at end of file
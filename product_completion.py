@@ -0,0 +1,121 @@
+import difflib
+from bisect import bisect_left, insort
+from search_index import fold_text
+
+class ProductCompletionIndex:
+    def __init__(self, database):
+        self.database = database
+        self._codes = []    # sorted (folded code, code)
+        self._tokens = []   # sorted (folded name token, code)
+        self._product_tokens = {}  # code -> tuple of indexed name tokens
+        self._initialized = False
+
+    def build_index(self):
+        if not self._initialized:
+            codes = []
+            tokens = []
+            for product_data in self.database.products:
+                code = product_data['code']
+                name_tokens = self._name_tokens(product_data.get('name', ''))
+                self._product_tokens[code] = name_tokens
+                codes.append((fold_text(code), code))
+                tokens.extend((token, code) for token in name_tokens)
+            self._codes = sorted(codes)
+            self._tokens = sorted(tokens)
+            self._initialized = True
+
+    def product_updated(self, product):
+        if not self._initialized:
+            return
+        name_tokens = self._name_tokens(product.name)
+        previous = self._product_tokens.get(product.code)
+        if previous == name_tokens:
+            return
+        if previous is None:
+            insort(self._codes, (fold_text(product.code), product.code))
+        else:
+            self._remove_tokens(product.code, previous)
+        for token in name_tokens:
+            insort(self._tokens, (token, product.code))
+        self._product_tokens[product.code] = name_tokens
+
+    def products_updated(self, products):
+        # Bulk form: stale entries are dropped in one pass and each list is sorted once
+        if not self._initialized:
+            return
+        previous = {}
+        for product in products:
+            if product.code not in previous:
+                previous[product.code] = self._product_tokens.get(product.code)
+            self._product_tokens[product.code] = self._name_tokens(product.name)
+        changed = {code: tokens for code, tokens in previous.items() if tokens != self._product_tokens[code]}
+        stale = {(token, code) for code, tokens in changed.items() if tokens for token in tokens}
+        if stale:
+            self._tokens = [entry for entry in self._tokens if entry not in stale]
+        new_codes = [(fold_text(code), code) for code, tokens in changed.items() if tokens is None]
+        if new_codes:
+            self._codes.extend(new_codes)
+            self._codes.sort()
+        new_tokens = [(token, code) for code in changed for token in self._product_tokens[code]]
+        if new_tokens:
+            self._tokens.extend(new_tokens)
+            self._tokens.sort()
+
+    def product_removed(self, code):
+        previous = self._product_tokens.pop(code, None)
+        if previous is None:
+            return
+        self._remove_entry(self._codes, (fold_text(code), code))
+        self._remove_tokens(code, previous)
+
+    def complete(self, prefix, k=10):
+        prefix = fold_text(prefix.strip())
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        # Code matches first, then products whose name has a word starting with the prefix
+        for entries in (self._codes, self._tokens):
+            for code in self._scan_prefix(entries, prefix):
+                if code not in seen:
+                    seen.add(code)
+                    results.append(code)
+                    if len(results) >= k:
+                        return results
+        return results
+
+    def suggest(self, code, k=3):
+        query = fold_text(code.strip())
+        if not query:
+            return []
+        # Widen the prefix until something matches, then rank by similarity
+        for cut in range(len(query), 0, -1):
+            candidates = []
+            for candidate in self._scan_prefix(self._codes, query[:cut]):
+                candidates.append(candidate)
+                if len(candidates) >= 50:
+                    break
+            if candidates:
+                break
+        else:
+            return []
+        candidates.sort(key=lambda c: -difflib.SequenceMatcher(None, query, fold_text(c)).ratio())
+        return candidates[:k]
+
+    def _scan_prefix(self, entries, prefix):
+        position = bisect_left(entries, (prefix,))
+        while position < len(entries) and entries[position][0].startswith(prefix):
+            yield entries[position][1]
+            position += 1
+
+    def _remove_tokens(self, code, tokens):
+        for token in tokens:
+            self._remove_entry(self._tokens, (token, code))
+
+    def _remove_entry(self, entries, entry):
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def _name_tokens(self, name):
+        return tuple(sorted(set(fold_text(name).split())))
@@ -0,0 +1,237 @@
+from bisect import bisect_left, bisect_right, insort
+
+SORT_FIELDS = ('price', 'stock', 'created_at')
+
+class ProductQuery:
+    def __init__(self, name_terms=None, category_id=None, price_min=None, price_max=None,
+                 in_stock_only=False, sort_by=None, descending=False, limit=None, offset=0):
+        if sort_by is not None and sort_by not in SORT_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort_by}'")
+        self.name_terms = (name_terms or '').strip()
+        self.category_id = category_id
+        self.price_min = price_min
+        self.price_max = price_max
+        self.in_stock_only = in_stock_only
+        self.sort_by = sort_by
+        self.descending = descending
+        self.limit = limit
+        self.offset = offset
+
+    def to_dict(self):
+        return {
+            'name_terms': self.name_terms,
+            'category_id': self.category_id,
+            'price_min': self.price_min,
+            'price_max': self.price_max,
+            'in_stock_only': self.in_stock_only,
+            'sort_by': self.sort_by,
+            'descending': self.descending,
+            'limit': self.limit,
+            'offset': self.offset
+        }
+
+class ProductQueryService:
+    def __init__(self, database, product_cache, category_tree, search_index, result_cache=None):
+        self.database = database
+        self.product_cache = product_cache
+        self.category_tree = category_tree
+        self.search_index = search_index
+        self.result_cache = result_cache
+        self._price_index = []   # sorted (price, code)
+        self._stock_index = []   # sorted (stock, code)
+        self._by_category = {}   # category_id -> set of codes
+        self._indexed = {}       # code -> (price, stock, category_id)
+        self._initialized = False
+
+    def build_index(self):
+        if not self._initialized:
+            for product_data in self.database.products:
+                self._indexed[product_data['code']] = (
+                    float(product_data.get('price', 0.0)),
+                    int(product_data.get('stock', 0)),
+                    product_data.get('category_id')
+                )
+            self._price_index = sorted((price, code) for code, (price, _, _) in self._indexed.items())
+            self._stock_index = sorted((stock, code) for code, (_, stock, _) in self._indexed.items())
+            for code, (_, _, category_id) in self._indexed.items():
+                self._by_category.setdefault(category_id, set()).add(code)
+            self._initialized = True
+
+    def product_updated(self, product):
+        if not self._initialized:
+            return
+        values = (product.price, product.stock, product.category_id)
+        previous = self._indexed.get(product.code)
+        if previous == values:
+            return
+        if previous is not None:
+            self._unindex(product.code, previous, values)
+        self._indexed[product.code] = values
+        if previous is None or previous[0] != values[0]:
+            insort(self._price_index, (values[0], product.code))
+        if previous is None or previous[1] != values[1]:
+            insort(self._stock_index, (values[1], product.code))
+        if previous is None or previous[2] != values[2]:
+            self._by_category.setdefault(values[2], set()).add(product.code)
+
+    def product_removed(self, code):
+        previous = self._indexed.pop(code, None)
+        if previous is not None:
+            self._unindex(code, previous, (None, None, None))
+
+    def search(self, query):
+        # Returns (products in the requested page, total matches)
+        self.build_index()
+        if self.result_cache is not None:
+            key = tuple(value for name, value in query.to_dict().items() if name not in ('limit', 'offset'))
+            codes = self.result_cache.get_or_compute(
+                ('query',) + key,
+                lambda: self._ordered_codes(query),
+                self._product_predicate(query),
+                self._product_order_key(query),
+                self._product_fields(query)
+            )
+        else:
+            codes = self._ordered_codes(query)
+        total = len(codes)
+
+        end = None if query.limit is None else query.offset + query.limit
+        products = [self.product_cache.get_product(code) for code in codes[query.offset:end]]
+        return [product for product in products if product], total
+
+    def explain(self, query):
+        self.build_index()
+        return [(name, estimate) for name, estimate, _ in self._plan(query)]
+
+    def _ordered_codes(self, query):
+        codes = self._evaluate(query)
+        if query.sort_by:
+            return self._sort(codes, query.sort_by, query.descending)
+        if not query.name_terms:
+            return sorted(codes, reverse=query.descending)
+        return sorted(codes, key=lambda code: self.search_index.rank_key(code, query.name_terms))
+
+    def _product_predicate(self, query):
+        category_ids = None
+        if query.category_id is not None:
+            category_ids = set(self._subtree_ids(query.category_id))
+
+        def matches(product):
+            if query.name_terms and not self.search_index.product_matches(product, query.name_terms):
+                return False
+            if category_ids is not None and product.category_id not in category_ids:
+                return False
+            if query.price_min is not None and product.price < query.price_min:
+                return False
+            if query.price_max is not None and product.price > query.price_max:
+                return False
+            return not query.in_stock_only or product.stock > 0
+        return matches
+
+    def _product_order_key(self, query):
+        if query.sort_by:
+            return lambda product: getattr(product, query.sort_by)
+        if query.name_terms:
+            return lambda product: self.search_index.product_rank(product, query.name_terms)
+        return None
+
+    def _product_fields(self, query):
+        # The product fields read by _product_predicate and _product_order_key
+        fields = set()
+        if query.name_terms:
+            fields.update(('name', 'description'))
+        if query.category_id is not None:
+            fields.add('category_id')
+        if query.price_min is not None or query.price_max is not None:
+            fields.add('price')
+        if query.in_stock_only:
+            fields.add('in_stock')
+        if query.sort_by:
+            fields.add(query.sort_by)
+        return fields
+
+    def _evaluate(self, query):
+        plan = self._plan(query)
+        if not plan:
+            return sorted(self._indexed)
+
+        # Materialize the most selective predicate, then check the rest per candidate
+        _, _, fetch = plan[0]
+        candidates = fetch()
+        for name, _, _ in plan[1:]:
+            if not candidates:
+                break
+            check = self._checker(name, query)
+            candidates = [code for code in candidates if check(code)]
+        return list(candidates)
+
+    def _plan(self, query):
+        plan = []
+        if query.name_terms:
+            terms = query.name_terms
+            plan.append(('name', self.search_index.estimate(terms), lambda: self.search_index.search(terms)))
+        if query.category_id is not None:
+            category_ids = self._subtree_ids(query.category_id)
+            estimate = sum(len(self._by_category.get(cid, ())) for cid in category_ids)
+            plan.append(('category', estimate, lambda: [code for cid in category_ids
+                                                        for code in self._by_category.get(cid, ())]))
+        if query.price_min is not None or query.price_max is not None:
+            price_low, price_high = self._price_bounds(query)
+            plan.append(('price', price_high - price_low,
+                         lambda: [code for _, code in self._price_index[price_low:price_high]]))
+        if query.in_stock_only:
+            stock_low = bisect_left(self._stock_index, (1,))
+            plan.append(('in_stock', len(self._stock_index) - stock_low,
+                         lambda: [code for _, code in self._stock_index[stock_low:]]))
+        plan.sort(key=lambda step: step[1])
+        return plan
+
+    def _checker(self, name, query):
+        if name == 'name':
+            return lambda code: self.search_index.matches(code, query.name_terms)
+        if name == 'category':
+            category_ids = set(self._subtree_ids(query.category_id))
+            return lambda code: self._indexed[code][2] in category_ids
+        if name == 'price':
+            low = float('-inf') if query.price_min is None else query.price_min
+            high = float('inf') if query.price_max is None else query.price_max
+            return lambda code: low <= self._indexed[code][0] <= high
+        return lambda code: self._indexed[code][1] > 0
+
+    def _sort(self, codes, field, descending):
+        if field == 'created_at':
+            def sort_key(code):
+                product = self.product_cache.get_product(code)
+                return product.created_at if product else ''
+        else:
+            position = 0 if field == 'price' else 1
+            sort_key = lambda code: self._indexed[code][position]
+        return sorted(codes, key=sort_key, reverse=descending)
+
+    def _price_bounds(self, query):
+        low = 0
+        high = len(self._price_index)
+        if query.price_min is not None:
+            low = bisect_left(self._price_index, (float(query.price_min),))
+        if query.price_max is not None:
+            # (price, chr(0x10FFFF)) sorts after every code with the same price
+            high = bisect_right(self._price_index, (float(query.price_max), chr(0x10FFFF)))
+        return low, max(low, high)
+
+    def _subtree_ids(self, category_id):
+        return [category.id for category in self.category_tree.get_subtree_categories(category_id)]
+
+    def _unindex(self, code, previous, values):
+        if previous[0] != values[0]:
+            self._remove_entry(self._price_index, (previous[0], code))
+        if previous[1] != values[1]:
+            self._remove_entry(self._stock_index, (previous[1], code))
+        if previous[2] != values[2]:
+            codes = self._by_category.get(previous[2])
+            if codes is not None:
+                codes.discard(code)
+
+    def _remove_entry(self, entries, entry):
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
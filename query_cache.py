@@ -0,0 +1,112 @@
+from collections import OrderedDict
+
+# Product fields a cached result can depend on; in_stock is stock > 0
+PRODUCT_FIELDS = ('name', 'description', 'price', 'stock', 'in_stock', 'category_id', 'created_at')
+
+def _field_values(product):
+    return (product.name, product.description, product.price, product.stock,
+            product.stock > 0, product.category_id, product.created_at)
+
+class _CachedResult:
+    def __init__(self, codes, matches, order_key, fields):
+        self.codes = codes
+        self.matches = matches
+        self.order_key = order_key
+        self.fields = fields
+        # Sort key of each result at caching time, to notice reorderings
+        self.keys = dict.fromkeys(codes)
+
+class SearchResultCache:
+    def __init__(self, product_cache, max_entries=128):
+        self.product_cache = product_cache
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # field -> keys of the entries whose predicate or order reads it
+        self._by_field = {field: set() for field in PRODUCT_FIELDS}
+        # Field values of each product as of its last update, to tell which fields changed
+        self._last_values = {}
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._evictions = 0
+
+    def get_or_compute(self, key, compute, matches, order_key=None, fields=None):
+        # compute() returns the ordered list of matching product codes;
+        # matches(product) and order_key(product) let mutations invalidate precisely.
+        # fields names the product fields both of them read (all of them when None)
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry.codes
+
+        self._misses += 1
+        fields = PRODUCT_FIELDS if fields is None else tuple(fields)
+        entry = _CachedResult(list(compute()), matches, order_key, fields)
+        if order_key is not None:
+            for code in entry.codes:
+                product = self.product_cache.get_product(code)
+                entry.keys[code] = order_key(product) if product else None
+        self._entries[key] = entry
+        for field in fields:
+            self._by_field[field].add(key)
+        while len(self._entries) > self.max_entries:
+            self._forget(*self._entries.popitem(last=False))
+            self._evictions += 1
+        return entry.codes
+
+    def product_updated(self, product):
+        values = _field_values(product)
+        previous = self._last_values.get(product.code)
+        self._last_values[product.code] = values
+        if previous is None:
+            # First update seen for this product: its old values are unknown
+            keys = list(self._entries)
+        else:
+            # Only entries reading a changed field can change, so a stock-only update
+            # skips everything but stock-sorted results and in_stock filters on 0 <-> 1
+            keys = set()
+            for field, old, new in zip(PRODUCT_FIELDS, previous, values):
+                if old != new:
+                    keys |= self._by_field[field]
+        stale = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            was_in = product.code in entry.keys
+            if was_in != bool(entry.matches(product)):
+                stale.append(key)
+            elif was_in and entry.order_key is not None and entry.order_key(product) != entry.keys[product.code]:
+                stale.append(key)
+        self._drop(stale)
+
+    def product_removed(self, code):
+        self._last_values.pop(code, None)
+        self._drop([key for key, entry in self._entries.items() if code in entry.keys])
+
+    def invalidate_all(self):
+        self._invalidations += len(self._entries)
+        self._entries.clear()
+        for keys in self._by_field.values():
+            keys.clear()
+
+    def get_cache_stats(self):
+        lookups = self._hits + self._misses
+        return {
+            'entries': len(self._entries),
+            'hits': self._hits,
+            'misses': self._misses,
+            'hit_rate': self._hits / lookups if lookups else 0.0,
+            'invalidations': self._invalidations,
+            'evictions': self._evictions
+        }
+
+    def _drop(self, keys):
+        for key in keys:
+            self._forget(key, self._entries.pop(key))
+        self._invalidations += len(keys)
+
+    def _forget(self, key, entry):
+        for field in entry.fields:
+            self._by_field[field].discard(key)
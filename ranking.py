@@ -0,0 +1,34 @@
+import bisect
+
+class CountRanking:
+    # Names kept sorted by descending value, so the top N is a slice. Used by the sales
+    # rankings and the co-view counts
+    def __init__(self):
+        self._keys = []
+        self._values = {}
+
+    def load(self, values):
+        self._values = dict(values)
+        self._keys = sorted((-value, name) for name, value in self._values.items())
+
+    def add(self, name, amount):
+        old = self._values.get(name)
+        if old is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-old, name))]
+        value = (old or 0) + amount
+        self._values[name] = value
+        bisect.insort(self._keys, (-value, name))
+
+    def discard(self, name):
+        value = self._values.pop(name, None)
+        if value is not None:
+            del self._keys[bisect.bisect_left(self._keys, (-value, name))]
+
+    def top(self, n):
+        return [name for _, name in self._keys[:n]]
+
+    def get(self, name):
+        return self._values.get(name, 0)
+
+    def __len__(self):
+        return len(self._keys)
@@ -1,12 +1,15 @@
+from array import array
 from collections import OrderedDict
 from models import RecentView
-from datetime import datetime
+import threading
+import time
 
 class RecentViewStackService:
-    def __init__(self, identifier, database, max_size=5):
+    def __init__(self, identifier, database, max_size=5, co_views=None):
         self.identifier = identifier
         self.database = database
         self.max_size = max_size
+        self.co_views = co_views
         
         recent_view_data = self.database.get_recent_view(identifier)
         if recent_view_data:
@@ -20,6 +23,7 @@ class RecentViewStackService:
             self._stack_dict[code] = None
     
     def add_product(self, product_code):
+        old_stack = list(self._stack_dict)
         if product_code in self._stack_dict:
             del self._stack_dict[product_code]
         
@@ -29,40 +33,326 @@ class RecentViewStackService:
             self._stack_dict.popitem(last=False)
         
         self._save_to_db()
+        self._stack_changed(old_stack)
     
     def get_recent_products(self):
         return list(self._stack_dict.keys())
     
     def remove_product(self, product_code):
         if product_code in self._stack_dict:
+            old_stack = list(self._stack_dict)
             del self._stack_dict[product_code]
             self._save_to_db()
+            self._stack_changed(old_stack)
             return True
         return False
     
     def clear_stack(self):
+        old_stack = list(self._stack_dict)
         self._stack_dict.clear()
         self._save_to_db()
+        self._stack_changed(old_stack)
     
     def get_stack_size(self):
         return len(self._stack_dict)
     
+    def _stack_changed(self, old_stack):
+        if self.co_views is not None:
+            self.co_views.stack_changed(old_stack, list(self._stack_dict))
+    
     def _save_to_db(self):
         self.recent_view.stack = list(self._stack_dict.keys())
-        self.recent_view.updated_at = datetime.now().isoformat()
+        self.recent_view.updated_at = int(time.time())
         self.database.update_recent_view(self.recent_view.to_dict())
 
+class CompactRecentViews:
+    # Every stack lives in one flat array of unsigned ints. A record is
+    # [updated_at, head, count, slot_0 .. slot_{max_size-1}], a ring buffer whose
+    # head is the oldest entry, and slots hold interned product code ids.
+    UPDATED, HEAD, COUNT, SLOTS = 0, 1, 2, 3
+
+    def __init__(self, max_size=5):
+        self.max_size = max_size
+        self._record_size = max_size + self.SLOTS
+        self._data = array('I')
+        self._index = OrderedDict()  # identifier -> record number, least recently used first
+        self._free = []
+        self._code_ids = {}
+        self._codes = []
+
+    def __contains__(self, identifier):
+        return identifier in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, identifier):
+        # Oldest first, like RecentViewStackService.get_recent_products
+        base = self._base(identifier)
+        if base is None:
+            return []
+        head, count = self._data[base + self.HEAD], self._data[base + self.COUNT]
+        slots = base + self.SLOTS
+        return [self._codes[self._data[slots + (head + i) % self.max_size]] for i in range(count)]
+
+    def updated_at(self, identifier):
+        base = self._base(identifier)
+        return None if base is None else self._data[base + self.UPDATED]
+
+    def put(self, identifier, codes, updated_at):
+        base = self._base(identifier)
+        if base is None:
+            base = self._allocate(identifier)
+        codes = codes[-self.max_size:]
+        self._data[base + self.UPDATED] = int(updated_at)
+        self._data[base + self.HEAD] = 0
+        self._data[base + self.COUNT] = len(codes)
+        for i, code in enumerate(codes):
+            self._data[base + self.SLOTS + i] = self._intern(code)
+
+    def add(self, identifier, code, now):
+        base = self._base(identifier)
+        if base is None:
+            base = self._allocate(identifier)
+        code_id = self._intern(code)
+        self._remove_id(base, code_id)
+        head, count = self._data[base + self.HEAD], self._data[base + self.COUNT]
+        if count == self.max_size:
+            # Full ring: the oldest entry is overwritten
+            head = (head + 1) % self.max_size
+            count -= 1
+        self._data[base + self.SLOTS + (head + count) % self.max_size] = code_id
+        self._data[base + self.HEAD] = head
+        self._data[base + self.COUNT] = count + 1
+        self._data[base + self.UPDATED] = int(now)
+
+    def remove(self, identifier, code, now):
+        base = self._base(identifier)
+        if base is None or code not in self._code_ids:
+            return False
+        if not self._remove_id(base, self._code_ids[code]):
+            return False
+        self._data[base + self.UPDATED] = int(now)
+        return True
+
+    def clear(self, identifier, now):
+        self.put(identifier, [], now)
+
+    def touch(self, identifier):
+        self._index.move_to_end(identifier)
+
+    def oldest(self):
+        return next(iter(self._index), None)
+
+    def discard(self, identifier):
+        record = self._index.pop(identifier, None)
+        if record is not None:
+            self._free.append(record)
+
+    def expired(self, cutoff):
+        # Identifiers not updated since cutoff; one pass over the array
+        data, step = self._data, self._record_size
+        return [identifier for identifier, record in self._index.items() if data[record * step] < cutoff]
+
+    def memory_bytes(self):
+        return self._data.buffer_info()[1] * self._data.itemsize
+
+    def _base(self, identifier):
+        record = self._index.get(identifier)
+        return None if record is None else record * self._record_size
+
+    def _allocate(self, identifier):
+        if self._free:
+            record = self._free.pop()
+        else:
+            record = len(self._data) // self._record_size
+            self._data.extend([0] * self._record_size)
+        self._index[identifier] = record
+        base = record * self._record_size
+        self._data[base + self.HEAD] = 0
+        self._data[base + self.COUNT] = 0
+        return base
+
+    def _intern(self, code):
+        code_id = self._code_ids.get(code)
+        if code_id is None:
+            code_id = self._code_ids[code] = len(self._codes)
+            self._codes.append(code)
+        return code_id
+
+    def _remove_id(self, base, code_id):
+        head, count = self._data[base + self.HEAD], self._data[base + self.COUNT]
+        slots = base + self.SLOTS
+        for i in range(count):
+            if self._data[slots + (head + i) % self.max_size] == code_id:
+                # Newer entries move back one slot to close the gap
+                for j in range(i, count - 1):
+                    self._data[slots + (head + j) % self.max_size] = self._data[slots + (head + j + 1) % self.max_size]
+                self._data[base + self.COUNT] = count - 1
+                return True
+        return False
+
+def _stored_updated_at(recent_view_data):
+    # Stored as epoch seconds; older records may hold an ISO string, parsed by the model
+    updated_at = recent_view_data.get('updated_at')
+    if isinstance(updated_at, (int, float)):
+        return updated_at
+    return RecentView.from_dict(recent_view_data).updated_at
+
 class RecentViewManager:
-    def __init__(self, database):
+    # Stacks stay in memory in LRU order; changed ones are written together in one save.
+    # Sessions idle for longer than ttl_seconds are swept from memory and storage at startup
+    # and, in long-running processes, by a background thread every sweep_interval
+    def __init__(self, database, max_size=5, max_sessions=1000000, flush_threshold=500,
+                 flush_interval=30.0, ttl_seconds=30 * 24 * 60 * 60, sweep_interval=60 * 60, co_views=None):
         self.database = database
-    
+        self.co_views = co_views
+        self.max_sessions = max_sessions
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._views = CompactRecentViews(max_size)
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._lock = threading.RLock()
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'flushes': 0, 'written': 0, 'expired': 0}
+
     def get_stack(self, identifier, max_size=5):
-        return RecentViewStackService(identifier, self.database, max_size)
-    
+        # A standalone stack that saves every change; the registry reloads the identifier afterwards
+        with self._lock:
+            self.flush()
+            self._views.discard(identifier)
+            return RecentViewStackService(identifier, self.database, max_size, self.co_views)
+
     def add_to_recent_view(self, identifier, product_code):
-        stack = RecentViewStackService(identifier, self.database)
-        stack.add_product(product_code)
-    
+        with self._lock:
+            self._load(identifier)
+            old_stack = self._views.get(identifier)
+            self._views.add(identifier, product_code, time.time())
+            self._stack_changed(identifier, old_stack)
+            self._mark_dirty(identifier)
+
     def get_recent_views(self, identifier):
-        stack = RecentViewStackService(identifier, self.database)
-        return stack.get_recent_products()
\ No newline at end of file
+        with self._lock:
+            self._load(identifier)
+            return self._views.get(identifier)
+
+    def remove_from_recent_view(self, identifier, product_code):
+        with self._lock:
+            self._load(identifier)
+            old_stack = self._views.get(identifier)
+            if self._views.remove(identifier, product_code, time.time()):
+                self._stack_changed(identifier, old_stack)
+                self._mark_dirty(identifier)
+                return True
+            return False
+
+    def clear_recent_views(self, identifier):
+        with self._lock:
+            self._load(identifier)
+            old_stack = self._views.get(identifier)
+            self._views.clear(identifier, time.time())
+            self._stack_changed(identifier, old_stack)
+            self._mark_dirty(identifier)
+
+    def flush(self):
+        with self._lock:
+            if self._dirty:
+                with self.database.batch():
+                    for identifier in self._dirty:
+                        recent_view = RecentView(identifier, self._views.get(identifier), self._views.updated_at(identifier))
+                        self.database.update_recent_view(recent_view.to_dict())
+                self._stats['flushes'] += 1
+                self._stats['written'] += len(self._dirty)
+                self._dirty.clear()
+            self._last_flush = time.monotonic()
+
+    def sweep(self, now=None):
+        # Drops sessions idle for longer than the TTL, in memory and in storage. The scan of
+        # stored sessions runs without the lock, so views keep being added meanwhile; every
+        # candidate is checked again under the lock before it is deleted, and the save of
+        # the deletions only runs once the lock is released
+        cutoff = (time.time() if now is None else now) - self.ttl_seconds
+        with self._lock:
+            stored = list(self.database.recent_views)
+        candidates = [rv['identifier'] for rv in stored if _stored_updated_at(rv) < cutoff]
+        with self.database.batch():
+            with self._lock:
+                expired = {identifier: self._views.get(identifier) for identifier in self._views.expired(cutoff)}
+                for identifier in expired:
+                    self._views.discard(identifier)
+                    self._dirty.discard(identifier)
+                for identifier in candidates:
+                    # Skipped when loaded or written again since the scan
+                    if identifier in expired or identifier in self._views:
+                        continue
+                    recent_view_data = self.database.get_recent_view(identifier)
+                    if recent_view_data and _stored_updated_at(recent_view_data) < cutoff:
+                        expired[identifier] = recent_view_data.get('stack', [])
+                self.database.delete_recent_views(expired)
+                if self.co_views is not None:
+                    for stack in expired.values():
+                        self.co_views.stack_changed(stack, [])
+                self._stats['expired'] += len(expired)
+        return len(expired)
+
+    def start_sweeper(self):
+        # For long-running processes; stop_sweeper() ends it
+        if self._sweeper is None:
+            self._stop_sweeper.clear()
+            self._sweeper = threading.Thread(target=self._sweep_periodically, name='recent-views-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._stop_sweeper.set()
+            self._sweeper.join()
+            self._sweeper = None
+
+    def _sweep_periodically(self):
+        while not self._stop_sweeper.wait(self.sweep_interval):
+            self.sweep()
+
+    def get_registry_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['sessions'] = len(self._views)
+            stats['dirty'] = len(self._dirty)
+            stats['buffer_bytes'] = self._views.memory_bytes()
+            return stats
+
+    def _load(self, identifier):
+        if identifier in self._views:
+            self._views.touch(identifier)
+            self._stats['hits'] += 1
+            return
+        self._stats['misses'] += 1
+        recent_view_data = self.database.get_recent_view(identifier)
+        if recent_view_data:
+            recent_view = RecentView.from_dict(recent_view_data)
+            self._views.put(identifier, recent_view.stack, recent_view.updated_at)
+        else:
+            self._views.put(identifier, [], time.time())
+        self._evict()
+
+    def _stack_changed(self, identifier, old_stack):
+        if self.co_views is not None:
+            self.co_views.stack_changed(old_stack, self._views.get(identifier))
+
+    def _mark_dirty(self, identifier):
+        self._dirty.add(identifier)
+        now = time.monotonic()
+        if len(self._dirty) >= self.flush_threshold or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _evict(self):
+        while len(self._views) > self.max_sessions:
+            identifier = self._views.oldest()
+            # Dirty stacks are written before they leave memory
+            if identifier in self._dirty:
+                self.flush()
+            self._views.discard(identifier)
+            self._stats['evictions'] += 1
@@ -0,0 +1,199 @@
+import bisect
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from ranking import CountRanking
+
+PERIODS = ('day', 'week', 'month')
+
+def period_keys(created_at):
+    # Keys sort chronologically as plain strings
+    try:
+        moment = datetime.fromisoformat(created_at)
+    except (TypeError, ValueError):
+        return None
+    year, week, _ = moment.isocalendar()
+    return {
+        'day': moment.strftime('%Y-%m-%d'),
+        'week': f'{year}-W{week:02d}',
+        'month': moment.strftime('%Y-%m')
+    }
+
+def rollup_orders(orders, category_paths):
+    # Totals of [units, revenue] per dimension for a list of DONE orders; category_paths maps
+    # a category id to its path up to the root. Runs in worker processes, so it only takes
+    # and returns plain data
+    rollup = {dimension: {} for dimension in ('product', 'category', 'customer') + PERIODS}
+
+    def add(dimension, key, units, revenue):
+        totals = rollup[dimension].get(key)
+        if totals is None:
+            rollup[dimension][key] = [units, revenue]
+        else:
+            totals[0] += units
+            totals[1] += revenue
+
+    for order_data in orders:
+        periods = period_keys(order_data.get('created_at'))
+        for item in order_data.get('items', []):
+            units = item.get('qty', 1)
+            revenue = item.get('price', 0.0) * units
+            add('product', item['code'], units, revenue)
+            add('customer', order_data.get('customer_name', ''), units, revenue)
+            # Sales count for the category the line was sold in and every ancestor,
+            # so a subtree total is one lookup
+            for category_id in category_paths.get(item.get('category_id'), []):
+                add('category', category_id, units, revenue)
+            if periods:
+                for period in PERIODS:
+                    add(period, periods[period], units, revenue)
+    return rollup
+
+# Set just before a rebuild forks its workers, which then read their shard from
+# inherited memory instead of receiving a pickled copy of the orders
+_rebuild_source = None
+
+def _rollup_shard(bounds):
+    orders, category_paths = _rebuild_source
+    return rollup_orders(orders[bounds[0]:bounds[1]], category_paths)
+
+class SalesAnalyticsService:
+    def __init__(self, database, product_cache, category_tree, workers=None, shard_size=20000):
+        self.database = database
+        self.product_cache = product_cache
+        self.category_tree = category_tree
+        self.workers = workers
+        self.shard_size = shard_size
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._reset()
+
+    def _reset(self):
+        self._totals = {dimension: {} for dimension in ('product', 'category', 'customer') + PERIODS}
+        self._period_keys = {period: [] for period in PERIODS}
+        self._rankings = {'units': CountRanking(), 'revenue': CountRanking(), 'customer': CountRanking()}
+        self._orders = 0
+
+    def load(self):
+        if not self._loaded:
+            self.rebuild()
+
+    def rebuild(self):
+        # Recomputes every rollup from the order history, one shard per worker process
+        with self._lock:
+            orders = [o for o in self.database.orders if o.get('status') == 'DONE']
+            category_paths = {
+                c['id']: self.category_tree.get_category_path(c['id'])
+                for c in self.database.categories
+            }
+            self._reset()
+            workers = self.workers or os.cpu_count() or 1
+            if len(orders) <= self.shard_size or workers == 1:
+                self._merge(rollup_orders(orders, category_paths), ranked=False)
+            else:
+                self._rebuild_parallel(orders, category_paths, workers)
+            products = self._totals['product']
+            self._rankings['units'].load({code: totals[0] for code, totals in products.items()})
+            self._rankings['revenue'].load({code: totals[1] for code, totals in products.items()})
+            self._rankings['customer'].load({name: totals[1] for name, totals in self._totals['customer'].items()})
+            for period in PERIODS:
+                self._period_keys[period] = sorted(self._totals[period])
+            self._orders = len(orders)
+            self._loaded = True
+            return self._orders
+
+    def _rebuild_parallel(self, orders, category_paths, workers):
+        global _rebuild_source
+        bounds = [(i, i + self.shard_size) for i in range(0, len(orders), self.shard_size)]
+        if multiprocessing.get_start_method() == 'fork':
+            _rebuild_source = (orders, category_paths)
+            try:
+                with ProcessPoolExecutor(max_workers=workers) as pool:
+                    for rollup in pool.map(_rollup_shard, bounds):
+                        self._merge(rollup, ranked=False)
+            finally:
+                _rebuild_source = None
+        else:
+            shards = [orders[start:end] for start, end in bounds]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for rollup in pool.map(rollup_orders, shards, [category_paths] * len(shards)):
+                    self._merge(rollup, ranked=False)
+
+    def order_completed(self, order_data):
+        with self._lock:
+            if not self._loaded:
+                # The next rebuild reads it from the order history
+                return
+            category_paths = {}
+            for item in order_data.get('items', []):
+                category_id = item.get('category_id')
+                category_paths[category_id] = self.category_tree.get_category_path(category_id)
+            self._merge(rollup_orders([order_data], category_paths), ranked=True)
+            self._orders += 1
+
+    def best_sellers(self, n=10, by='units'):
+        with self._lock:
+            self.load()
+            products = self._totals['product']
+            return [(code, products[code][0], round(products[code][1], 2)) for code in self._rankings[by].top(n)]
+
+    def top_customers(self, n=10):
+        with self._lock:
+            self.load()
+            customers = self._totals['customer']
+            return [(name, customers[name][0], round(customers[name][1], 2)) for name in self._rankings['customer'].top(n)]
+
+    def revenue_by_period(self, period='month', start=None, end=None):
+        # start and end are inclusive period keys, e.g. '2025-10' or '2025-W43'
+        with self._lock:
+            self.load()
+            keys = self._period_keys[period]
+            low = bisect.bisect_left(keys, start) if start else 0
+            high = bisect.bisect_right(keys, end) if end else len(keys)
+            totals = self._totals[period]
+            return [(key, totals[key][0], round(totals[key][1], 2)) for key in keys[low:high]]
+
+    def product_sales(self, code):
+        return self._lookup('product', code)
+
+    def category_sales(self, category_id):
+        # Includes every subcategory
+        return self._lookup('category', category_id)
+
+    def customer_sales(self, customer_name):
+        return self._lookup('customer', customer_name)
+
+    def get_analytics_stats(self):
+        with self._lock:
+            return {
+                'orders': self._orders,
+                'products': len(self._totals['product']),
+                'customers': len(self._totals['customer']),
+                'days': len(self._period_keys['day'])
+            }
+
+    def _lookup(self, dimension, key):
+        with self._lock:
+            self.load()
+            units, revenue = self._totals[dimension].get(key, (0, 0.0))
+            return units, round(revenue, 2)
+
+    def _merge(self, rollup, ranked):
+        for dimension, values in rollup.items():
+            totals = self._totals[dimension]
+            for key, (units, revenue) in values.items():
+                current = totals.get(key)
+                if current is None:
+                    totals[key] = [units, revenue]
+                    if ranked and dimension in PERIODS:
+                        bisect.insort(self._period_keys[dimension], key)
+                else:
+                    current[0] += units
+                    current[1] += revenue
+                if ranked and dimension == 'product':
+                    self._rankings['units'].add(key, units)
+                    self._rankings['revenue'].add(key, revenue)
+                elif ranked and dimension == 'customer':
+                    self._rankings['customer'].add(key, revenue)
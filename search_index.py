@@ -0,0 +1,161 @@
+import heapq
+import unicodedata
+
+def fold_text(text):
+    # Case- and accent-insensitive form: "Electrodomésticos" -> "electrodomesticos"
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class ProductSearchIndex:
+    def __init__(self, database, result_cache=None):
+        self.database = database
+        self.result_cache = result_cache
+        self._postings = {}   # trigram -> set of product codes
+        self._documents = {}  # product code -> (folded name, folded description)
+        self._initialized = False
+
+    def build_index(self):
+        if not self._initialized:
+            for product_data in self.database.products:
+                self._add_document(product_data['code'], product_data.get('name', ''),
+                                   product_data.get('description', ''))
+            self._initialized = True
+
+    def product_updated(self, product):
+        if not self._initialized:
+            # build_index() reads every product from the database anyway
+            return
+        document = self._fold_product(product)
+        if self._documents.get(product.code) == document:
+            return
+        self._remove_document(product.code)
+        self._add_document(product.code, product.name, product.description)
+
+    def product_removed(self, code):
+        self._remove_document(code)
+
+    def search(self, query, limit=None):
+        self.build_index()
+        terms = fold_text(query).split()
+        if not terms:
+            return []
+
+        if self.result_cache is not None:
+            # Cached results are kept fully ranked; products are compared by their own text
+            codes = self.result_cache.get_or_compute(
+                ('name', tuple(terms)),
+                lambda: self._search(terms),
+                lambda product: self.product_matches(product, query),
+                lambda product: self.product_rank(product, query),
+                fields=('name', 'description')
+            )
+            return codes[:limit] if limit else codes
+        return self._search(terms, limit)
+
+    def _search(self, terms, limit=None):
+        candidates = None
+        for term in sorted(terms, key=len, reverse=True):
+            candidates = self._match_term(term, candidates)
+            if not candidates:
+                return []
+
+        rank_key = lambda code: self._rank_key(code, terms)
+        if limit:
+            return heapq.nsmallest(limit, candidates, key=rank_key)
+        return sorted(candidates, key=rank_key)
+
+    def estimate(self, query):
+        # Upper bound on matches: the rarest trigram of any term
+        estimate = len(self._documents)
+        for term in fold_text(query).split():
+            for gram in trigrams(term):
+                estimate = min(estimate, len(self._postings.get(gram, ())))
+        return estimate
+
+    def matches(self, code, query):
+        document = self._documents.get(code)
+        if document is None:
+            return False
+        return self._document_matches(document, fold_text(query).split())
+
+    def rank_key(self, code, query):
+        return self._rank_key(code, fold_text(query).split())
+
+    def product_matches(self, product, query):
+        return self._document_matches(self._fold_product(product), fold_text(query).split())
+
+    def product_rank(self, product, query):
+        return self._rank_document(self._fold_product(product), product.code, fold_text(query).split())
+
+    def get_index_stats(self):
+        return {
+            'indexed_products': len(self._documents),
+            'trigrams': len(self._postings),
+            'initialized': self._initialized
+        }
+
+    def _match_term(self, term, candidates):
+        if len(term) >= 3:
+            # Intersect posting lists starting from the rarest trigram
+            postings = sorted((self._postings.get(gram, set()) for gram in trigrams(term)), key=len)
+            if not postings[0]:
+                return set()
+            matches = set(postings[0])
+            if candidates is not None:
+                matches &= candidates
+            for posting in postings[1:]:
+                if not matches:
+                    break
+                matches &= posting
+        else:
+            matches = set(self._documents) if candidates is None else candidates
+
+        # Trigrams only narrow the candidates; confirm the actual substring
+        return {code for code in matches
+                if term in self._documents[code][0] or term in self._documents[code][1]}
+
+    def _rank_key(self, code, terms):
+        return self._rank_document(self._documents[code], code, terms)
+
+    def _rank_document(self, document, code, terms):
+        name, description = document
+        words = name.split()
+        score = 0
+        for term in terms:
+            if term in name:
+                score += 10
+                if name.startswith(term):
+                    score += 5
+                if term in words:
+                    score += 5
+                elif any(word.startswith(term) for word in words):
+                    score += 3
+            elif term in description:
+                score += 2
+        return (-score, len(name), code)
+
+    def _document_matches(self, document, terms):
+        return all(term in document[0] or term in document[1] for term in terms)
+
+    def _fold_product(self, product):
+        return (fold_text(product.name), fold_text(product.description))
+
+    def _add_document(self, code, name, description):
+        document = (fold_text(name), fold_text(description))
+        self._documents[code] = document
+        for gram in trigrams(document[0]) | trigrams(document[1]):
+            self._postings.setdefault(gram, set()).add(code)
+
+    def _remove_document(self, code):
+        document = self._documents.pop(code, None)
+        if document is None:
+            return
+        for gram in trigrams(document[0]) | trigrams(document[1]):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(code)
+                if not posting:
+                    del self._postings[gram]
@@ -1,7 +1,23 @@
 from product_cache import ProductCacheService
+from shared_product_cache import SharedProductCache
 from order_queue import OrderQueueService
-from recent_stack import RecentViewManager
+from order_journal import OrderQueueJournal
+from order_scheduler import FIFOScheduler, PriorityScheduler, AgingScheduler, WeightedFairScheduler, create_scheduler
+from concurrent_orders import ConcurrentOrderProcessor
+from stock_reservation import StockReservationService
+from sales_analytics import SalesAnalyticsService
+from low_stock import LowStockIndex
+from stock_ledger import StockLedgerService
+from order_ingestion import OrderIngestionService
+from bulk_io import BulkIOService
+from recent_stack import RecentViewManager, CompactRecentViews
+from co_views import CoViewService
 from category_tree import CategoryTreeService
+from search_index import ProductSearchIndex
+from product_completion import ProductCompletionIndex
+from product_query import ProductQueryService
+from query_cache import SearchResultCache
+from listing import ListingRenderer, CategoryNames
 
 # This file simply imports and organizes the services
 # Kept to maintain compatibility with the original codebase
\ No newline at end of file
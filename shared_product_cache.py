@@ -0,0 +1,199 @@
+import struct
+import time
+import zlib
+from collections import namedtuple
+from multiprocessing import shared_memory, resource_tracker
+
+# Fixed layout of the shared segment:
+#   header (magic, version, capacity, used, live, index slots)
+#   records (capacity * RECORD)
+#   hash index (index_slots * int32)
+HEADER = struct.Struct('<8sQQQQQ')
+RECORD = struct.Struct('<32sdqq')
+SLOT = struct.Struct('<i')
+
+MAGIC = b'NSSPC001'
+CODE_SIZE = 32
+NO_CATEGORY = -1
+EMPTY_SLOT = -1
+DELETED_SLOT = -2
+
+# Readers back off while a write is in progress; a writer that died mid-write leaves
+# the version odd forever, so they give up after READ_RETRIES attempts (~1 s)
+READ_RETRIES = 1000
+READ_BACKOFF = 0.001
+
+SharedProductRecord = namedtuple('SharedProductRecord', ['code', 'price', 'stock', 'category_id'])
+
+
+class SharedProductCache:
+    def __init__(self, shm, writable):
+        self._shm = shm
+        self._buf = shm.buf
+        self._writable = writable
+        magic, _, capacity, _, _, index_slots = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory '{shm.name}' is not a product cache")
+        self.capacity = capacity
+        self.index_slots = index_slots
+        self._records_offset = HEADER.size
+        self._index_offset = self._records_offset + capacity * RECORD.size
+        # Records of removed products, reused before the segment grows into new ones;
+        # only the writing process allocates records, so the list stays local to it
+        self._free = []
+
+    @classmethod
+    def create(cls, products, name=None, capacity=None):
+        products = list(products)
+        capacity = max(capacity or len(products) * 2, len(products), 1)
+        index_slots = 1
+        while index_slots < capacity * 2:
+            index_slots *= 2
+
+        size = HEADER.size + capacity * RECORD.size + index_slots * SLOT.size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, 0, capacity, 0, 0, index_slots)
+        cache = cls(shm, writable=True)
+        for i in range(index_slots):
+            SLOT.pack_into(cache._buf, cache._index_offset + i * SLOT.size, EMPTY_SLOT)
+        for product in products:
+            cache.update_product(product)
+        return cache
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name=name)
+        # Readers must not unlink the segment owned by the building process
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return cls(shm, writable=False)
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @property
+    def version(self):
+        return HEADER.unpack_from(self._buf, 0)[1]
+
+    def __len__(self):
+        return HEADER.unpack_from(self._buf, 0)[4]
+
+    def has_changed(self, since_version):
+        return self.version != since_version
+
+    def get(self, code):
+        key = self._encode_code(code)
+        for attempt in range(READ_RETRIES):
+            before = self.version
+            if not before % 2:
+                position = self._find_slot(key)[1]
+                record = None if position is None else self._read_record(position)
+                if self.version == before:
+                    return record
+            # Yield first so a live writer can finish, then sleep so a stuck one costs no CPU
+            time.sleep(0 if attempt < 10 else READ_BACKOFF)
+        raise TimeoutError(f"Shared product cache '{self.name}' is stuck mid-write; read it from the store")
+
+    def get_stock(self, code):
+        record = self.get(code)
+        return record.stock if record else None
+
+    def update_product(self, product):
+        self._check_writable()
+        key = self._encode_code(product.code)
+        slot, position = self._find_slot(key)
+        self._begin_write()
+        try:
+            if position is None:
+                used, live = HEADER.unpack_from(self._buf, 0)[3:5]
+                if self._free:
+                    position = self._free.pop()
+                elif used < self.capacity:
+                    position = used
+                    used += 1
+                else:
+                    raise ValueError("Shared product cache is full")
+                self._set_counts(used, live + 1)
+                SLOT.pack_into(self._buf, self._index_offset + slot * SLOT.size, position)
+            category_id = NO_CATEGORY if product.category_id is None else int(product.category_id)
+            RECORD.pack_into(self._buf, self._records_offset + position * RECORD.size,
+                             key, float(product.price), int(product.stock), category_id)
+        finally:
+            self._end_write()
+
+    def remove_product(self, code):
+        self._check_writable()
+        slot, position = self._find_slot(self._encode_code(code))
+        if position is None:
+            return False
+        self._begin_write()
+        try:
+            SLOT.pack_into(self._buf, self._index_offset + slot * SLOT.size, DELETED_SLOT)
+            used, live = HEADER.unpack_from(self._buf, 0)[3:5]
+            self._set_counts(used, live - 1)
+            RECORD.pack_into(self._buf, self._records_offset + position * RECORD.size,
+                             b'', 0.0, 0, NO_CATEGORY)
+            self._free.append(position)
+        finally:
+            self._end_write()
+        return True
+
+    def close(self):
+        self._buf = None
+        self._shm.close()
+
+    def unlink(self):
+        self._check_writable()
+        self._shm.unlink()
+
+    def _find_slot(self, key):
+        # Open addressing with linear probing; returns (insert slot, record position)
+        mask = self.index_slots - 1
+        slot = zlib.crc32(key) & mask
+        first_free = None
+        for _ in range(self.index_slots):
+            position = SLOT.unpack_from(self._buf, self._index_offset + slot * SLOT.size)[0]
+            if position == EMPTY_SLOT:
+                return (slot if first_free is None else first_free), None
+            if position == DELETED_SLOT:
+                if first_free is None:
+                    first_free = slot
+            elif RECORD.unpack_from(self._buf, self._records_offset + position * RECORD.size)[0] == key:
+                return slot, position
+            slot = (slot + 1) & mask
+        return first_free, None
+
+    def _read_record(self, position):
+        code, price, stock, category_id = RECORD.unpack_from(
+            self._buf, self._records_offset + position * RECORD.size)
+        return SharedProductRecord(
+            code.rstrip(b'\0').decode('utf-8'),
+            price,
+            stock,
+            None if category_id == NO_CATEGORY else category_id
+        )
+
+    def _encode_code(self, code):
+        key = code.encode('utf-8')
+        if len(key) > CODE_SIZE:
+            raise ValueError(f"Product code '{code}' exceeds {CODE_SIZE} bytes")
+        return key.ljust(CODE_SIZE, b'\0')
+
+    def _set_counts(self, used, live):
+        magic, version, capacity, _, _, index_slots = HEADER.unpack_from(self._buf, 0)
+        HEADER.pack_into(self._buf, 0, magic, version, capacity, used, live, index_slots)
+
+    def _bump_version(self):
+        magic, version, capacity, used, live, index_slots = HEADER.unpack_from(self._buf, 0)
+        HEADER.pack_into(self._buf, 0, magic, version + 1, capacity, used, live, index_slots)
+
+    # Seqlock: the version is odd while a write is in progress
+    def _begin_write(self):
+        self._bump_version()
+
+    def _end_write(self):
+        self._bump_version()
+
+    def _check_writable(self):
+        if not self._writable:
+            raise PermissionError("Shared product cache is attached read-only")
@@ -0,0 +1,261 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+ORDER = 'order'
+ADJUSTMENT = 'adjustment'
+RESTOCK = 'restock'
+RECONCILE = 'reconcile'
+
+_context = threading.local()
+
+@contextmanager
+def stock_movement(kind, order_ids=None):
+    # Tags the stock changes made inside the block, e.g. with stock_movement(ORDER, [order_id])
+    previous = getattr(_context, 'value', None)
+    _context.value = (kind, list(order_ids or []))
+    try:
+        yield
+    finally:
+        _context.value = previous
+
+def _current_context():
+    return getattr(_context, 'value', None) or (ADJUSTMENT, [])
+
+class StockLedgerService:
+    # Every stock change is appended to movement segments as one JSON line:
+    #   {"t": 1700000000.0, "code": "LAP-001", "delta": -2, "stock": 13, "kind": "order", "orders": [7]}
+    # Each snapshot stores all stock levels and the first segment written after it, so current
+    # stock is the latest snapshot plus at most snapshot_every movements, and the stock at any
+    # past moment is the snapshot before it plus the movements up to that moment.
+    def __init__(self, database, directory, snapshot_every=50000):
+        self.database = database
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self._stock = {}
+        self._snapshots = []   # sorted (timestamp, snapshot number, first segment after it)
+        self._segment = 0
+        self._records = 0
+        self._file = None
+        self._lock = threading.RLock()
+        self._initialized = False
+
+    def load(self):
+        # Rebuilds current stock from the latest snapshot and the tail, then records
+        # changes made while the ledger was not running as reconcile movements
+        with self._lock:
+            if self._initialized:
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            self._snapshots = sorted(self._read_snapshot_index())
+            if self._snapshots:
+                _, number, first_segment = self._snapshots[-1]
+                self._stock = dict(self._read_snapshot(number)['stock'])
+                self._segment = first_segment
+                for segment in self._segments():
+                    if segment >= first_segment:
+                        self._records = 0
+                        for movement in self._read_segment(segment):
+                            self._stock[movement['code']] = movement['stock']
+                            self._records += 1
+                        self._segment = segment
+                self._truncate_torn_tail(self._segment_path(self._segment))
+                self._file = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+                self._initialized = True
+                with stock_movement(RECONCILE):
+                    for product_data in self.database.products:
+                        self._record(product_data['code'], product_data.get('stock', 0))
+            else:
+                self._stock = {p['code']: p.get('stock', 0) for p in self.database.products}
+                self._initialized = True
+                self.snapshot()
+
+    def current_stock(self, code):
+        return self._stock.get(code)
+
+    def stock_at(self, code, when):
+        # Stock of a product at a past moment (datetime or epoch seconds); None before the ledger existed
+        when = when.timestamp() if hasattr(when, 'timestamp') else when
+        with self._lock:
+            index = bisect.bisect_right(self._snapshots, (when, float('inf'), 0)) - 1
+            if index < 0:
+                return None
+            _, number, first_segment = self._snapshots[index]
+            stock = self._read_snapshot(number)['stock'].get(code)
+            for segment in self._segments():
+                if segment < first_segment:
+                    continue
+                for movement in self._read_segment(segment):
+                    if movement['t'] > when:
+                        return stock
+                    if movement['code'] == code:
+                        stock = movement['stock']
+            return stock
+
+    def movements(self, code=None, start=None, end=None):
+        # Oldest first; reads only the segments that can overlap the range
+        with self._lock:
+            first_segment = 0
+            if start is not None:
+                index = bisect.bisect_right(self._snapshots, (start, float('inf'), 0)) - 1
+                if index >= 0:
+                    first_segment = self._snapshots[index][2]
+            segments = [segment for segment in self._segments() if segment >= first_segment]
+        for segment in segments:
+            for movement in self._read_segment(segment):
+                if end is not None and movement['t'] > end:
+                    return
+                if (start is None or movement['t'] >= start) and (code is None or movement['code'] == code):
+                    yield movement
+
+    def snapshot(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            number = self._snapshots[-1][1] + 1 if self._snapshots else 1
+            self._segment += 1
+            state = {'timestamp': time.time(), 'segment': self._segment, 'stock': self._stock}
+            self._write_json(self._snapshot_path(number), state)
+            self._snapshots.append((state['timestamp'], number, self._segment))
+            self._write_json(self._index_path(), self._snapshots)
+            self._file = open(self._segment_path(self._segment), 'a', encoding='utf-8')
+            self._records = 0
+
+    def compact(self, before):
+        # Drops the history older than the last snapshot taken before the given moment
+        before = before.timestamp() if hasattr(before, 'timestamp') else before
+        with self._lock:
+            index = bisect.bisect_right(self._snapshots, (before, float('inf'), 0)) - 1
+            if index <= 0:
+                return 0
+            _, _, keep_segment = self._snapshots[index]
+            for _, number, _ in self._snapshots[:index]:
+                os.remove(self._snapshot_path(number))
+            for segment in self._segments():
+                if segment < keep_segment:
+                    os.remove(self._segment_path(segment))
+            self._snapshots = self._snapshots[index:]
+            self._write_json(self._index_path(), self._snapshots)
+            return index
+
+    def verify(self):
+        # Products whose stored stock disagrees with the ledger
+        return [p['code'] for p in self.database.products if self._stock.get(p['code']) != p.get('stock', 0)]
+
+    def get_ledger_stats(self):
+        return {
+            'products': len(self._stock),
+            'snapshots': len(self._snapshots),
+            'segment': self._segment,
+            'movements_since_snapshot': self._records
+        }
+
+    # Product cache listener
+    def product_updated(self, product):
+        if self._initialized:
+            self._record(product.code, product.stock)
+
+    def product_removed(self, code):
+        if self._initialized:
+            self._record(code, 0)
+            self._stock.pop(code, None)
+
+    def products_updated(self, products):
+        # Bulk form of product_updated: one write per snapshot interval instead of one per movement
+        if not self._initialized:
+            return
+        with self._lock:
+            lines = []
+            for product in products:
+                line = self._movement(product.code, product.stock)
+                if line is not None:
+                    lines.append(line)
+                    if self._records >= self.snapshot_every:
+                        self._write(lines)
+                        lines = []
+                        self.snapshot()
+            self._write(lines)
+
+    def _record(self, code, stock):
+        with self._lock:
+            line = self._movement(code, stock)
+            if line is None:
+                return
+            self._write([line])
+            if self._records >= self.snapshot_every:
+                self.snapshot()
+
+    def _movement(self, code, stock):
+        delta = stock - self._stock.get(code, 0)
+        if not delta:
+            return None
+        kind, order_ids = _current_context()
+        movement = {'t': time.time(), 'code': code, 'delta': delta, 'stock': stock, 'kind': kind}
+        if order_ids:
+            movement['orders'] = order_ids
+        self._stock[code] = stock
+        self._records += 1
+        return json.dumps(movement, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+    def _write(self, lines):
+        if lines:
+            self._file.write(''.join(lines))
+            self._file.flush()
+
+    def _read_segment(self, segment):
+        try:
+            with open(self._segment_path(segment), 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        return
+        except FileNotFoundError:
+            return
+
+    def _read_snapshot(self, number):
+        with open(self._snapshot_path(number), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _read_snapshot_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                return [tuple(entry) for entry in json.load(f)]
+        except FileNotFoundError:
+            return []
+
+    def _truncate_torn_tail(self, path):
+        # A line cut short by a crash is dropped; the reconcile on load restores the stock it carried
+        if not os.path.exists(path):
+            return
+        with open(path, 'r+b') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                f.truncate(end)
+
+    def _write_json(self, path, data):
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            # dumps() uses the C encoder, dump() to a file does not
+            f.write(json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+        os.replace(temp_path, path)
+
+    def _segments(self):
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith('movements-') and name.endswith('.log'):
+                segments.append(int(name[len('movements-'):-len('.log')]))
+        return sorted(segments)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.directory, f'movements-{segment:06d}.log')
+
+    def _index_path(self):
+        return os.path.join(self.directory, 'snapshots.json')
+
+    def _snapshot_path(self, number):
+        return os.path.join(self.directory, f'snapshot-{number:06d}.json')
@@ -0,0 +1,125 @@
+import heapq
+import threading
+import time
+
+class StockReservationService:
+    def __init__(self, database, product_cache, ttl_seconds=None, cancel_expired=False):
+        self.database = database
+        self.product_cache = product_cache
+        self.ttl_seconds = ttl_seconds
+        # By default an expired hold only frees its stock; the order stays PENDING and is
+        # re-checked against stock when processed
+        self.cancel_expired = cancel_expired
+        self._reserved = {}   # product code -> reserved units
+        self._by_order = {}   # order id -> {product code: units}
+        self._expiry = []     # heap of (expires_at, order id)
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def load_reservations(self, order_ids=None):
+        # Pending orders hold their stock again after a restart; the TTL restarts from now,
+        # since time spent stopped doesn't count against the customer
+        if self._loaded:
+            return
+        with self._lock:
+            if order_ids is None:
+                orders = [o for o in self.database.orders if o.get('status') == 'PENDING']
+            else:
+                orders = [self.database.get_order(order_id) for order_id in order_ids]
+            for order_data in orders:
+                # Orders that no longer fit in stock stay unreserved and are re-checked when processed
+                if order_data and order_data['id'] not in self._by_order:
+                    self.reserve(order_data['id'], order_data['items'])
+            self._loaded = True
+
+    def available(self, code):
+        product = self.product_cache.get_product(code)
+        if product is None:
+            return 0
+        return product.stock - self._reserved.get(code, 0)
+
+    def reserved(self, code):
+        return self._reserved.get(code, 0)
+
+    def holds(self, order_id):
+        return order_id in self._by_order
+
+    def reserve(self, order_id, items, created_at=None):
+        # All-or-nothing; returns (True, None) or (False, reason)
+        with self._lock:
+            demand = self._demand(items)
+            for code, units in demand.items():
+                product = self.product_cache.get_product(code)
+                if product is None:
+                    return False, f"Product {code} not found"
+                available = product.stock - self._reserved.get(code, 0)
+                if available < units:
+                    return False, f"Not enough stock for {code} ({available} available)"
+            self._hold(order_id, items, created_at if created_at is not None else time.time())
+            return True, None
+
+    def release(self, order_id):
+        with self._lock:
+            demand = self._by_order.pop(order_id, None)
+            if demand is None:
+                return False
+            for code, units in demand.items():
+                remaining = self._reserved.get(code, 0) - units
+                if remaining > 0:
+                    self._reserved[code] = remaining
+                else:
+                    self._reserved.pop(code, None)
+            return True
+
+    def commit(self, order_id):
+        # Reserved units are guaranteed to exist, so stock is deducted without re-checking
+        with self._lock:
+            demand = self._by_order.get(order_id)
+            if demand is None:
+                return False
+            for code, units in demand.items():
+                product = self.product_cache.get_product(code)
+                product.stock -= units
+                self.database.update_product(product.to_dict())
+                self.product_cache.update_product(product)
+            self.release(order_id)
+            return True
+
+    def expire(self, now=None):
+        # Releases the holds that outlived the TTL; the orders are only cancelled
+        # when cancel_expired is set
+        now = time.time() if now is None else now
+        expired = []
+        with self._lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                _, order_id = heapq.heappop(self._expiry)
+                if self.release(order_id):
+                    expired.append(order_id)
+            if not self.cancel_expired:
+                return expired
+            for order_id in expired:
+                order_data = self.database.get_order(order_id)
+                if order_data and order_data.get('status') == 'PENDING':
+                    self.database.update_order(dict(order_data, status='CANCELLED'))
+        return expired
+
+    def get_reservation_stats(self):
+        return {
+            'orders': len(self._by_order),
+            'products': len(self._reserved),
+            'units': sum(self._reserved.values())
+        }
+
+    def _hold(self, order_id, items, created_at):
+        demand = self._demand(items)
+        self._by_order[order_id] = demand
+        for code, units in demand.items():
+            self._reserved[code] = self._reserved.get(code, 0) + units
+        if self.ttl_seconds is not None:
+            heapq.heappush(self._expiry, (created_at + self.ttl_seconds, order_id))
+
+    def _demand(self, items):
+        demand = {}
+        for item in items:
+            demand[item['code']] = demand.get(item['code'], 0) + item.get('qty', 1)
+        return demand